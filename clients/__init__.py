@@ -1,3 +1,10 @@
 from .openai_client import OpenAIClient
+from .ratelimit import RateLimiter, RateLimitedClient
+from .hedging import LatencyTracker, HedgedClient
+from .endpoints import Endpoint, EndpointPool
+from .batching import BatchingClient
+from .usage import UsageMeter
 
-__all__ = ["OpenAIClient"]
+__all__ = ["OpenAIClient", "RateLimiter", "RateLimitedClient",
+           "LatencyTracker", "HedgedClient", "Endpoint", "EndpointPool",
+           "BatchingClient", "UsageMeter"]
@@ -1,8 +1,75 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Dict, Optional
+
+# 请求类别（choice / open / dialogue ...）：由评测流程按工作单元设置，
+# 供 HedgedClient 等按类别分别统计延迟；未设置时为 "default"
+_REQUEST_CLASS: ContextVar[str] = ContextVar("request_class", default="default")
+
+
+@contextmanager
+def request_class(name: str) -> Iterator[None]:
+    token = _REQUEST_CLASS.set(name)
+    try:
+        yield
+    finally:
+        _REQUEST_CLASS.reset(token)
+
+
+def current_request_class() -> str:
+    return _REQUEST_CLASS.get()
+
+
+# 经微批合并成 /completions 纯文本 prompt 发出的调用：由评测流程按工作单元收集，
+# BatchingClient 每完成一次批量调用追加一条 prompt 格式，用于给 record 打标
+_BATCHED_CALLS: ContextVar[Optional[List[str]]] = ContextVar("batched_calls", default=None)
+
+
+@contextmanager
+def track_batched_calls() -> Iterator[List[str]]:
+    calls: List[str] = []
+    token = _BATCHED_CALLS.set(calls)
+    try:
+        yield calls
+    finally:
+        _BATCHED_CALLS.reset(token)
+
+
+def note_batched_call(prompt_format: str):
+    calls = _BATCHED_CALLS.get()
+    if calls is not None:
+        calls.append(prompt_format)
+
 
 class LLMClient(ABC):
     @abstractmethod
     def chat(self, messages: List[Dict[str, str]], model: str | None = None,
-             temperature: float | None = None) -> str:
+             temperature: float | None = None,
+             timeout: Optional[float] = None,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
+        """
+        timeout 为单次请求超时（秒），None 表示使用 client 自身的默认值。
+        response_format 为 OpenAI 风格的结构化输出约束（如 json_schema），服务端不支持时可忽略。
+        """
         ...
+
+    def chat_batch(self, batch: List[List[Dict[str, str]]], model: str | None = None,
+                   temperature: float | None = None,
+                   timeout: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> List[str]:
+        """
+        一次提交多段对话，按顺序返回各自的回答。
+        默认逐条调用 chat；支持多 prompt 请求的服务端（如 vLLM）由子类覆盖。
+        """
+        return [self.chat(m, model=model, temperature=temperature, timeout=timeout)
+                for m in batch]
+
+    def option_logprobs(self, messages: List[Dict[str, str]], letters: str,
+                        model: str | None = None,
+                        timeout: Optional[float] = None) -> Dict[str, float]:
+        """
+        只生成 1 个 token，返回其 top_logprobs 中各选项字母的对数概率 {字母: logprob}；
+        未出现在 top_logprobs 中的字母不返回。服务端需支持 logprobs。
+        """
+        raise NotImplementedError(f"{type(self).__name__} 不支持 logprob 打分")
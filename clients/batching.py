@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import List, Dict, Any, Optional, Tuple
+from .base import LLMClient, note_batched_call
+
+
+class _Batch:
+    __slots__ = ("items", "deadline")
+
+    def __init__(self, deadline: float):
+        self.items: List[Tuple[List[Dict[str, str]], Future]] = []
+        self.deadline = deadline
+
+
+class BatchingClient(LLMClient):
+    """
+    微批合并：并发的 chat 调用按 (model, temperature, timeout) 归组，
+    凑满 max_batch 条或最早一条已等待 max_wait 秒时，合成一次 inner.chat_batch 请求，
+    再把回答按顺序分发回各调用方。
+
+    - 不起后台线程：凑满时由最后加入的调用方发送；超时由等待中的调用方抢到批次后发送
+    - 批次失败时该批所有调用都抛同一个异常，由上层的失败隔离 / 延迟重试逐条处理
+    - 单批大小受并发 worker 数限制（同时在等的调用不会超过 worker 数）
+    - 批量请求走 /completions（纯文本 prompt，格式见 prompt_format），与 /chat/completions
+      的输入不完全相同；每次经微批返回的调用通过 note_batched_call 记下，评测流程据此给
+      record 标注 batched / prompt_format。含图片或带 response_format 的调用不合并
+    """
+
+    def __init__(self, inner: LLMClient,
+                 max_batch: int = 16,
+                 max_wait: float = 0.05,
+                 max_tokens: Optional[int] = None,
+                 prompt_format: str = "role_prefixed"):
+        self.inner = inner
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_tokens = max_tokens
+        self.prompt_format = prompt_format
+        self._lock = threading.Lock()
+        self._pending: Dict[tuple, _Batch] = {}
+        self.batches = 0
+        self.prompts = 0
+
+    def _take(self, key: tuple, batch: _Batch) -> bool:
+        """batch 仍是该 key 当前的待发批次时摘下来（调用方负责发送）。需持有锁。"""
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+            return True
+        return False
+
+    def _send(self, key: tuple, batch: _Batch):
+        model, temperature, timeout = key
+        with self._lock:
+            self.batches += 1
+            self.prompts += len(batch.items)
+        try:
+            outs = self.inner.chat_batch([m for m, _ in batch.items], model=model,
+                                         temperature=temperature, timeout=timeout,
+                                         max_tokens=self.max_tokens)
+        except Exception as e:
+            for _, fut in batch.items:
+                fut.set_exception(e)
+            return
+        for (_, fut), out in zip(batch.items, outs):
+            fut.set_result(out)
+
+    def chat(self, messages: List[Dict[str, str]],
+             model: Optional[str] = None,
+             temperature: Optional[float] = None,
+             timeout: Optional[float] = None,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
+        if response_format is not None or any(not isinstance(m.get("content"), str) for m in messages):
+            # /completions 的批量请求不带结构化约束、不能含图片，直接单发
+            return self.inner.chat(messages, model=model, temperature=temperature,
+                                   timeout=timeout, response_format=response_format)
+        key = (model, temperature, timeout)
+        fut: Future = Future()
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _Batch(time.monotonic() + self.max_wait)
+            batch.items.append((messages, fut))
+            full = len(batch.items) >= self.max_batch and self._take(key, batch)
+        if full:
+            self._send(key, batch)
+
+        try:
+            out = fut.result(timeout=max(0.0, batch.deadline - time.monotonic()))
+        except FutureTimeout:
+            with self._lock:
+                mine = self._take(key, batch)
+            if mine:
+                self._send(key, batch)
+            out = fut.result()
+        note_batched_call(self.prompt_format)
+        return out
+
+    def chat_batch(self, batch: List[List[Dict[str, str]]],
+                   model: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   timeout: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> List[str]:
+        return self.inner.chat_batch(batch, model=model, temperature=temperature,
+                                     timeout=timeout, max_tokens=max_tokens)
+
+    def option_logprobs(self, messages: List[Dict[str, str]], letters: str,
+                        model: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Dict[str, float]:
+        return self.inner.option_logprobs(messages, letters, model=model, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "avg_batch_size": self.prompts / self.batches if self.batches else None,
+        }
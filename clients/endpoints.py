@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import List, Dict, Any, Optional
+
+
+class Endpoint:
+    """单个副本的在途请求数、熔断状态和累计统计（由 EndpointPool 加锁维护）。"""
+
+    def __init__(self, api_base: str):
+        self.api_base = api_base.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0      # > now 表示熔断中
+        self.probing = False          # 半开状态下已放出探测请求
+        self.next_cooldown = 0.0      # 下次熔断的时长，连续熔断时翻倍
+        self.total_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        ok = self.requests - self.failures
+        return {
+            "api_base": self.api_base,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "outstanding": self.outstanding,
+            "healthy": self.ejected_until <= time.monotonic(),
+            "avg_latency": self.total_seconds / ok if ok else None,
+        }
+
+
+class EndpointPool:
+    """
+    多副本路由：
+    - 最少在途请求（least outstanding）优先，平手时选累计请求少的
+    - 被动健康检查：只根据真实请求的结果判断，不额外发探测
+    - 熔断：连续失败 failure_threshold 次后摘除 cooldown 秒；到期后半开，
+      只放一个探测请求，成功则恢复，失败则冷却时间翻倍（上限 max_cooldown）
+    - 全部副本都在熔断中时，选最早到期的一个，避免整体不可用
+    """
+
+    def __init__(self, api_bases: List[str],
+                 failure_threshold: int = 3,
+                 cooldown: float = 30.0,
+                 max_cooldown: float = 300.0):
+        if not api_bases:
+            raise ValueError("至少需要一个 api_base")
+        self.endpoints = [Endpoint(b) for b in api_bases]
+        for e in self.endpoints:
+            e.next_cooldown = cooldown
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, exclude: Optional[set] = None) -> Endpoint:
+        """选一个副本并占用一个在途名额；exclude 为本次请求已失败过的副本。"""
+        now = time.monotonic()
+        with self._lock:
+            cands = [e for e in self.endpoints if not exclude or e.api_base not in exclude]
+            cands = cands or self.endpoints
+            healthy = [e for e in cands if e.ejected_until <= now and not e.probing]
+            if healthy:
+                ep = min(healthy, key=lambda e: (e.outstanding, e.requests))
+            else:
+                ep = min(cands, key=lambda e: e.ejected_until)
+            if ep.consecutive_failures >= self.failure_threshold:
+                ep.probing = True    # 半开：这次请求即探测
+            ep.outstanding += 1
+            ep.requests += 1
+            return ep
+
+    def release(self, ep: Endpoint, ok: bool, seconds: float):
+        with self._lock:
+            ep.outstanding -= 1
+            ep.probing = False
+            if ok:
+                ep.consecutive_failures = 0
+                ep.next_cooldown = self.cooldown
+                ep.total_seconds += seconds
+                return
+            ep.failures += 1
+            ep.consecutive_failures += 1
+            now = time.monotonic()
+            # 熔断期间陆续返回的在途失败请求不再重复计入
+            if ep.consecutive_failures >= self.failure_threshold and ep.ejected_until <= now:
+                ep.ejections += 1
+                ep.ejected_until = now + ep.next_cooldown
+                ep.next_cooldown = min(self.max_cooldown, ep.next_cooldown * 2)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [e.stats() for e in self.endpoints]
@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional
+from .base import LLMClient, current_request_class
+
+
+class LatencyTracker:
+    """线程安全地记录最近 window 次请求耗时，提供分位数查询。"""
+
+    def __init__(self, window: int = 500):
+        self._xs: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._xs.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._xs)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            xs = sorted(self._xs)
+        if not xs:
+            return None
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+class _Started:
+    """一次请求尝试真正开始执行的时刻（在线程池里排队的时间不计入超时）。"""
+    __slots__ = ("event", "at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.at = 0.0
+
+    def set(self):
+        self.at = time.monotonic()
+        self.event.set()
+
+
+class HedgedClient(LLMClient):
+    """
+    降低长尾延迟的 client 包装（test / judge 各包一层，各自统计）：
+
+    - 自适应超时：样本足够后，单次请求超时 = clamp(p99 × timeout_multiplier,
+      min_timeout, max_timeout)，max_timeout 即 ModelConfig.timeout
+    - 对冲请求：请求耗时超过当前 p95 仍未返回时，再发一个相同请求，取先返回者；
+      对冲请求数不超过总请求数的 hedge_budget 比例
+    - 延迟按请求类别（clients.base.request_class，如 choice / open / dialogue）分别统计，
+      短的选择题不会把长生成的超时压低；样本不足的类别用 max_timeout
+    - 超时从请求在线程池中真正开始执行时计起
+
+    放在 RateLimitedClient 里层使用；对冲请求受 hedge_budget 约束，不再单独限流。
+    max_workers 应不小于共享该 client 的全部调用方的在途请求总数 × 2（含对冲）。
+    """
+
+    def __init__(self, inner: LLMClient,
+                 max_timeout: float = 120,
+                 min_timeout: float = 10,
+                 timeout_multiplier: float = 3.0,
+                 hedge: bool = True,
+                 hedge_budget: float = 0.05,
+                 min_samples: int = 20,
+                 max_workers: int = 32):
+        self.inner = inner
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge = hedge
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.latencies: Dict[str, LatencyTracker] = {}
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def _tracker(self, cls: str) -> LatencyTracker:
+        with self._lock:
+            tr = self.latencies.get(cls)
+            if tr is None:
+                tr = self.latencies[cls] = LatencyTracker()
+            return tr
+
+    def current_timeout(self, cls: Optional[str] = None) -> float:
+        tr = self._tracker(cls or current_request_class())
+        p99 = tr.quantile(0.99) if len(tr) >= self.min_samples else None
+        if p99 is None:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p99 * self.timeout_multiplier))
+
+    def _hedge_delay(self, cls: str) -> Optional[float]:
+        tr = self._tracker(cls)
+        if not self.hedge or len(tr) < self.min_samples:
+            return None
+        return tr.quantile(0.95)
+
+    def _try_take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.hedge_budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def _attempt(self, started: _Started, cls: str, messages, model, temperature, timeout,
+                 response_format=None) -> str:
+        started.set()
+        out = self.inner.chat(messages, model=model, temperature=temperature, timeout=timeout,
+                              response_format=response_format)
+        self._tracker(cls).add(time.monotonic() - started.at)
+        return out
+
+    def chat(self, messages: List[Dict[str, str]],
+             model: Optional[str] = None,
+             temperature: Optional[float] = None,
+             timeout: Optional[float] = None,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
+        with self._lock:
+            self.requests += 1
+        cls = current_request_class()
+        timeout = timeout or self.current_timeout(cls)
+
+        started = _Started()
+        primary = self._pool.submit(self._attempt, started, cls, messages, model, temperature,
+                                    timeout, response_format)
+        pending = {primary}
+        started.event.wait()
+        deadline = started.at + timeout
+
+        delay = self._hedge_delay(cls)
+        if delay is not None:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._try_take_hedge():
+                pending.add(self._pool.submit(
+                    self._attempt, _Started(), cls, messages, model, temperature,
+                    max(0.1, deadline - time.monotonic()), response_format,
+                ))
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                if f.exception() is None:
+                    if f is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return f.result()
+                error = f.exception()
+
+        if error is not None:
+            raise error
+        with self._lock:
+            self.timeouts += 1
+        raise TimeoutError(f"request exceeded adaptive timeout {timeout:.1f}s")
+
+    def chat_batch(self, batch: List[List[Dict[str, str]]],
+                   model: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   timeout: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> List[str]:
+        """批量请求不做对冲（成本按批次放大），也不计入单条请求的延迟分布。"""
+        return self.inner.chat_batch(batch, model=model, temperature=temperature,
+                                     timeout=timeout or self.max_timeout, max_tokens=max_tokens)
+
+    def option_logprobs(self, messages: List[Dict[str, str]], letters: str,
+                        model: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Dict[str, float]:
+        """单 token 请求延迟短且稳定，不做对冲。"""
+        return self.inner.option_logprobs(messages, letters, model=model,
+                                          timeout=timeout or self.current_timeout())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            classes = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "by_class": {
+                cls: {
+                    "samples": len(self.latencies[cls]),
+                    "latency_p50": self.latencies[cls].quantile(0.5),
+                    "latency_p95": self.latencies[cls].quantile(0.95),
+                    "latency_p99": self.latencies[cls].quantile(0.99),
+                    "current_timeout": self.current_timeout(cls),
+                }
+                for cls in classes
+            },
+        }
@@ -1,31 +1,212 @@
 import requests
+import math
 import os
-from typing import List, Dict, Optional
+import threading
+import time
+from typing import Any, List, Dict, Optional
 from .base import LLMClient
+from .endpoints import EndpointPool
+from .usage import UsageMeter
+from utils.media import materialize_messages
+
+
+def _is_endpoint_fault(e: Exception) -> bool:
+    """连接失败 / 超时 / 429 / 5xx 记为副本故障（换副本重试）；其它 4xx 是请求本身的问题。"""
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return False
+
+
+def messages_to_prompt(messages: List[Dict[str, Any]]) -> str:
+    """
+    未配置 chat template 时 /completions 用的纯文本 prompt：单条 user 消息直接取其内容，
+    多条消息按 "role: content" 拼接。这与 /chat/completions 经模型 chat template 渲染后的
+    输入不同，指令微调模型的回答可能有差异（此类 record 带 prompt_format="role_prefixed"）。
+    """
+    if len(messages) == 1 and messages[0].get("role") == "user":
+        return messages[0]["content"]
+    turns = [f"{m['role']}: {m['content']}" for m in messages]
+    return "\n\n".join(turns) + "\n\nassistant:"
+
+
+_STRUCTURED_OUTPUT_HINTS = ("response_format", "json_schema", "guided_json", "structured output")
+
+
+def _rejects_structured_output(e: requests.HTTPError) -> bool:
+    """400/422 且错误信息指向 response_format / json_schema 本身（服务端不支持结构化输出）。"""
+    if e.response is None or e.response.status_code not in (400, 422):
+        return False
+    try:
+        body = e.response.text or ""
+    except Exception:
+        return False
+    body = body.lower()
+    return any(h in body for h in _STRUCTURED_OUTPUT_HINTS)
+
+
+_LETTER_STRIP = " \t\n<>()（）[]【】.．、:："
+
+
+def _letter_of(token: str, letters: str) -> Optional[str]:
+    """top_logprobs 中的 token（如 " A"、"<B"、"C."）-> 选项字母；不是选项时返回 None。"""
+    t = token.strip(_LETTER_STRIP).upper()
+    return t if len(t) == 1 and t in letters else None
+
 
 class OpenAIClient(LLMClient):
-    def __init__(self, api_base: str, api_key: str,
+    """
+    api_base 可以是单个地址，也可以是多个副本（列表或逗号分隔字符串）：
+    多副本时按最少在途请求路由，故障副本被熔断摘除，单次请求遇到副本故障会换副本重试。
+    """
+
+    def __init__(self, api_base: str | List[str], api_key: str,
                  default_model: str = "gpt-4o",
                  temperature: float = 0.0,
-                 timeout: int = 120):
-        self.api_base = api_base.rstrip("/")
+                 timeout: int = 120,
+                 eject_failures: int = 3,
+                 eject_seconds: float = 30.0,
+                 chat_template: Optional[str] = None):
+        bases = api_base.split(",") if isinstance(api_base, str) else list(api_base)
+        bases = [b.strip().rstrip("/") for b in bases if b.strip()]
+        self.pool = EndpointPool(bases, failure_threshold=eject_failures, cooldown=eject_seconds)
+        self.api_base = bases[0]
         self.api_key = api_key
         self.default_model = default_model
         self.temperature = temperature
         self.timeout = timeout
+        # 结构化输出（response_format）支持情况：None 未知；400/422 且错误信息指向
+        # response_format / json_schema 时置 False，其它 400/422（prompt 超长等）照常抛出
+        self.structured_output: Optional[bool] = None
+        self.usage = UsageMeter()   # 累计调用数 / token，供预算控制使用
+        # chat_batch 渲染 prompt 用的 HuggingFace tokenizer（名称或本地路径），None 时按角色拼接
+        self.chat_template = chat_template
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
 
+    @property
+    def batch_prompt_format(self) -> str:
+        """chat_batch 发出的 prompt 格式，写入微批 record 的 prompt_format 字段。"""
+        if self.chat_template:
+            return f"chat_template:{self.chat_template}"
+        return "role_prefixed"
+
+    def render_prompt(self, messages: List[Dict[str, Any]]) -> str:
+        """对话 -> /completions 的 prompt：有 chat_template 时用模型自己的模板渲染。"""
+        if not self.chat_template:
+            return messages_to_prompt(messages)
+        with self._tokenizer_lock:
+            if self._tokenizer is None:
+                try:
+                    from transformers import AutoTokenizer
+                except ImportError:
+                    raise ImportError("TEST_BATCH_CHAT_TEMPLATE 需要安装 transformers：pip install transformers")
+                self._tokenizer = AutoTokenizer.from_pretrained(self.chat_template)
+        return self._tokenizer.apply_chat_template(messages, tokenize=False,
+                                                   add_generation_prompt=True)
+
+    def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        tried = set()
+        while True:
+            ep = self.pool.acquire(exclude=tried)
+            t0 = time.monotonic()
+            try:
+                resp = requests.post(f"{ep.api_base}{path}", json=payload,
+                                     headers=headers, timeout=timeout or self.timeout)
+                resp.raise_for_status()
+                data = resp.json()
+            except Exception as e:
+                self.usage.add_failed()
+                fault = _is_endpoint_fault(e)
+                self.pool.release(ep, ok=not fault, seconds=time.monotonic() - t0)
+                tried.add(ep.api_base)
+                if fault and len(tried) < len(self.pool):
+                    continue
+                raise
+            self.pool.release(ep, ok=True, seconds=time.monotonic() - t0)
+            self.usage.add(data.get("usage"))
+            return data
 
     def chat(self, messages: List[Dict[str, str]],
              model: Optional[str] = None,
-             temperature: Optional[float] = None) -> str:
-        url = f"{self.api_base}/chat/completions"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
+             temperature: Optional[float] = None,
+             timeout: Optional[float] = None,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
         payload = {
             "model": model or self.default_model,
-            "messages": messages,
+            "messages": materialize_messages(messages),
             "temperature": self.temperature if temperature is None else temperature,
         }
-        resp = requests.post(url, json=payload, headers=headers, timeout=self.timeout)
-        resp.raise_for_status()
-        data = resp.json()
+        if response_format is not None and self.structured_output is not False:
+            try:
+                data = self._post("/chat/completions",
+                                  {**payload, "response_format": response_format}, timeout)
+                self.structured_output = True
+                return data["choices"][0]["message"]["content"].strip()
+            except requests.HTTPError as e:
+                if self.structured_output or not _rejects_structured_output(e):
+                    raise
+                self.structured_output = False   # 服务端不支持，之后都不再带 response_format
+        data = self._post("/chat/completions", payload, timeout)
         return data["choices"][0]["message"]["content"].strip()
+
+    def chat_batch(self, batch: List[List[Dict[str, str]]],
+                   model: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   timeout: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> List[str]:
+        """
+        多段对话合并成一次 /completions 请求（prompt 为列表，服务端内部批处理）。
+        prompt 由 render_prompt 生成（见 batch_prompt_format）。
+        含图片的对话无法转成纯文本 prompt，整批退回逐条 chat。
+        """
+        if any(not isinstance(m.get("content"), str) for msgs in batch for m in msgs):
+            return super().chat_batch(batch, model=model, temperature=temperature, timeout=timeout)
+        payload = {
+            "model": model or self.default_model,
+            "prompt": [self.render_prompt(msgs) for msgs in batch],
+            "temperature": self.temperature if temperature is None else temperature,
+        }
+        if self.chat_template:
+            # 模板已含 BOS 等特殊 token，避免服务端（vLLM）再加一次
+            payload["add_special_tokens"] = False
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        data = self._post("/completions", payload, timeout)
+        choices = sorted(data["choices"], key=lambda c: c.get("index", 0))
+        if len(choices) != len(batch):
+            raise ValueError(f"/completions 返回 {len(choices)} 条结果，请求了 {len(batch)} 条")
+        return [c["text"].strip() for c in choices]
+
+    def option_logprobs(self, messages: List[Dict[str, str]], letters: str,
+                        model: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Dict[str, float]:
+        """
+        /chat/completions，max_tokens=1 + top_logprobs。
+        同一字母的不同写法（"A" / " A" / "<A"）概率相加。
+        """
+        payload = {
+            "model": model or self.default_model,
+            "messages": materialize_messages(messages),
+            "temperature": 0.0,
+            "max_tokens": 1,
+            "logprobs": True,
+            "top_logprobs": 20,
+        }
+        data = self._post("/chat/completions", payload, timeout)
+        content = ((data["choices"][0].get("logprobs") or {}).get("content")) or []
+        if not content:
+            raise ValueError("服务端未返回 logprobs，无法使用 logprob 打分")
+        first = content[0]
+        cands = first.get("top_logprobs") or [first]
+        probs: Dict[str, float] = {}
+        for c in cands:
+            letter = _letter_of(c.get("token", ""), letters)
+            if letter is not None:
+                probs[letter] = probs.get(letter, 0.0) + math.exp(c["logprob"])
+        return {k: math.log(v) for k, v in probs.items()}
+
+    def endpoint_stats(self):
+        return self.pool.stats()
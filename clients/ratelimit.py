@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Any, List, Dict, Optional
+from .base import LLMClient
+
+
+class RateLimiter:
+    """
+    线程安全的限流器：
+    - requests_per_minute: 令牌桶，限制平均请求速率（允许 1 秒量级的突发）
+    - max_concurrency: 同时在途请求上限
+    两者都为 None 时不做任何限制。
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
+        self.rate = requests_per_minute / 60.0 if requests_per_minute else None
+        self.capacity = max(1.0, self.rate) if self.rate else 0.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._sem = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def _take_token(self):
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def __enter__(self):
+        if self._sem is not None:
+            self._sem.acquire()
+        try:
+            self._take_token()
+        except BaseException:
+            if self._sem is not None:
+                self._sem.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        if self._sem is not None:
+            self._sem.release()
+        return False
+
+
+class RateLimitedClient(LLMClient):
+    """
+    给任意 LLMClient 套一层限流；多模型 sweep 时每个模型各包一层，
+    共享底层 HTTP client 但各自独立计量。
+    """
+
+    def __init__(self, inner: LLMClient,
+                 requests_per_minute: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
+        self.inner = inner
+        self.limiter = RateLimiter(requests_per_minute, max_concurrency)
+
+    def chat(self, messages: List[Dict[str, str]],
+             model: Optional[str] = None,
+             temperature: Optional[float] = None,
+             timeout: Optional[float] = None,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
+        with self.limiter:
+            return self.inner.chat(messages, model=model, temperature=temperature,
+                                   timeout=timeout, response_format=response_format)
+
+    def chat_batch(self, batch: List[List[Dict[str, str]]],
+                   model: Optional[str] = None,
+                   temperature: Optional[float] = None,
+                   timeout: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> List[str]:
+        # 一个批次是一次 HTTP 请求，只占一个名额
+        with self.limiter:
+            return self.inner.chat_batch(batch, model=model, temperature=temperature,
+                                         timeout=timeout, max_tokens=max_tokens)
+
+    def option_logprobs(self, messages: List[Dict[str, str]], letters: str,
+                        model: Optional[str] = None,
+                        timeout: Optional[float] = None) -> Dict[str, float]:
+        with self.limiter:
+            return self.inner.option_logprobs(messages, letters, model=model, timeout=timeout)
@@ -0,0 +1,45 @@
+import threading
+from typing import Dict, Any, Optional
+
+
+class UsageMeter:
+    """
+    累计一个 HTTP client 的调用量（线程安全）：
+    - calls：发出的 HTTP 请求数（含失败）
+    - prompt_tokens / completion_tokens：取自响应的 usage 字段
+    - unmetered：响应没有 usage 字段的请求数（这部分 token 未计入）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.unmetered = 0
+
+    def add(self, usage: Optional[Dict[str, Any]]):
+        with self._lock:
+            self.calls += 1
+            if not usage:
+                self.unmetered += 1
+                return
+            self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            self.completion_tokens += int(usage.get("completion_tokens") or 0)
+
+    def add_failed(self):
+        with self._lock:
+            self.calls += 1
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "tokens": self.prompt_tokens + self.completion_tokens,
+                "unmetered_calls": self.unmetered,
+            }
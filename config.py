@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import List, Optional
 import os
 
 @dataclass
@@ -8,12 +9,52 @@ class ModelConfig:
     model: str
     temperature: float = 0.0
     timeout: int = 120
+    max_concurrency: int = 4                     # 单个模型同时在途请求上限
+    requests_per_minute: Optional[float] = None  # 单个模型的速率上限，None 不限
+    adaptive_timeout: bool = False               # 按观测延迟分布自适应超时（上限为 timeout）
+    hedge: bool = False                          # 超过 p95 仍未返回时发对冲请求
+    hedge_budget: float = 0.05                   # 对冲请求占总请求数的比例上限
+    eject_failures: int = 3                      # 多副本：单个副本连续失败几次后熔断摘除
+    eject_seconds: float = 30.0                  # 多副本：熔断时长（连续熔断翻倍）
+    batch_size: int = 1                          # >1 时选择题合并为多 prompt 的 /completions 请求
+    batch_wait: float = 0.05                     # 微批最长等待（秒）
+    batch_max_tokens: int = 32                   # 微批请求的 max_tokens（选择题答案很短）
+    batch_chat_template: Optional[str] = None    # 微批 prompt 用该 HF tokenizer 的 chat template 渲染，None 按角色拼接
+    budget_tokens: Optional[int] = None          # 整次运行的 token 预算（prompt + completion），None 不限
+    budget_calls: Optional[int] = None           # 整次运行的 HTTP 调用数预算，None 不限
+
+    @property
+    def api_bases(self) -> List[str]:
+        """api_base 支持逗号分隔的多个副本地址。"""
+        return [b.strip() for b in self.api_base.split(",") if b.strip()]
+
+    @property
+    def total_concurrency(self) -> int:
+        """max_concurrency 按每个副本计，多副本时总并发随副本数线性增加。"""
+        return self.max_concurrency * max(1, len(self.api_bases))
+
 
 @dataclass
 class EvalConfig:
     """整体评测配置，包含待测模型和裁判模型两套配置。"""
     test: ModelConfig
     judge: ModelConfig
+    # TEST_MODEL 可以是逗号分隔的多个模型（sweep 模式），test.model 为其中第一个
+    test_models: List[str] = field(default_factory=list)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_rpm(name: str) -> Optional[float]:
+    v = os.getenv(name, "").strip()
+    return float(v) if v else None
+
+
+def _env_int(name: str) -> Optional[int]:
+    v = os.getenv(name, "").strip()
+    return int(v) if v else None
 
 
 def load_eval_config() -> EvalConfig:
@@ -22,16 +63,42 @@ def load_eval_config() -> EvalConfig:
     - TEST_API_BASE / TEST_API_KEY / TEST_MODEL
     - JUDGE_API_BASE / JUDGE_API_KEY / JUDGE_MODEL
     如果没单独配，就回落到 OPENAI_API_BASE / OPENAI_API_KEY。
+    TEST_MODEL 支持逗号分隔多个模型，例如 "gpt-5.1,qwen2.5-72b"。
+    {TEST,JUDGE}_MAX_CONCURRENCY / {TEST,JUDGE}_RPM 为每个模型各自的限流。
+    {TEST,JUDGE}_ADAPTIVE_TIMEOUT / _HEDGE / _HEDGE_BUDGET 控制自适应超时与对冲请求。
+    {TEST,JUDGE}_API_BASE 可以逗号分隔多个副本（如多个 vLLM 实例），
+    {TEST,JUDGE}_EJECT_FAILURES / _EJECT_SECONDS 控制副本熔断。
+    TEST_BATCH_SIZE / TEST_BATCH_WAIT / TEST_BATCH_MAX_TOKENS 控制选择题微批（vLLM 等支持多 prompt 的服务端），
+    TEST_BATCH_CHAT_TEMPLATE 为渲染微批 prompt 的 tokenizer（需 transformers，建议与服务端模型一致）。
+    {TEST,JUDGE}_BUDGET_TOKENS / _BUDGET_CALLS 为各自的运行预算（配合 main.py --degrade 降级）。
     """
+    test_models = [m.strip() for m in os.getenv("TEST_MODEL", "gpt-5.1").split(",")
+                   if m.strip()]
+    if not test_models:
+        raise ValueError(f"TEST_MODEL 未指定任何模型：{os.getenv('TEST_MODEL')!r}，"
+                         f"应为模型名或逗号分隔的多个模型名，例如 \"gpt-5.1,qwen2.5-72b\"")
     common_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
     common_key  = os.getenv("OPENAI_API_KEY", "")
 
     test_cfg = ModelConfig(
         api_base=os.getenv("TEST_API_BASE", common_base),
         api_key=os.getenv("TEST_API_KEY",  common_key),
-        model=os.getenv("TEST_MODEL", "gpt-5.1"),
+        model=test_models[0],
         temperature=float(os.getenv("TEST_TEMPERATURE", "0.0")),
         timeout=int(os.getenv("TEST_TIMEOUT", "120")),
+        max_concurrency=int(os.getenv("TEST_MAX_CONCURRENCY", "4")),
+        requests_per_minute=_env_rpm("TEST_RPM"),
+        adaptive_timeout=_env_flag("TEST_ADAPTIVE_TIMEOUT"),
+        hedge=_env_flag("TEST_HEDGE"),
+        hedge_budget=float(os.getenv("TEST_HEDGE_BUDGET", "0.05")),
+        eject_failures=int(os.getenv("TEST_EJECT_FAILURES", "3")),
+        eject_seconds=float(os.getenv("TEST_EJECT_SECONDS", "30")),
+        batch_size=int(os.getenv("TEST_BATCH_SIZE", "1")),
+        batch_wait=float(os.getenv("TEST_BATCH_WAIT", "0.05")),
+        batch_max_tokens=int(os.getenv("TEST_BATCH_MAX_TOKENS", "32")),
+        batch_chat_template=os.getenv("TEST_BATCH_CHAT_TEMPLATE") or None,
+        budget_tokens=_env_int("TEST_BUDGET_TOKENS"),
+        budget_calls=_env_int("TEST_BUDGET_CALLS"),
     )
 
     judge_cfg = ModelConfig(
@@ -40,6 +107,15 @@ def load_eval_config() -> EvalConfig:
         model=os.getenv("JUDGE_MODEL", "gpt-4o"),
         temperature=float(os.getenv("JUDGE_TEMPERATURE", "0.0")),
         timeout=int(os.getenv("JUDGE_TIMEOUT", "120")),
+        max_concurrency=int(os.getenv("JUDGE_MAX_CONCURRENCY", "4")),
+        requests_per_minute=_env_rpm("JUDGE_RPM"),
+        adaptive_timeout=_env_flag("JUDGE_ADAPTIVE_TIMEOUT"),
+        hedge=_env_flag("JUDGE_HEDGE"),
+        hedge_budget=float(os.getenv("JUDGE_HEDGE_BUDGET", "0.05")),
+        eject_failures=int(os.getenv("JUDGE_EJECT_FAILURES", "3")),
+        eject_seconds=float(os.getenv("JUDGE_EJECT_SECONDS", "30")),
+        budget_tokens=_env_int("JUDGE_BUDGET_TOKENS"),
+        budget_calls=_env_int("JUDGE_BUDGET_CALLS"),
     )
 
-    return EvalConfig(test=test_cfg, judge=judge_cfg)
+    return EvalConfig(test=test_cfg, judge=judge_cfg, test_models=test_models)
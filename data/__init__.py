@@ -1,4 +1,5 @@
 from .schema import EvalDataset, Item, Metadata
-from .loader import load_dataset
+from .loader import load_dataset, compile_dataset
+from .compact import CompactItem
 
-__all__ = ["EvalDataset", "Item", "Metadata", "load_dataset"]
+__all__ = ["EvalDataset", "Item", "Metadata", "load_dataset", "compile_dataset", "CompactItem"]
@@ -0,0 +1,81 @@
+# medeval/data/compact.py
+"""
+可信数据的快速加载路径：紧凑的 __slots__ 题目视图
+
+- 不做 pydantic 逐字段校验（只用于已经校验过 / compile 过的数据集）
+- __slots__ 对象没有 __dict__；列表字段存为 tuple，空默认值全局共享
+- metadata 中高度重复的短字符串（分类、题型、难度、来源、tag、prompt 模板）做 intern，
+  10 万题共享同一份字符串对象
+
+字段名与 schema.Item / Metadata / ScoringPoint 保持一致，评测代码按鸭子类型直接使用。
+"""
+import sys
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+_EMPTY: tuple = ()
+_EMPTY_MAP = MappingProxyType({})
+
+
+def _intern(s: Optional[str]) -> Optional[str]:
+    return sys.intern(s) if isinstance(s, str) else s
+
+
+class CompactScoringPoint:
+    __slots__ = ("criterion", "points", "tags")
+
+    def __init__(self, criterion: str, points: int, tags: tuple = _EMPTY):
+        self.criterion = criterion
+        self.points = points
+        self.tags = tags
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "CompactScoringPoint":
+        tags = d.get("tags")
+        return cls(d["criterion"], d["points"],
+                   tuple(_intern(t) for t in tags) if tags else _EMPTY)
+
+
+class CompactMetadata:
+    __slots__ = ("category1", "category2", "task", "tags", "type", "score",
+                 "difficulity", "prompt_template", "dialogue", "synonyms",
+                 "positive_scoring_points", "negative_scoring_points", "source")
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "CompactMetadata":
+        m = cls.__new__(cls)
+        m.category1 = _intern(d.get("category1"))
+        m.category2 = _intern(d.get("category2"))
+        m.task = _intern(d.get("task"))
+        m.tags = tuple(_intern(t) for t in d["tags"]) if d.get("tags") else _EMPTY
+        m.type = _intern(d["type"])
+        m.score = d.get("score", 1)
+        m.difficulity = _intern(d.get("difficulity"))
+        m.prompt_template = _intern(d.get("prompt_template"))
+        m.dialogue = tuple(d["dialogue"]) if d.get("dialogue") else _EMPTY
+        m.synonyms = d.get("synonyms") or _EMPTY_MAP
+        pos = d.get("positive_scoring_points")
+        neg = d.get("negative_scoring_points")
+        m.positive_scoring_points = (tuple(CompactScoringPoint.from_dict(p) for p in pos)
+                                     if pos else _EMPTY)
+        m.negative_scoring_points = (tuple(CompactScoringPoint.from_dict(n) for n in neg)
+                                     if neg else _EMPTY)
+        m.source = _intern(d.get("source"))
+        return m
+
+
+class CompactItem:
+    __slots__ = ("question_id", "question", "answer", "options", "metadata",
+                 "multimodal_data", "answer_pred")
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "CompactItem":
+        it = cls.__new__(cls)
+        it.question_id = d["question_id"]
+        it.question = d["question"]
+        it.answer = d["answer"]
+        it.options = tuple(d["options"]) if d.get("options") else _EMPTY
+        it.metadata = CompactMetadata.from_dict(d["metadata"])
+        it.multimodal_data = tuple(d["multimodal_data"]) if d.get("multimodal_data") else _EMPTY
+        it.answer_pred = d.get("answer_pred")
+        return it
@@ -1,14 +1,121 @@
-import json, random
+import json, random, hashlib
+from collections import defaultdict
 from pathlib import Path
-from .schema import EvalDataset
+from typing import Any, Dict, List, Sequence, Tuple
+from .schema import EvalDataset, DatasetMetadata
+from .compact import CompactItem
+
+# compile 产物的标记；带此标记的文件视为已校验，走快速加载路径
+COMPILED_KEY = "_compiled"
+COMPILED_VERSION = 1
+
+# 分层抽样可用的 metadata 字段
+STRATA_FIELDS = ("category1", "category2", "type", "difficulity")
+
+
+def stratum_key(item: Any, fields: Sequence[str]) -> Tuple:
+    return tuple(getattr(item.metadata, f, None) for f in fields)
+
+
+def group_by_stratum(items: Sequence[Any], fields: Sequence[str]) -> Dict[Tuple, List[Any]]:
+    groups: Dict[Tuple, List[Any]] = defaultdict(list)
+    for it in items:
+        groups[stratum_key(it, fields)].append(it)
+    return dict(groups)
+
+
+def stratified_sample(items: Sequence[Any], fields: Sequence[str], n: int,
+                      seed: int = 42) -> List[Any]:
+    """
+    按 fields 分层、按比例分配名额（最大余数法），每层至少 1 个（n 足够时）。
+    返回的题目保持原数据集中的相对顺序。
+    """
+    if n >= len(items):
+        return list(items)
+    rnd = random.Random(seed)
+    groups = group_by_stratum(items, fields)
+    total = len(items)
+
+    quota = {k: n * len(v) / total for k, v in groups.items()}
+    alloc = {k: int(q) for k, q in quota.items()}
+    if n >= len(groups):
+        for k in alloc:
+            alloc[k] = max(1, alloc[k])
+    # 最大余数法补齐 / 削减到恰好 n
+    by_rem = sorted(groups, key=lambda k: (quota[k] - int(quota[k]), len(groups[k])), reverse=True)
+    i = 0
+    while sum(alloc.values()) < n:
+        k = by_rem[i % len(by_rem)]
+        if alloc[k] < len(groups[k]):
+            alloc[k] += 1
+        i += 1
+    while sum(alloc.values()) > n:
+        # 每层至少 1 个导致超额时，从超配最多的层里扣
+        k = max((k for k in alloc if alloc[k] > 1), key=lambda k: alloc[k] - quota[k])
+        alloc[k] -= 1
+
+    chosen = set()
+    for k in sorted(groups, key=repr):
+        for it in rnd.sample(groups[k], alloc[k]):
+            chosen.add(id(it))
+    return [it for it in items if id(it) in chosen]
+
 
 def load_dataset(path: str | Path, seed: int = 42,
-                 max_examples: int | None = None) -> EvalDataset:
+                 max_examples: int | None = None,
+                 trusted: bool | None = None,
+                 stratify_by: Sequence[str] | None = None) -> EvalDataset:
+    """
+    trusted:
+      - None（默认）：compile 过的数据集自动走快速路径，其它数据完整校验
+      - True ：强制快速路径（调用方保证数据已校验过）
+      - False：强制 pydantic 完整校验
+    快速路径用 model_construct 跳过校验，题目为 data.compact.CompactItem 紧凑视图。
+    max_examples 配合 stratify_by（如 ["category1", "type"]）时按层比例抽样，
+    否则为打乱后截断。
+    """
     data = json.loads(Path(path).read_text(encoding="utf-8"))
-    ds = EvalDataset(**data)
+    if trusted is None:
+        trusted = data.get(COMPILED_KEY, {}).get("version") == COMPILED_VERSION
+
+    if trusted:
+        ds = EvalDataset.model_construct(
+            dataset_metadata=DatasetMetadata(**data["dataset_metadata"]),
+            dataset=[CompactItem.from_dict(d) for d in data["dataset"]],
+        )
+    else:
+        data.pop(COMPILED_KEY, None)
+        ds = EvalDataset(**data)
     items = ds.dataset
-    if max_examples is not None:
+    if max_examples is not None and stratify_by:
+        ds.dataset = stratified_sample(items, stratify_by, max_examples, seed=seed)
+    elif max_examples is not None:
         rnd = random.Random(seed)
         rnd.shuffle(items)
         ds.dataset = items[:max_examples]
     return ds
+
+
+def compile_dataset(src: str | Path, dst: str | Path | None = None) -> Path:
+    """
+    完整校验一次数据集，写出补全默认值后的 {name}.compiled.json；
+    之后 load_dataset 读取该文件时跳过校验，直接构造紧凑视图。
+    """
+    src = Path(src)
+    dst = Path(dst) if dst else src.with_name(src.stem + ".compiled.json")
+    raw = src.read_bytes()
+    data = json.loads(raw.decode("utf-8"))
+    data.pop(COMPILED_KEY, None)
+    ds = EvalDataset(**data)
+
+    out = {
+        COMPILED_KEY: {
+            "version": COMPILED_VERSION,
+            "source": src.name,
+            "source_sha1": hashlib.sha1(raw).hexdigest(),
+        },
+        **ds.model_dump(),
+    }
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.write_text(json.dumps(out, ensure_ascii=False), encoding="utf-8")
+    return dst
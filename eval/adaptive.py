@@ -0,0 +1,169 @@
+# medeval/eval/adaptive.py
+# -*- coding: utf-8 -*-
+"""
+分层自适应评测（序贯早停）
+
+- 按 metadata 字段（category1 / category2 / type / difficulity）分层
+- 每轮从每个未收敛的层随机抽 batch_size 道题评测
+- 同一道题的各 variant（base / shuffle / nota）高度相关，不能当作独立样本：
+  先聚合为每题一个得分（已评测 variant 的 ok 比例），置信区间的 n 为题数
+- 某层准确率的 Wilson 置信区间宽度 <= target_width（且样本数 >= min_items）即收敛，
+  不再抽该层；全部层收敛或抽完即停止
+"""
+
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from data.schema import EvalDataset
+from data.loader import group_by_stratum, stratum_key
+from clients.base import LLMClient
+from judge.base import Judge
+from eval.evaluator import (
+    normalize_choice_modes,
+    iter_work_units,
+    evaluate_unit,
+    run_units,
+    build_result,
+    attach_budget,
+)
+from eval.retry import RetryPolicy
+from eval.budget import BudgetGovernor
+
+
+class AdaptiveConfig(NamedTuple):
+    strata: Tuple[str, ...] = ("category1", "type")
+    target_width: float = 0.1     # 置信区间总宽度（上界 - 下界）
+    confidence: float = 0.95
+    batch_size: int = 10          # 每轮每层抽的题数
+    min_items: int = 10           # 每层至少评测的题数
+    seed: int = 42
+
+
+def wilson_interval(ok: float, n: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """ok 可以是小数（每题得分在 [0, 1] 内时为得分之和）。"""
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = ok / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def run_eval_adaptive(dataset: EvalDataset,
+                      client: LLMClient,
+                      judge: Judge,
+                      test_model: str,
+                      choice_modes: Optional[List[str]] = None,
+                      cfg: Optional[AdaptiveConfig] = None,
+                      workers: int = 1,
+                      retry: Optional[RetryPolicy] = None,
+                      choice_scoring: str = "generate",
+                      governor: Optional[BudgetGovernor] = None) -> Dict[str, Any]:
+    """
+    返回与 run_eval 相同结构的结果（只含实际评测过的题），
+    summary 额外带 "adaptive" 段：每层的样本数、准确率、置信区间、是否收敛。
+    governor 同 run_eval；预算耗尽后不再开始新的一轮。
+    """
+    cfg = cfg or AdaptiveConfig()
+    choice_modes = normalize_choice_modes(choice_modes)
+    ds_id = dataset.dataset_metadata.dataset_id
+    rnd = random.Random(cfg.seed)
+
+    units_by_item: Dict[int, list] = {}
+    for u in iter_work_units(dataset, choice_modes):
+        units_by_item.setdefault(id(u.item), []).append(u)
+
+    pools: Dict[Tuple, List[Any]] = {}
+    for k, items in group_by_stratum(dataset.dataset, cfg.strata).items():
+        items = [it for it in items if id(it) in units_by_item]  # 跳过不评测的题型
+        if items:
+            rnd.shuffle(items)
+            pools[k] = items
+
+    # items：已抽取的题数；scored_items / score：至少有一条 record 的题数及每题得分之和
+    stats = {k: {"items": 0, "records": 0, "scored_items": 0, "score": 0.0, "converged": False}
+             for k in pools}
+    done_units: List[Any] = []
+    done_outs: List[Optional[Dict[str, Any]]] = []
+    done_failures: Dict[int, Dict[str, Any]] = {}
+    rounds = 0
+
+    def _active() -> List[Tuple]:
+        return [k for k in pools if pools[k] and not stats[k]["converged"]]
+
+    while _active() and (governor is None or governor.exhausted is None):
+        rounds += 1
+        batch_units = []
+        for k in _active():
+            take, pools[k] = pools[k][:cfg.batch_size], pools[k][cfg.batch_size:]
+            stats[k]["items"] += len(take)
+            for it in take:
+                batch_units.extend(units_by_item[id(it)])
+
+        outs, failures = run_units(
+            batch_units, [test_model],
+            lambda m, u: evaluate_unit(client, judge, u, m, choice_scoring),
+            ds_id, workers=workers, retry=retry, governor=governor,
+        )[test_model]
+
+        per_item: Dict[int, List[int]] = {}   # id(item) -> 各 variant 的 ok
+        for pos, (u, rec) in enumerate(zip(batch_units, outs)):
+            if pos in failures:
+                done_failures[len(done_units)] = failures[pos]
+            elif rec is not None:
+                per_item.setdefault(id(u.item), []).append(1 if rec.get("ok") else 0)
+                stats[stratum_key(u.item, cfg.strata)]["records"] += 1
+            done_units.append(u)
+            done_outs.append(rec)
+        for u in batch_units:
+            oks = per_item.pop(id(u.item), None)
+            if oks:
+                st = stats[stratum_key(u.item, cfg.strata)]
+                st["scored_items"] += 1
+                st["score"] += sum(oks) / len(oks)
+
+        for k in _active():
+            st = stats[k]
+            lo, hi = wilson_interval(st["score"], st["scored_items"], cfg.confidence)
+            if st["scored_items"] >= cfg.min_items and hi - lo <= cfg.target_width:
+                st["converged"] = True
+
+    # 按单机顺序输出
+    order = sorted(range(len(done_units)), key=lambda i: done_units[i].index)
+    units = [done_units[i] for i in order]
+    outs = [done_outs[i] for i in order]
+    failures = {new: done_failures[old] for new, old in enumerate(order) if old in done_failures}
+    res = build_result(dataset, units, outs, failures, choice_modes, test_model)
+    if governor is not None:
+        attach_budget(res, governor, units, ds_id, test_model)
+
+    strata_report = []
+    for k, st in stats.items():
+        lo, hi = wilson_interval(st["score"], st["scored_items"], cfg.confidence)
+        strata_report.append({
+            "stratum": dict(zip(cfg.strata, k)),
+            "items": st["items"],
+            "scored_items": st["scored_items"],
+            "records": st["records"],
+            "accuracy": st["score"] / st["scored_items"] if st["scored_items"] else 0.0,
+            "ci_low": lo,
+            "ci_high": hi,
+            "converged": st["converged"],
+        })
+    n_total = sum(len(v) for v in units_by_item.values())
+    n_evaluated = len(units) - len(res.get("skipped", []))
+    res["summary"]["adaptive"] = {
+        "strata_fields": list(cfg.strata),
+        "target_width": cfg.target_width,
+        "confidence": cfg.confidence,
+        "rounds": rounds,
+        "work_units_evaluated": n_evaluated,
+        "work_units_total": n_total,
+        "fraction_evaluated": n_evaluated / n_total if n_total else 0.0,
+        "strata": strata_report,
+    }
+    return res
@@ -0,0 +1,234 @@
+# medeval/eval/budget.py
+# -*- coding: utf-8 -*-
+"""
+运行预算控制（token / 调用数 / 墙钟时间）
+
+- 预算按 client 计：test / judge 各自的 token 上限、调用数上限（取自各自 HTTP client 的
+  UsageMeter），外加整次运行的墙钟时间上限
+- 压力 = 各项 已用 / 上限 的最大值；压力达到降级策略中某一步的阈值时启用该步（只进不退）：
+    drop_variants  剩余选择题只测 base，跳过 shuffle / nota
+    rule_judge     开放题裁判从 LLM 切换为 RuleJudge
+    subsample      剩余题目按 question_id 稳定哈希只保留 subsample_rate 比例
+- 压力达到 1 时停止派发剩余工作单元；judge 预算单独耗尽时只强制 rule_judge，不停止评测
+- 被跳过的单元不出现在 records 中（也不进 dead-letter），而是列在结果的 "skipped" 段
+  （index / question_id / variant / reason），分片合并与 --retry_failed 据此认定覆盖情况；
+  降级过程写入 summary["budget"]
+"""
+
+import threading
+import time
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from clients.usage import UsageMeter
+from judge.base import Judge
+from judge.rule_judge import RuleJudge
+from data.schema import ScoringPoint
+from eval.shard import shard_of
+
+DEGRADATIONS = ("drop_variants", "rule_judge", "subsample")
+DEFAULT_POLICY = (("drop_variants", 0.7), ("rule_judge", 0.8), ("subsample", 0.9))
+_SUBSAMPLE_BUCKETS = 10000
+
+
+class BudgetLimits(NamedTuple):
+    tokens: Optional[int] = None    # prompt + completion
+    calls: Optional[int] = None
+
+
+def parse_policy(specs: Sequence[str]) -> List[Tuple[str, float]]:
+    """["drop_variants@0.7", "rule_judge@0.8"] -> [(步骤, 压力阈值)]，按阈值排序。"""
+    policy = []
+    for spec in specs:
+        name, _, frac = spec.partition("@")
+        if name not in DEGRADATIONS:
+            raise ValueError(f"未知的降级步骤：{name!r}，可选 {DEGRADATIONS}")
+        try:
+            at = float(frac) if frac else dict(DEFAULT_POLICY)[name]
+        except ValueError:
+            raise ValueError(f"非法的降级阈值：{spec!r}，应为 步骤@比例，例如 rule_judge@0.8")
+        if not 0 < at <= 1:
+            raise ValueError(f"降级阈值须在 (0, 1] 内：{spec!r}")
+        policy.append((name, at))
+    return sorted(policy, key=lambda p: p[1])
+
+
+class BudgetGovernor:
+    """
+    一次运行共用一个实例（跨数据集、跨模型）。
+    limits / meters 以角色（"test" / "judge"）为 key；没有配置上限的角色只记录用量。
+    """
+
+    def __init__(self, limits: Dict[str, BudgetLimits],
+                 meters: Dict[str, UsageMeter],
+                 seconds: Optional[float] = None,
+                 policy: Sequence[Tuple[str, float]] = DEFAULT_POLICY,
+                 subsample_rate: float = 0.5):
+        self.limits = limits
+        self.meters = meters
+        self.seconds = seconds
+        self.policy = list(policy)
+        self.subsample_rate = subsample_rate
+        self.t0 = time.monotonic()
+        self.active: Dict[str, Dict[str, Any]] = {}     # 步骤 -> 启用时的快照
+        self.exhausted: Optional[Dict[str, Any]] = None
+        # (模型, dataset_id) -> {(question_id, variant): 原因}
+        self.skipped: Dict[Tuple[str, str], Dict[Tuple[str, Optional[str]], str]] = {}
+        self._lock = threading.Lock()
+
+    def pressure(self, roles: Optional[Sequence[str]] = None,
+                 with_time: bool = True) -> Tuple[float, str]:
+        """(压力, 触发项)：roles（缺省为全部角色）各项用量及墙钟时间中占比最大的一项。"""
+        worst = (0.0, "")
+        if with_time and self.seconds:
+            worst = ((time.monotonic() - self.t0) / self.seconds, "seconds")
+        for r, lim in self.limits.items():
+            if roles is not None and r not in roles:
+                continue
+            m = self.meters.get(r)
+            if m is None:
+                continue
+            for name, used, cap in (("tokens", m.tokens, lim.tokens), ("calls", m.calls, lim.calls)):
+                if cap and used / cap > worst[0]:
+                    worst = (used / cap, f"{r}.{name}")
+        return worst
+
+    def _snapshot(self, p: float, trigger: str) -> Dict[str, Any]:
+        return {"pressure": round(p, 4), "trigger": trigger,
+                "elapsed_seconds": round(time.monotonic() - self.t0, 1),
+                "spent": {r: m.stats() for r, m in self.meters.items()}}
+
+    def check(self):
+        """按当前压力启用降级步骤 / 标记预算耗尽。"""
+        p, trigger = self.pressure()
+        with self._lock:
+            for name, at in self.policy:
+                if p >= at and name not in self.active:
+                    self.active[name] = {"at": at, **self._snapshot(p, trigger)}
+            jp, jtrigger = self.pressure(["judge"], with_time=False)
+            if jp >= 1.0 and "rule_judge" not in self.active:
+                self.active["rule_judge"] = {"at": 1.0, **self._snapshot(jp, jtrigger)}
+            if self.exhausted is None and p >= 1.0:
+                # judge 预算耗尽只强制 rule_judge；test 预算或时间耗尽才停止派发
+                sp, strigger = self.pressure([r for r in self.limits if r != "judge"])
+                if sp >= 1.0:
+                    self.exhausted = self._snapshot(sp, strigger)
+
+    def is_active(self, name: str) -> bool:
+        return name in self.active
+
+    def skip_reason(self, dataset_id: str, unit: Any) -> Optional[str]:
+        self.check()
+        if self.exhausted is not None:
+            return "budget_exhausted"
+        if self.is_active("drop_variants") and unit.variant in ("shuffle", "nota"):
+            return "drop_variants"
+        if self.is_active("subsample") and shard_of(
+                dataset_id, unit.item.question_id, None, _SUBSAMPLE_BUCKETS) \
+                >= self.subsample_rate * _SUBSAMPLE_BUCKETS:
+            return "subsample"
+        return None
+
+    def instrument(self, evaluate: Callable[[str, Any], Dict[str, Any]],
+                   dataset_id: str) -> Callable[[str, Any], Optional[Dict[str, Any]]]:
+        """包装 evaluate：执行前检查预算，跳过的单元返回 None（不算失败）。"""
+        def _evaluate(model: str, unit: Any) -> Optional[Dict[str, Any]]:
+            reason = self.skip_reason(dataset_id, unit)
+            if reason is not None:
+                self.mark_skipped(model, dataset_id, unit.item.question_id, unit.variant, reason)
+                return None
+            self.unmark_skipped(model, dataset_id, unit.item.question_id, unit.variant)
+            return evaluate(model, unit)
+        return _evaluate
+
+    def mark_skipped(self, model: str, dataset_id: str, question_id: str,
+                     variant: Optional[str], reason: str):
+        with self._lock:
+            self.skipped.setdefault((model, dataset_id), {})[(question_id, variant)] = reason
+
+    def unmark_skipped(self, model: str, dataset_id: str, question_id: str,
+                       variant: Optional[str]):
+        """--retry_failed 续跑之前跳过的单元时，这次实际评测了就不再算跳过。"""
+        with self._lock:
+            self.skipped.get((model, dataset_id), {}).pop((question_id, variant), None)
+
+    def skip_reason_of(self, model: str, dataset_id: str, question_id: str,
+                       variant: Optional[str]) -> Optional[str]:
+        return self.skipped.get((model, dataset_id), {}).get((question_id, variant))
+
+    def skipped_entries(self, model: str, dataset_id: str,
+                        units: Sequence[Any]) -> List[Dict[str, Any]]:
+        """结果文件的 "skipped" 段：units 中被跳过的单元（按单机顺序号）。"""
+        out = []
+        for u in units:
+            reason = self.skip_reason_of(model, dataset_id, u.item.question_id, u.variant)
+            if reason is not None:
+                out.append({"index": u.index, "question_id": u.item.question_id,
+                            "variant": u.variant, "reason": reason})
+        return out
+
+    def report(self, dataset_id: Optional[str] = None,
+               records: Sequence[Dict[str, Any]] = (),
+               test_model: Optional[str] = None) -> Dict[str, Any]:
+        """summary["budget"]：上限、已用量、已启用的降级步骤、该 (数据集, 模型) 被跳过 / 降级的单元。"""
+        self.check()
+        out: Dict[str, Any] = {
+            "limits": {r: {k: v for k, v in lim._asdict().items() if v} for r, lim in self.limits.items()},
+            "seconds_limit": self.seconds,
+            "elapsed_seconds": round(time.monotonic() - self.t0, 1),
+            "spent": {r: m.stats() for r, m in self.meters.items()},
+            "policy": [{"step": n, "at": at} for n, at in self.policy],
+            "degradations": dict(self.active),
+        }
+        if self.exhausted is not None:
+            out["exhausted"] = self.exhausted
+        if dataset_id is not None:
+            counts: Dict[str, int] = {}
+            with self._lock:
+                for (m, ds), keys in self.skipped.items():
+                    if ds != dataset_id or (test_model is not None and m != test_model):
+                        continue
+                    for reason in keys.values():
+                        counts[reason] = counts.get(reason, 0) + 1
+            out["skipped_units"] = counts
+        if dataset_id is not None and self.is_active("rule_judge"):
+            fp = BudgetedJudge.FALLBACK.fingerprint()
+            out["rule_judged_open_records"] = sum(
+                1 for r in records if r.get("type") == "open_response" and r.get("judge_hash") == fp)
+        return out
+
+
+class BudgetedJudge(Judge):
+    """
+    rule_judge 降级启用后，开放题改由 RuleJudge 评分。
+    fingerprint 按当前线程最近一次实际使用的裁判返回，降级评分的 record 带 RuleJudge 的
+    judge_hash，之后预算充足时可以用 `main.py rejudge` 补判。
+    """
+
+    FALLBACK = RuleJudge()
+
+    def __init__(self, primary: Judge, governor: BudgetGovernor):
+        self.primary = primary
+        self.governor = governor
+        self._last = threading.local()
+
+    def score_single_choice(self,
+                            gt_letters: List[str],
+                            pred_letters: List[str],
+                            total_score: int) -> Dict[str, Any]:
+        return self.primary.score_single_choice(gt_letters, pred_letters, total_score)
+
+    def score_open_response(self,
+                            question: str,
+                            positive_points: List[ScoringPoint],
+                            negative_points: List[ScoringPoint],
+                            answer: str,
+                            total_score: int,
+                            synonyms: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+        self.governor.check()
+        judge = self.FALLBACK if self.governor.is_active("rule_judge") else self.primary
+        self._last.judge = judge
+        return judge.score_open_response(question, positive_points, negative_points,
+                                         answer, total_score, synonyms)
+
+    def fingerprint(self) -> str:
+        return getattr(self._last, "judge", self.primary).fingerprint()
@@ -0,0 +1,229 @@
+# medeval/eval/dedup.py
+# -*- coding: utf-8 -*-
+"""
+近重复题检测（MinHash + LSH），跨全部 --data 数据集
+
+- 文本：normalize(question) + 排序后的 normalize(options)，选项换序仍视为相同；
+  带图片的题再加上图片标识（本地文件取内容哈希，URL 原样），题干相同但图片不同的题不算重复
+- 字符 n-gram shingle → MinHash 签名 → LSH 分桶找候选对 → 精确 Jaccard 复核 → 并查集成簇
+- 哈希全部基于 crc32 + 固定种子，跨进程 / 跨节点结果一致（分片运行依赖这一点）
+
+簇内再按 (题型, 答案签名) 划分“评测组”：只有答案一致的近重复题才共享评测结果，
+避免把选项顺序 / 正确答案不同的题误合并。
+"""
+
+import hashlib
+import random
+import zlib
+from collections import defaultdict
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from data.schema import EvalDataset, Item
+from utils.media import image_parts, get_image_cache
+from utils.text import normalize
+
+_PRIME = (1 << 61) - 1
+
+ItemKey = Tuple[str, str]   # (dataset_id, question_id)
+
+
+class DedupConfig(NamedTuple):
+    threshold: float = 0.8   # 精确 Jaccard 复核阈值
+    ngram: int = 3
+    bands: int = 8
+    rows: int = 4            # 签名长度 = bands × rows
+    seed: int = 1234
+
+
+def _image_identity(part: Dict[str, Any], cache: Dict[str, str]) -> str:
+    """
+    图片标识：URL / data URL 取其 sha1；本地文件取内容 sha1（读不到时退化为规范化路径）。
+    相对路径按共享图片缓存的 media_root 解析，需在 configure_image_cache 之后构建索引。
+    """
+    if part["type"] == "image_url":
+        return "url:" + hashlib.sha1(part["image_url"]["url"].encode("utf-8")).hexdigest()
+    p = get_image_cache().resolve(part["path"])
+    key = str(p)
+    if key not in cache:
+        try:
+            cache[key] = "sha1:" + hashlib.sha1(p.read_bytes()).hexdigest()
+        except OSError:
+            cache[key] = "path:" + key
+    return cache[key]
+
+
+def _image_signature(item: Item, cache: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(_image_identity(p, cache) for p in image_parts(item.multimodal_data))
+
+
+def _item_text(item: Item, images: Tuple[str, ...] = ()) -> str:
+    opts = sorted(normalize(o) for o in item.options)
+    return "|".join([normalize(item.question)] + opts + list(images))
+
+
+def _shingles(text: str, n: int) -> set:
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _answer_signature(item: Item) -> Tuple:
+    """答案签名：选择题为正确选项文本集合，开放题为参考答案 + rubric。"""
+    from .evaluator import _parse_choice_gt_from_dataset  # 避免循环导入
+
+    md = item.metadata
+    if md.type == "open_response":
+        return (md.type, normalize(str(item.answer)),
+                tuple(sorted((sp.criterion, sp.points) for sp in
+                             list(md.positive_scoring_points) + list(md.negative_scoring_points))))
+    letters = _parse_choice_gt_from_dataset(item)
+    texts = sorted(normalize(item.options[ord(ch) - ord("A")]) for ch in letters)
+    return (md.type, tuple(texts), md.score)
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 较小下标（数据集顺序靠前）作为根，保证代表题确定
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+class DedupIndex:
+    """
+    近重复索引：
+      - clusters：大小 >= 2 的簇
+      - cluster_of[key]：所属簇 id
+      - representative[key]：所在评测组的代表题（评测组内第一个出现的题）
+    collapse 模式下，非代表题不发请求，直接复用代表题的 record（见 propagate_record）。
+    """
+
+    def __init__(self, datasets: List[EvalDataset], cfg: Optional[DedupConfig] = None):
+        self.cfg = cfg or DedupConfig()
+        keys: List[ItemKey] = []
+        items: List[Item] = []
+        for ds in datasets:
+            for it in ds.dataset:
+                keys.append((ds.dataset_metadata.dataset_id, it.question_id))
+                items.append(it)
+
+        image_cache: Dict[str, str] = {}
+        images = [_image_signature(it, image_cache) for it in items]
+        shingles = [_shingles(_item_text(it, im), self.cfg.ngram) for it, im in zip(items, images)]
+        uf = _UnionFind(len(items))
+        for a, b in self._candidate_pairs(shingles):
+            sa, sb = shingles[a], shingles[b]
+            # 图片不同的题即使文本几乎相同也不合并（哈希只贡献少量 shingle，不足以拉开 Jaccard）
+            if images[a] == images[b] and len(sa & sb) / max(1, len(sa | sb)) >= self.cfg.threshold:
+                uf.union(a, b)
+
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for i in range(len(items)):
+            groups[uf.find(i)].append(i)
+
+        self.cluster_of: Dict[ItemKey, int] = {}
+        self.representative: Dict[ItemKey, ItemKey] = {}
+        self.clusters: List[Dict[str, Any]] = []
+        for members in sorted((m for m in groups.values() if len(m) > 1), key=lambda m: m[0]):
+            cid = len(self.clusters)
+            eval_groups: Dict[Tuple, List[int]] = {}
+            for i in members:
+                self.cluster_of[keys[i]] = cid
+                eval_groups.setdefault(_answer_signature(items[i]), []).append(i)
+            for g in eval_groups.values():
+                for i in g:
+                    self.representative[keys[i]] = keys[g[0]]
+            self.clusters.append({
+                "cluster_id": cid,
+                "size": len(members),
+                "members": [{"dataset_id": keys[i][0], "question_id": keys[i][1],
+                             "representative": list(self.representative[keys[i]])}
+                            for i in members],
+                "num_eval_groups": len(eval_groups),
+            })
+
+        # 回写 DatasetMetadata.duplicate：该数据集是否含（跨数据集的）近重复题
+        dup_ds = {k[0] for k in self.cluster_of}
+        for ds in datasets:
+            ds.dataset_metadata.duplicate = ds.dataset_metadata.dataset_id in dup_ds
+
+        self._results: Dict[Tuple, Dict[str, Any]] = {}
+
+    def _candidate_pairs(self, shingles: List[set]):
+        cfg = self.cfg
+        rnd = random.Random(cfg.seed)
+        n_perm = cfg.bands * cfg.rows
+        coefs = [(rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)) for _ in range(n_perm)]
+
+        buckets: Dict[Tuple, List[int]] = defaultdict(list)
+        for idx, sh in enumerate(shingles):
+            hs = [zlib.crc32(s.encode("utf-8")) for s in sh]
+            sig = [min((a * h + b) % _PRIME for h in hs) for a, b in coefs]
+            for band in range(cfg.bands):
+                buckets[(band, *sig[band * cfg.rows:(band + 1) * cfg.rows])].append(idx)
+
+        seen = set()
+        for members in buckets.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    pair = (members[i], members[j])
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    # ---------- 评测阶段 ----------
+
+    def canonical_key(self, dataset_id: str, question_id: str) -> ItemKey:
+        return self.representative.get((dataset_id, question_id), (dataset_id, question_id))
+
+    def is_member(self, dataset_id: str, question_id: str) -> bool:
+        """是否为非代表题（collapse 时不需要评测）。"""
+        return self.canonical_key(dataset_id, question_id) != (dataset_id, question_id)
+
+    def is_representative(self, dataset_id: str, question_id: str) -> bool:
+        """是否为某个评测组的代表题（只有代表题的 record 需要保存下来供成员复用）。"""
+        return self.representative.get((dataset_id, question_id)) == (dataset_id, question_id)
+
+    def annotate(self, dataset_id: str, rec: Dict[str, Any]):
+        cid = self.cluster_of.get((dataset_id, rec["question_id"]))
+        if cid is not None:
+            rec["dup_cluster"] = cid
+
+    def store(self, test_model: str, dataset_id: str, variant: Optional[str],
+              rec: Dict[str, Any]):
+        if not self.is_representative(dataset_id, rec["question_id"]):
+            return   # 不在簇中 / 非代表题：没有成员会来取，不占内存
+        self._results[(test_model, dataset_id, rec["question_id"], variant)] = rec
+
+    def propagate_record(self, test_model: str, dataset_id: str, item: Item,
+                         variant: Optional[str]) -> Optional[Dict[str, Any]]:
+        """复用代表题的 record；代表题尚无结果（例如评测失败）时返回 None。"""
+        rep = self.canonical_key(dataset_id, item.question_id)
+        src = self._results.get((test_model, *rep, variant))
+        if src is None:
+            return None
+        rec = dict(src)
+        rec["question_id"] = item.question_id
+        rec["question"] = item.question
+        rec["dedup_of"] = f"{rep[0]}/{rep[1]}"
+        self.annotate(dataset_id, rec)
+        return rec
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "threshold": self.cfg.threshold,
+            "num_clusters": len(self.clusters),
+            "num_duplicate_items": sum(c["size"] for c in self.clusters),
+            "clusters": self.clusters,
+        }
@@ -0,0 +1,174 @@
+# medeval/eval/dialogue.py
+# -*- coding: utf-8 -*-
+"""
+多轮问诊对话评测（Metadata.dialogue）
+
+dialogue 为 item.question 之前的对话轮次，每个元素：
+  {"role": "user", "content": "...", "criteria": "要点1|要点2"}   用户发言；criteria 可选，
+                                                                    每个要点 1 分，该轮单独评分
+  {"role": "assistant", "content": "..."}                           参考回复，作为后续轮次的上下文；
+                                                                    缺省时用被测模型自己的回答
+item.question 是最后一轮用户发言，按 item 的 rubric 评分（与单轮开放题一致）。
+
+- 逐轮重放：第 k 轮的 messages 是第 k-1 轮 messages 追加一条 user 的严格延长，
+  system / user message 在 prepare 阶段只构造一次，各轮 / 各模型共享同一批 dict
+- 同一对话的各轮在同一个任务里顺序执行；不同对话按前缀排序，开场相同的对话相邻执行，
+  都是为了让服务端 prompt 前缀缓存尽量命中
+"""
+
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from data.schema import Item, ScoringPoint
+from clients.base import LLMClient
+from judge.base import Judge
+from eval.prompting import build_dialogue_system_message, build_dialogue_user_message
+from eval.strategies import extract_angle_answer
+
+USER_ROLES = ("user", "patient", "患者")
+ASSISTANT_ROLES = ("assistant", "doctor", "医生")
+
+
+class DialogueTurn(NamedTuple):
+    text: str
+    user: Dict[str, Any]                   # 预先构造的 user message
+    reference: Optional[Dict[str, str]]    # 参考回复 message；None 时用模型自己的回答
+    criteria: Tuple[ScoringPoint, ...]     # 该轮评分要点；最后一轮用 item rubric
+
+
+class PreparedDialogue(NamedTuple):
+    system: Dict[str, str]
+    turns: Tuple[DialogueTurn, ...]
+
+
+def is_dialogue_item(item: Item) -> bool:
+    return item.metadata.type == "open_response" and bool(item.metadata.dialogue)
+
+
+def prepare_dialogue(item: Item) -> PreparedDialogue:
+    raw_turns: List[List[Any]] = []   # [text, reference, criteria]
+    for d in item.metadata.dialogue:
+        role = str(d.get("role", "user")).lower()
+        if role in USER_ROLES:
+            criteria = tuple(ScoringPoint(criterion=c.strip(), points=1)
+                             for c in (d.get("criteria") or "").split("|") if c.strip())
+            raw_turns.append([d.get("content", ""), None, criteria])
+        elif role in ASSISTANT_ROLES:
+            if not raw_turns or raw_turns[-1][1] is not None:
+                raise ValueError(f"{item.question_id}: dialogue 中 assistant 轮次前缺少 user 轮次")
+            raw_turns[-1][1] = {"role": "assistant", "content": d.get("content", "")}
+        else:
+            raise ValueError(f"{item.question_id}: 未知的 dialogue role {d.get('role')!r}")
+    raw_turns.append([item.question, None, ()])
+
+    turns = tuple(
+        DialogueTurn(text, build_dialogue_user_message(item, text, first=(k == 0)), ref, criteria)
+        for k, (text, ref, criteria) in enumerate(raw_turns)
+    )
+    return PreparedDialogue(build_dialogue_system_message(item), turns)
+
+
+def evaluate_dialogue(client: LLMClient,
+                      judge: Judge,
+                      item: Item,
+                      prep: PreparedDialogue,
+                      test_model: str) -> Dict[str, Any]:
+    """
+    逐轮重放并评分。返回的 record 与单轮开放题结构一致（分数 = 最后一轮），
+    额外带 "turns"（每轮结果）和 "dialogue"（整段对话汇总）。
+    """
+    from .evaluator import finish_open_item  # 避免循环导入
+
+    md = item.metadata
+    history: List[Dict[str, Any]] = [prep.system]
+    turn_recs: List[Dict[str, Any]] = []
+    rec: Dict[str, Any] = {}
+    last = len(prep.turns) - 1
+    for k, turn in enumerate(prep.turns):
+        history.append(turn.user)
+        # 浅拷贝只复制引用；hedging 的备份请求可能在返回后仍持有这份列表
+        raw = client.chat(list(history), model=test_model)
+        if k == last:
+            rec = finish_open_item(judge, item, raw)
+            turn_recs.append({"turn": k, "question": turn.text, "answer": rec["answer"],
+                              "score_obtained": rec["score_obtained"],
+                              "score_full": rec["score_full"], "ok": rec["ok"]})
+            break
+
+        answer = extract_angle_answer(raw)
+        tr: Dict[str, Any] = {"turn": k, "question": turn.text, "answer": answer}
+        if turn.criteria:
+            sc = judge.score_open_response(
+                question=turn.text,
+                positive_points=list(turn.criteria),
+                negative_points=[],
+                answer=answer,
+                total_score=len(turn.criteria),
+                synonyms=md.synonyms,
+            )
+            tr.update({"score_obtained": sc["score"], "score_full": len(turn.criteria),
+                       "ok": sc.get("ok", False),
+                       "scoring_points_flags": sc.get("scoring_points_flags", [])})
+        turn_recs.append(tr)
+        history.append(turn.reference or {"role": "assistant", "content": raw})
+
+    rec["turns"] = turn_recs
+    refresh_dialogue_aggregate(rec)
+    return rec
+
+
+def refresh_dialogue_aggregate(rec: Dict[str, Any]):
+    """按 rec["turns"] 重新计算整段对话汇总（评测与 rejudge 共用）。"""
+    turns = rec["turns"]
+    scored = [t for t in turns if "score_full" in t]
+    rec["dialogue"] = {
+        "num_turns": len(turns),
+        "scored_turns": len(scored),
+        "turn_score": sum(t["score_obtained"] for t in scored),
+        "turn_full": sum(t["score_full"] for t in scored),
+        "turn_ok_rate": sum(1 for t in scored if t["ok"]) / len(scored),
+        "all_turns_ok": all(t["ok"] for t in scored),
+    }
+
+
+def _prefix_key(item: Item) -> Tuple[str, ...]:
+    md = item.metadata
+    return (md.prompt_template or "",) + tuple(d.get("content", "") for d in md.dialogue) \
+        + (item.question,)
+
+
+def prefix_group_key(item: Item) -> Tuple[str, ...]:
+    """前缀组：prompt 模板与开场发言都相同的对话共享服务端前缀缓存，调度时应整组相邻派发。"""
+    return _prefix_key(item)[:2]
+
+
+def prefix_cache_order(units: Sequence[Any]) -> List[Any]:
+    """
+    执行顺序：对话单元在原先对话单元占据的位置上按前缀重新排序，使开场相同的对话相邻；
+    其它单元位置不变。
+    """
+    slots = [i for i, u in enumerate(units) if is_dialogue_item(u.item)]
+    if len(slots) < 2:
+        return list(units)
+    ordered = sorted((units[i] for i in slots), key=lambda u: _prefix_key(u.item))
+    out = list(units)
+    for i, u in zip(slots, ordered):
+        out[i] = u
+    return out
+
+
+def dialogue_summary(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    dlg = [r for r in records if "dialogue" in r]
+    if not dlg:
+        return None
+    turns = [t for r in dlg for t in r["turns"] if "score_full" in t]
+    by_turn: Dict[int, List[bool]] = {}
+    for t in turns:
+        by_turn.setdefault(t["turn"], []).append(bool(t["ok"]))
+    return {
+        "num_dialogues": len(dlg),
+        "num_turns": sum(r["dialogue"]["num_turns"] for r in dlg),
+        "scored_turns": len(turns),
+        "turn_accuracy": sum(1 for t in turns if t["ok"]) / len(turns),
+        "all_turns_ok_rate": sum(1 for r in dlg if r["dialogue"]["all_turns_ok"]) / len(dlg),
+        "accuracy_by_turn": {str(k): sum(v) / len(v) for k, v in sorted(by_turn.items())},
+    }
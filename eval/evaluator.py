@@ -1,8 +1,17 @@
-from typing import Dict, Any, List, Optional
-from data.schema import EvalDataset, Item
-from clients.base import LLMClient
+import hashlib
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, TYPE_CHECKING
+from data.schema import EvalDataset, Item, DatasetMetadata
+from clients.base import LLMClient, request_class, track_batched_calls
+from clients.batching import BatchingClient
 from judge.base import Judge
-from eval.prompting import build_choice_messages, build_open_test_messages
+from eval.prompting import (
+    build_choice_messages,
+    build_choice_logprob_messages,
+    build_open_test_messages,
+)
 from eval.strategies import extract_angle_answer, parse_choice_pred
 from utils.text import normalize
 from eval.choice_aug import (
@@ -10,8 +19,28 @@ from eval.choice_aug import (
     make_shuffle_variant,
     make_nota_variant,
 )
+from eval.shard import select_shard, build_shard_info
+from eval.dialogue import (
+    PreparedDialogue,
+    is_dialogue_item,
+    prepare_dialogue,
+    evaluate_dialogue,
+    prefix_cache_order,
+    dialogue_summary,
+)
+from eval.retry import RetryPolicy, run_isolated
+
+if TYPE_CHECKING:
+    from eval.dedup import DedupIndex
+    from eval.schedule import Scheduler
+    from eval.budget import BudgetGovernor
+    from eval.progress import ProgressReporter
 LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+# 选择题打分方式：generate（生成 <A,B> 再解析）/ logprob（单 token + top_logprobs，仅单选题）
+CHOICE_SCORING = ("generate", "logprob")
+CALIBRATION_BINS = 10
+
 
 def _parse_choice_gt_from_dataset(item: Item) -> List[str]:
     """
@@ -69,21 +98,21 @@ def _parse_choice_gt_from_dataset(item: Item) -> List[str]:
     return [LETTERS[i] for i in sorted(correct_indices)]
 
 
-def evaluate_choice_item(client: LLMClient,
-                         judge: Judge,
-                         item: Item,
-                         test_model: str,
-                         variant: str = "base",
-                         shuffle_seed: int = 0) -> Dict[str, Any]:
-    """
-    统一处理 single_choice / multi_choice，不同 variant：
-      - base   : 原题
-      - shuffle: 打乱选项
-      - nota   : NOTA 题（以上皆非）
-    """
+class PreparedChoice(NamedTuple):
+    """选择题某个 variant 增强后的选项、答案及渲染好的 prompt（与待测模型无关，可复用）。"""
+    options: List[str]
+    gt_letters: List[str]
+    extra: Dict[str, Any]
+    messages: List[Dict[str, str]]
+    scoring: str = "generate"
+
+
+def prepare_choice(item: Item,
+                   variant: str = "base",
+                   shuffle_seed: int = 0,
+                   scoring: str = "generate") -> PreparedChoice:
     base_options = item.options
     base_gt_letters = _parse_choice_gt_from_dataset(item)
-    full_score = item.metadata.score
 
     extra = {}
 
@@ -100,48 +129,138 @@ def evaluate_choice_item(client: LLMClient,
         options, gt_letters = make_base_variant(base_options, base_gt_letters)
 
     # 构造选择题 prompt（用增强后的 options）
+    # 多选题一个 token 表达不了答案，logprob 模式下仍走生成
+    if scoring == "logprob" and item.metadata.type == "single_choice":
+        return PreparedChoice(options, gt_letters, extra,
+                              build_choice_logprob_messages(item, options), "logprob")
     messages = build_choice_messages(item, options)
-    raw = client.chat(messages, model=test_model)
-    pred_letters = parse_choice_pred(raw, len(options))
+    return PreparedChoice(options, gt_letters, extra, messages)
+
+
+def finish_choice_item(judge: Judge,
+                       item: Item,
+                       variant: str,
+                       prep: PreparedChoice,
+                       raw: str) -> Dict[str, Any]:
+    """解析待测模型输出并判分，生成选择题 record。"""
+    full_score = item.metadata.score
+    pred_letters = parse_choice_pred(raw, len(prep.options))
 
-    sc = judge.score_single_choice(gt_letters, pred_letters, full_score)
+    sc = judge.score_single_choice(prep.gt_letters, pred_letters, full_score)
 
     rec: Dict[str, Any] = {
         "question_id": item.question_id,
         "type": item.metadata.type,   # single_choice / multi_choice
         "variant": variant,           # base / shuffle / nota
         "question": item.question,
-        "options": options,
-        "gt_letters": gt_letters,
+        "options": prep.options,
+        "gt_letters": prep.gt_letters,
         "pred_letters": pred_letters,
         "pred_raw": raw,
         "score_obtained": sc["score"],
         "score_full": full_score,
         "ok": sc.get("ok", False),
     }
-    if extra:
-        rec["augment_extra"] = extra
+    if prep.extra:
+        rec["augment_extra"] = prep.extra
     return rec
 
-def evaluate_open_item(client: LLMClient,
-                       judge: Judge,
-                       item: Item,
-                       test_model: str) -> Dict[str, Any]:
+
+def option_probs(logprobs: Dict[str, float], letters: str) -> Dict[str, float]:
+    """选项字母的 logprob -> 在全部选项上归一化的概率；top_logprobs 之外的选项记 0。"""
+    xs = {k: v for k, v in logprobs.items() if k in letters}
+    if not xs:
+        return {}
+    m = max(xs.values())
+    z = sum(math.exp(v - m) for v in xs.values())
+    return {k: (math.exp(xs[k] - m) / z if k in xs else 0.0) for k in letters}
+
+
+def finish_choice_logprob(judge: Judge,
+                          item: Item,
+                          variant: str,
+                          prep: PreparedChoice,
+                          logprobs: Dict[str, float]) -> Dict[str, Any]:
+    """logprob 打分：取概率最大的选项作答；选项分布写入 record 供校准统计。"""
+    letters = LETTERS[:len(prep.options)]
+    probs = option_probs(logprobs, letters)
+    pred = max(probs, key=probs.get) if probs else None
+    rec = finish_choice_item(judge, item, variant, prep, f"<{pred}>" if pred else "")
+    rec["scoring"] = "logprob"
+    rec["option_probs"] = probs
+    rec["confidence"] = probs[pred] if pred else None
+    return rec
+
+
+def evaluate_choice_item(client: LLMClient,
+                         judge: Judge,
+                         item: Item,
+                         test_model: str,
+                         variant: str = "base",
+                         shuffle_seed: int = 0,
+                         scoring: str = "generate") -> Dict[str, Any]:
+    """
+    统一处理 single_choice / multi_choice，不同 variant：
+      - base   : 原题
+      - shuffle: 打乱选项
+      - nota   : NOTA 题（以上皆非）
+    scoring="logprob" 时单选题只请求 1 个 token，按选项字母的 logprob 作答。
+    """
+    prep = prepare_choice(item, variant, shuffle_seed=shuffle_seed, scoring=scoring)
+    if prep.scoring == "logprob":
+        lp = client.option_logprobs(prep.messages, LETTERS[:len(prep.options)], model=test_model)
+        return finish_choice_logprob(judge, item, variant, prep, lp)
+    raw = client.chat(prep.messages, model=test_model)
+    return finish_choice_item(judge, item, variant, prep, raw)
+
+
+def rubric_hash(item: Item) -> str:
+    """
+    开放题评分依据（题干 + scoring points + 满分 + 同义词，多轮对话另含各轮 criteria）的哈希，
+    rubric 修订后变化。
+    """
     md = item.metadata
-    full_score = md.score
+    rubric = {
+        "q": item.question,
+        "pos": [[p.criterion, p.points] for p in md.positive_scoring_points],
+        "neg": [[n.criterion, n.points] for n in md.negative_scoring_points],
+        "total": md.score,
+        "syn": dict(md.synonyms or {}),
+    }
+    if md.dialogue:
+        rubric["dialogue_criteria"] = [d.get("criteria", "") for d in md.dialogue]
+    payload = json.dumps(rubric, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
-    # 1) 待测模型回答
-    messages = build_open_test_messages(item)
-    raw = client.chat(messages, model=test_model)
+
+def open_score_fields(item: Item, sc: Dict[str, Any], judge_hash: str) -> Dict[str, Any]:
+    """裁判结果 -> record 中的评分字段（评测与 rejudge 共用）。"""
+    return {
+        "score_obtained": sc["score"],
+        "score_full": item.metadata.score,
+        "ok": sc.get("ok", False),
+        "scoring_points_flags": sc.get("scoring_points_flags", []),
+        "judge_raw": sc.get("judge_raw", None),
+        "judge_parse": sc.get("judge_parse"),   # LLM 裁判：ok / reask / failed；规则裁判为 None
+        "rubric_hash": rubric_hash(item),
+        "judge_hash": judge_hash,
+    }
+
+
+def finish_open_item(judge: Judge,
+                     item: Item,
+                     raw: str) -> Dict[str, Any]:
+    """抽取待测模型答案，裁判按 scoring points 给 flag，本地算总分。"""
+    md = item.metadata
     answer = extract_angle_answer(raw)
 
-    # 2) 裁判模型按 scoring points 给 flag，本地算总分
     sc = judge.score_open_response(
         question=item.question,
         positive_points=md.positive_scoring_points,
         negative_points=md.negative_scoring_points,
         answer=answer,
-        total_score=full_score,
+        total_score=md.score,
+        synonyms=md.synonyms,
     )
 
     return {
@@ -150,94 +269,571 @@ def evaluate_open_item(client: LLMClient,
         "question": item.question,
         "answer": answer,
         "raw": raw,
-        "score_obtained": sc["score"],
-        "score_full": full_score,
-        "ok": sc.get("ok", False),
-        "scoring_points_flags": sc.get("scoring_points_flags", []),
-        "judge_raw": sc.get("judge_raw", None),
+        **open_score_fields(item, sc, judge.fingerprint()),
     }
 
 
-def run_eval(dataset: EvalDataset,
-             client: LLMClient,
-             judge: Judge,
-             test_model: str,
-             choice_modes: Optional[List[str]] = None) -> Dict[str, Any]:
+def evaluate_open_item(client: LLMClient,
+                       judge: Judge,
+                       item: Item,
+                       test_model: str) -> Dict[str, Any]:
+    # 1) 待测模型回答
+    messages = build_open_test_messages(item)
+    raw = client.chat(messages, model=test_model)
+
+    # 2) 裁判模型按 scoring points 给 flag，本地算总分
+    return finish_open_item(judge, item, raw)
+
+
+class WorkUnit(NamedTuple):
     """
-    对一个数据集评测：
-      - choice_modes 指定选择题评测模式：
-        ["base"]                -> 只测原题
-        ["base", "shuffle"]     -> 原题 + 打乱
-        ["base", "nota"]        -> 原题 + NOTA
-        ["base", "shuffle", "nota"] -> 三种都测
+    一个最小评测单元：某道题的某个 variant（open_response 的 variant 为 None）。
+    index 是该单元在单机全量评测中的顺序号，用于分片合并时还原记录顺序。
     """
+    index: int
+    item: Item
+    variant: Optional[str]
+
+    def key(self, dataset_id: str) -> Tuple[str, str, Optional[str]]:
+        return dataset_id, self.item.question_id, self.variant
+
+
+def normalize_choice_modes(choice_modes: Optional[List[str]]) -> List[str]:
     if choice_modes is None:
         choice_modes = ["base"]
 
     # 去重 & 处理 "all"
     if "all" in choice_modes:
         choice_modes = ["base", "shuffle", "nota"]
-    choice_modes = list(dict.fromkeys(choice_modes))  # 保持顺序去重
+    return list(dict.fromkeys(choice_modes))  # 保持顺序去重
 
-    records: List[Dict[str, Any]] = []
 
+def iter_work_units(dataset: EvalDataset,
+                    choice_modes: List[str]) -> List[WorkUnit]:
+    """按单机评测顺序展开所有工作单元（选择题 × variant，开放题各一个）。"""
+    units: List[WorkUnit] = []
     for item in dataset.dataset:
         t = item.metadata.type
 
         if t in ("single_choice", "multi_choice", "multiple_choice"):
             # 对每个 variant 都跑一遍
             for mode in choice_modes:
-                rec = evaluate_choice_item(
-                    client, judge, item, test_model, variant=mode
-                )
-                records.append(rec)
+                units.append(WorkUnit(len(units), item, mode))
 
         elif t == "open_response":
-            rec = evaluate_open_item(client, judge, item, test_model)
-            records.append(rec)
+            units.append(WorkUnit(len(units), item, None))
 
-        else:
-            # 其它题型先跳过
-            continue
+        # 其它题型先跳过
+    return units
+
+
+class PreparedUnit(NamedTuple):
+    """展开 + 增强 + 渲染 prompt 之后的工作单元；多模型 sweep 时各模型共享。"""
+    unit: WorkUnit
+    messages: List[Dict[str, str]]     # 多轮对话为第一轮请求
+    choice: Optional[PreparedChoice]   # open_response 为 None
+    dialogue: Optional[PreparedDialogue] = None
+
+
+def prepare_unit(unit: WorkUnit, choice_scoring: str = "generate") -> PreparedUnit:
+    if unit.variant is None and is_dialogue_item(unit.item):
+        dlg = prepare_dialogue(unit.item)
+        return PreparedUnit(unit, [dlg.system, dlg.turns[0].user], None, dlg)
+    if unit.variant is None:
+        return PreparedUnit(unit, build_open_test_messages(unit.item), None)
+    prep = prepare_choice(unit.item, unit.variant, scoring=choice_scoring)
+    return PreparedUnit(unit, prep.messages, prep)
+
+
+def prepared_kind(prepared: PreparedUnit) -> str:
+    """请求类别：choice / open / dialogue（HedgedClient 按类别分别统计延迟）。"""
+    if prepared.dialogue is not None:
+        return "dialogue"
+    return "open" if prepared.choice is None else "choice"
+
+
+def evaluate_prepared(client: LLMClient,
+                      judge: Judge,
+                      prepared: PreparedUnit,
+                      test_model: str) -> Dict[str, Any]:
+    with request_class(prepared_kind(prepared)), track_batched_calls() as batched:
+        rec = _evaluate_prepared(client, judge, prepared, test_model)
+    if batched:
+        # 经微批 /completions 作答：prompt 不是 /chat/completions 的渲染结果，单独标注
+        rec["batched"] = True
+        rec["prompt_format"] = batched[-1]
+    return rec
+
+
+def _evaluate_prepared(client: LLMClient,
+                       judge: Judge,
+                       prepared: PreparedUnit,
+                       test_model: str) -> Dict[str, Any]:
+    unit = prepared.unit
+    if prepared.choice is None and isinstance(client, BatchingClient):
+        # 只有选择题走微批：回答短且长度接近；开放题生成长度差异大，会拖慢整批
+        client = client.inner
+    if prepared.dialogue is not None:
+        return evaluate_dialogue(client, judge, unit.item, prepared.dialogue, test_model)
+    if prepared.choice is not None and prepared.choice.scoring == "logprob":
+        lp = client.option_logprobs(prepared.messages, LETTERS[:len(prepared.choice.options)],
+                                    model=test_model)
+        return finish_choice_logprob(judge, unit.item, unit.variant, prepared.choice, lp)
+    raw = client.chat(prepared.messages, model=test_model)
+    if prepared.choice is None:
+        return finish_open_item(judge, unit.item, raw)
+    return finish_choice_item(judge, unit.item, unit.variant, prepared.choice, raw)
+
+
+def evaluate_unit(client: LLMClient,
+                  judge: Judge,
+                  unit: WorkUnit,
+                  test_model: str,
+                  choice_scoring: str = "generate") -> Dict[str, Any]:
+    return evaluate_prepared(client, judge, prepare_unit(unit, choice_scoring), test_model)
+
+
+def map_ordered(fn: Callable[[Any], Any],
+                tasks: Sequence[Any],
+                workers: int = 1) -> List[Any]:
+    """并发执行 fn(task)，按 tasks 原顺序返回结果；workers <= 1 时串行。"""
+    if workers <= 1 or len(tasks) <= 1:
+        return [fn(t) for t in tasks]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, tasks))
+
+
+def run_units(units: List[WorkUnit],
+              models: List[str],
+              evaluate: Callable[[str, WorkUnit], Dict[str, Any]],
+              dataset_id: str,
+              workers: int = 1,
+              retry: Optional[RetryPolicy] = None,
+              dedup: Optional["DedupIndex"] = None,
+              collapse: bool = False,
+              scheduler: Optional["Scheduler"] = None,
+              governor: Optional["BudgetGovernor"] = None,
+              progress: Optional["ProgressReporter"] = None
+              ) -> Dict[str, Tuple[List[Optional[Dict[str, Any]]], Dict[int, Dict[str, Any]]]]:
+    """
+    对 units × models 执行 evaluate(model, unit)，失败隔离 + 延迟重试。
+    dedup 不为空时给 record 标注近重复簇；collapse=True 时近重复簇中的非代表题不发请求，
+    直接复用代表题的 record。
+    scheduler（eval.schedule.Scheduler）决定派发顺序；为空时按数据集顺序（多轮对话按前缀聚合）。
+    governor（eval.budget.BudgetGovernor）在单元执行前检查预算，被跳过的单元 outs 为 None
+    且不计入 failures。
+    progress（eval.progress.ProgressReporter）在 record 完成时增量汇总，定期写 partial 文件。
+
+    返回 {model: (outs, failures)}，outs 与 units 一一对应（失败为 None），
+    failures 以 units 下标为 key。
+    """
+    eval_units = units
+    if dedup is not None and collapse:
+        eval_units = [u for u in units if not dedup.is_member(dataset_id, u.item.question_id)]
+    if scheduler is not None:
+        eval_units = scheduler.order(eval_units)
+    else:
+        eval_units = prefix_cache_order(eval_units)
+
+    tasks = [(m, u) for u in eval_units for m in models]
+    if governor is not None:
+        evaluate = governor.instrument(evaluate, dataset_id)
+    if progress is not None:
+        evaluate = progress.instrument(evaluate, tasks)
+    if scheduler is not None:
+        evaluate = scheduler.instrument(evaluate, tasks, dataset_id)
+    outs, failures = run_isolated(lambda t: evaluate(*t), tasks, workers=workers, retry=retry)
+    if progress is not None:
+        progress.finish()
+
+    by_task: Dict[Tuple[str, int], int] = {(m, u.index): ti for ti, (m, u) in enumerate(tasks)}
+    result = {}
+    for m in models:
+        m_outs: List[Optional[Dict[str, Any]]] = []
+        m_failures: Dict[int, Dict[str, Any]] = {}
+        for pos, u in enumerate(units):
+            ti = by_task.get((m, u.index))
+            if ti is not None:
+                rec = outs[ti]
+                if ti in failures:
+                    m_failures[pos] = failures[ti]
+                elif dedup is not None and rec is not None:
+                    dedup.annotate(dataset_id, rec)
+                    if dedup.is_representative(dataset_id, u.item.question_id):
+                        dedup.store(m, dataset_id, u.variant, rec)
+            else:
+                # collapse：复用代表题结果（代表题总是先于成员被评测）
+                rec = dedup.propagate_record(m, dataset_id, u.item, u.variant)
+                rep_skip = governor.skip_reason_of(
+                    m, *dedup.canonical_key(dataset_id, u.item.question_id), u.variant
+                ) if rec is None and governor is not None else None
+                if rep_skip is not None:
+                    # 代表题被预算控制跳过，成员一并跳过
+                    governor.mark_skipped(m, dataset_id, u.item.question_id, u.variant, rep_skip)
+                elif rec is None:
+                    m_failures[pos] = {"error": "near-duplicate representative failed",
+                                       "attempts": 0}
+            m_outs.append(rec)
+        result[m] = (m_outs, m_failures)
+    return result
+
+
+def _ratio(ok: int, n: int) -> float:
+    return ok / n if n else 0.0
+
+
+def choice_accuracy_fields(counts: Dict[str, Sequence[int]]) -> Dict[str, float]:
+    """
+    单个 variant 的选择题指标，summarize 与 eval.progress.OnlineSummary 共用同一定义。
+    counts: {题型: (答对数, record 数)}；没有该题型的 record 时准确率记 0.0。
+    """
+    def _acc(typ: str) -> float:
+        return _ratio(*counts.get(typ, (0, 0)))
+
+    return {
+        "accuracy_single_choice": _acc("single_choice"),
+        "accuracy_multi_choice": _acc("multi_choice") + _acc("multiple_choice"),
+    }
 
+
+def summarize(dataset_metadata: DatasetMetadata,
+              records: List[Dict[str, Any]],
+              choice_modes: List[str],
+              test_model: Optional[str] = None,
+              num_failed: int = 0) -> Dict[str, Any]:
     # -------- 下面 summary 你可以保持简单，先汇总总体 --------
     total = sum(r.get("score_obtained", 0) for r in records)
     full = sum(r.get("score_full", 0) for r in records)
 
-    def _acc(recs: List[Dict[str, Any]], typ: str, variant: Optional[str] = None) -> float:
+    def _counts(recs: List[Dict[str, Any]], typ: str,
+                variant: Optional[str] = None) -> Tuple[int, int]:
         xs = [r for r in recs if r.get("type") == typ]
         if variant is not None:
             xs = [r for r in xs if r.get("variant") == variant]
-        if not xs:
-            return 0.0
-        ok = sum(1 for r in xs if r.get("ok"))
-        return ok / len(xs)
-
-    def _full_open(recs: List[Dict[str, Any]]) -> float:
-        xs = [r for r in recs if r.get("type") == "open_response"]
-        if not xs:
-            return 0.0
-        ok = sum(1 for r in xs if r.get("ok"))
-        return ok / len(xs)
+        return sum(1 for r in xs if r.get("ok")), len(xs)
 
     # 也可以把各个 variant 的选择题准确率单独放出来
     choice_summary = {}
     for mode in choice_modes:
-        choice_summary[mode] = {
-            "accuracy_single_choice": _acc(records, "single_choice", variant=mode),
-            "accuracy_multi_choice": _acc(records, "multi_choice", variant=mode)
-                                 + _acc(records, "multiple_choice", variant=mode),
+        choice_summary[mode] = choice_accuracy_fields(
+            {t: _counts(records, t, variant=mode)
+             for t in ("single_choice", "multi_choice", "multiple_choice")}
+        )
+
+    summary = {
+        "dataset_id": dataset_metadata.dataset_id,
+        "dataset_name": dataset_metadata.dataset_name,
+        "test_model": test_model,
+        "num_records": len(records),
+        "num_failed": num_failed,
+        "total_score": total,
+        "max_score": full,
+        "choice_summary": choice_summary,
+        "full_score_rate_open": _ratio(*_counts(records, "open_response")),
+        "num_open_records": sum(1 for r in records if r.get("type") == "open_response"),
+    }
+    cascade = _judge_cascade_summary(records)
+    if cascade is not None:
+        summary["judge_cascade"] = cascade
+    parse = _judge_parse_summary(records)
+    if parse is not None:
+        summary["judge_parse"] = parse
+    calib = calibration_summary(records)
+    if calib is not None:
+        summary["calibration"] = calib
+    dlg = dialogue_summary(records)
+    if dlg is not None:
+        summary["dialogue"] = dlg
+    batched = [r for r in records if r.get("batched")]
+    if batched:
+        formats: Dict[str, int] = {}
+        for r in batched:
+            formats[r["prompt_format"]] = formats.get(r["prompt_format"], 0) + 1
+        summary["batching"] = {"batched_records": len(batched), "prompt_formats": formats}
+    dup = [r for r in records if "dup_cluster" in r]
+    if dup:
+        summary["dedup"] = {
+            "records_in_dup_clusters": len(dup),
+            "num_dup_clusters": len({r["dup_cluster"] for r in dup}),
+            "propagated_records": sum(1 for r in dup if "dedup_of" in r),
         }
+    return summary
+
+
+def _calibration(recs: List[Dict[str, Any]], bins: int) -> Dict[str, Any]:
+    n = len(recs)
+    conf = [r.get("confidence") or 0.0 for r in recs]
+    ok = [1.0 if r.get("ok") else 0.0 for r in recs]
+    # ECE：按置信度等宽分箱，|箱内准确率 - 箱内平均置信度| 按样本数加权
+    binned: Dict[int, List[int]] = {}
+    for i, c in enumerate(conf):
+        binned.setdefault(min(bins - 1, int(c * bins)), []).append(i)
+    ece = sum(abs(sum(ok[i] for i in idx) - sum(conf[i] for i in idx)) for idx in binned.values()) / n
+    # Brier：多分类形式，sum_k (p_k - y_k)^2，按题平均
+    brier = sum(
+        sum((p - (1.0 if k in r["gt_letters"] else 0.0)) ** 2 for k, p in r["option_probs"].items())
+        if r["option_probs"] else 1.0
+        for r in recs
+    ) / n
+    return {
+        "num_records": n,
+        "accuracy": sum(ok) / n,
+        "mean_confidence": sum(conf) / n,
+        "ece": ece,
+        "brier": brier,
+    }
+
+
+def calibration_summary(records: List[Dict[str, Any]],
+                        bins: int = CALIBRATION_BINS) -> Optional[Dict[str, Any]]:
+    """logprob 打分的选择题：ECE / Brier（总体 + 按 variant）。没有 logprob record 时返回 None。"""
+    recs = [r for r in records if r.get("scoring") == "logprob"]
+    if not recs:
+        return None
+    out = _calibration(recs, bins)
+    out["bins"] = bins
+    variants = sorted({r.get("variant") for r in recs})
+    if len(variants) > 1:
+        out["by_variant"] = {v: _calibration([r for r in recs if r.get("variant") == v], bins)
+                             for v in variants}
+    return out
+
 
+def _judge_cascade_summary(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """级联裁判统计：哪一层决定了 flag、LLM 裁判调用省了多少。非级联裁判返回 None。"""
+    flags_per_rec = [r.get("scoring_points_flags") or [] for r in records
+                     if r.get("type") == "open_response"]
+    flags_per_rec = [fs for fs in flags_per_rec if any("decided_by" in f for f in fs)]
+    if not flags_per_rec:
+        return None
+    llm_calls = sum(1 for fs in flags_per_rec
+                    if any(f.get("decided_by") == "llm" for f in fs))
+    n = len(flags_per_rec)
     return {
-        "summary": {
-            "dataset_id": dataset.dataset_metadata.dataset_id,
-            "dataset_name": dataset.dataset_metadata.dataset_name,
-            "num_records": len(records),
-            "total_score": total,
-            "max_score": full,
-            "choice_summary": choice_summary,
-            "full_score_rate_open": _full_open(records),
-        },
+        "open_records": n,
+        "llm_judge_calls": llm_calls,
+        "llm_judge_calls_saved": n - llm_calls,
+        "llm_judge_call_savings_rate": (n - llm_calls) / n,
+        "points_decided_by_rule": sum(1 for fs in flags_per_rec for f in fs
+                                      if f.get("decided_by") == "rule"),
+        "points_decided_by_llm": sum(1 for fs in flags_per_rec for f in fs
+                                     if f.get("decided_by") == "llm"),
+    }
+
+
+def _judge_parse_summary(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """LLM 裁判输出解析情况：需要重问 / 重问后仍失败（flag 兜底为 false）的比例。"""
+    xs = [r["judge_parse"] for r in records if r.get("judge_parse")]
+    if not xs:
+        return None
+    n = len(xs)
+    reask = sum(1 for x in xs if x == "reask")
+    failed = sum(1 for x in xs if x == "failed")
+    return {
+        "judged_records": n,
+        "reasked": reask,
+        "failed": failed,
+        "reask_rate": (reask + failed) / n,
+        "parse_failure_rate": failed / n,
+    }
+
+
+def run_eval(dataset: EvalDataset,
+             client: LLMClient,
+             judge: Judge,
+             test_model: str,
+             choice_modes: Optional[List[str]] = None,
+             shard: Optional[Tuple[int, int]] = None,
+             workers: int = 1,
+             retry: Optional[RetryPolicy] = None,
+             dedup: Optional["DedupIndex"] = None,
+             collapse_duplicates: bool = False,
+             scheduler: Optional["Scheduler"] = None,
+             choice_scoring: str = "generate",
+             governor: Optional["BudgetGovernor"] = None,
+             progress: Optional["ProgressReporter"] = None) -> Dict[str, Any]:
+    """
+    对一个数据集评测：
+      - choice_modes 指定选择题评测模式：
+        ["base"]                -> 只测原题
+        ["base", "shuffle"]     -> 原题 + 打乱
+        ["base", "nota"]        -> 原题 + NOTA
+        ["base", "shuffle", "nota"] -> 三种都测
+      - shard=(i, N) 时只评测哈希落在第 i 个分片的工作单元，
+        结果额外带 "shard" 段，供 eval.shard.merge_shard_results 合并
+      - workers > 1 时并发请求待测模型，records 顺序与串行一致
+      - 单个工作单元失败不会中断数据集：按 retry 延迟重试，仍失败的进入结果的 "failed" 段
+      - dedup（eval.dedup.DedupIndex）给近重复题标注簇；collapse_duplicates=True 时
+        每个簇（答案一致的评测组）只评测一次，结果复用到其它成员
+      - scheduler（eval.schedule.Scheduler）按预计耗时 / 优先子集决定派发顺序
+      - choice_scoring="logprob" 时单选题按选项字母的 logprob 作答（需服务端支持 logprobs），
+        summary 额外带 "calibration" 段（ECE / Brier）
+      - governor（eval.budget.BudgetGovernor）按 token / 调用数 / 时间预算降级或停止，
+        summary 额外带 "budget" 段
+      - progress（eval.progress.ProgressReporter）运行中定期刷新
+        {ds_id}__{model}.partial.json 并打印进度行
+    """
+    choice_modes = normalize_choice_modes(choice_modes)
+    ds_id = dataset.dataset_metadata.dataset_id
+
+    all_units = units = iter_work_units(dataset, choice_modes)
+    if shard is not None:
+        units = select_shard(all_units, ds_id, *shard, key_fn=shard_key_fn(ds_id, dedup))
+
+    outs, failures = run_units(
+        units, [test_model],
+        lambda m, u: evaluate_unit(client, judge, u, m, choice_scoring),
+        ds_id, workers=workers, retry=retry,
+        dedup=dedup, collapse=collapse_duplicates, scheduler=scheduler,
+        governor=governor, progress=progress,
+    )[test_model]
+
+    res = build_result(dataset, units, outs, failures, choice_modes, test_model,
+                       shard=shard, all_units=all_units)
+    if governor is not None:
+        attach_budget(res, governor, units, ds_id, test_model)
+    return res
+
+
+def attach_budget(res: Dict[str, Any],
+                  governor: "BudgetGovernor",
+                  units: Sequence[WorkUnit],
+                  dataset_id: str,
+                  test_model: str):
+    """写入 summary["budget"] 和被预算跳过的单元列表 res["skipped"]。"""
+    skipped = governor.skipped_entries(test_model, dataset_id, units)
+    if skipped:
+        res["skipped"] = skipped
+    res["summary"]["budget"] = governor.report(dataset_id, res["records"], test_model)
+
+
+def rerun_failed(dataset: EvalDataset,
+                 client: LLMClient,
+                 judge: Judge,
+                 test_model: str,
+                 old_res: Dict[str, Any],
+                 dead_letters: List[Dict[str, Any]],
+                 choice_modes: Optional[List[str]] = None,
+                 workers: int = 1,
+                 retry: Optional[RetryPolicy] = None,
+                 choice_scoring: str = "generate",
+                 governor: Optional["BudgetGovernor"] = None,
+                 resume_skipped: bool = False) -> Dict[str, Any]:
+    """
+    --retry_failed：只重跑 dead-letter 中的工作单元，与原结果合并成新的完整结果。
+    choice_modes / choice_scoring 必须与原运行一致（choice_modes 会按 index + question_id + variant 校验）。
+    原结果中因预算被跳过的单元（"skipped" 段）视为已覆盖；resume_skipped=True 时一并续跑。
+    governor 不为空时重跑同样受预算控制，再次被跳过的单元留在 "skipped" 段。
+    """
+    choice_modes = normalize_choice_modes(choice_modes)
+    all_units = iter_work_units(dataset, choice_modes)
+
+    def _check(d: Dict[str, Any], what: str):
+        i = d["index"]
+        if not (0 <= i < len(all_units)) or \
+                (all_units[i].item.question_id, all_units[i].variant) != (d["question_id"], d["variant"]):
+            raise ValueError(f"{what} 条目与当前数据集 / choice_modes 不一致：{d}")
+
+    prev = {}
+    for d in dead_letters:
+        _check(d, "dead-letter")
+        prev[d["index"]] = d
+    old_skipped = {}
+    for s in old_res.get("skipped", []):
+        _check(s, "skipped")
+        old_skipped[s["index"]] = s
+
+    old_failed = {f["index"] for f in old_res.get("failed", [])}
+    ok_idx = [i for i in range(len(all_units)) if i not in old_failed and i not in old_skipped]
+    if len(ok_idx) != len(old_res["records"]) or not set(prev) <= old_failed:
+        raise ValueError("原结果文件与 dead-letter 不匹配，无法合并")
+
+    ds_id = dataset.dataset_metadata.dataset_id
+    rerun = sorted(prev) + (sorted(old_skipped) if resume_skipped else [])
+    units = [all_units[i] for i in rerun]
+    evaluate = lambda m, u: evaluate_unit(client, judge, u, m, choice_scoring)
+    if governor is not None:
+        evaluate = governor.instrument(evaluate, ds_id)
+    outs, failures = run_isolated(lambda u: evaluate(test_model, u),
+                                  units, workers=workers, retry=retry)
+
+    by_idx: Dict[int, Dict[str, Any]] = dict(zip(ok_idx, old_res["records"]))
+    all_failures: Dict[int, Dict[str, Any]] = {}
+    skipped = {i: s for i, s in old_skipped.items() if not resume_skipped}
+    for pos, (u, rec) in enumerate(zip(units, outs)):
+        if rec is not None:
+            by_idx[u.index] = rec
+        elif pos not in failures:
+            # 再次被预算跳过
+            reason = governor.skip_reason_of(test_model, ds_id, u.item.question_id, u.variant)
+            skipped[u.index] = {"index": u.index, "question_id": u.item.question_id,
+                                "variant": u.variant, "reason": reason or "budget_exhausted"}
+        else:
+            f = failures[pos]
+            old_attempts = prev[u.index].get("attempts", 0) if u.index in prev else 0
+            all_failures[u.index] = {"error": f["error"], "attempts": old_attempts + f["attempts"]}
+    # 原结果中失败、但这次没要求重跑的单元，原样保留为失败
+    for i in old_failed - set(prev):
+        old = next(f for f in old_res["failed"] if f["index"] == i)
+        all_failures[i] = {"error": old["error"], "attempts": old.get("attempts", 0)}
+
+    outs_full = [by_idx.get(u.index) for u in all_units]
+    res = build_result(dataset, all_units, outs_full, all_failures, choice_modes, test_model)
+    if skipped:
+        res["skipped"] = [skipped[i] for i in sorted(skipped)]
+    if governor is not None:
+        res["summary"]["budget"] = governor.report(ds_id, res["records"], test_model)
+    return res
+
+
+def shard_key_fn(dataset_id: str, dedup: Optional["DedupIndex"]):
+    """分片 key：有 dedup 时按代表题分片，保证成员和代表题落在同一节点。"""
+    if dedup is None:
+        return None
+    return lambda u: (*dedup.canonical_key(dataset_id, u.item.question_id), u.variant)
+
+
+def build_result(dataset: EvalDataset,
+                 units: List[WorkUnit],
+                 outs: List[Optional[Dict[str, Any]]],
+                 failures: Dict[int, Dict[str, Any]],
+                 choice_modes: List[str],
+                 test_model: str,
+                 shard: Optional[Tuple[int, int]] = None,
+                 all_units: Optional[List[WorkUnit]] = None) -> Dict[str, Any]:
+    """
+    组装单个 (dataset, model) 的结果：summary + records（+ failed / shard 段）。
+    outs 与 units 一一对应，失败单元为 None；failures 以 units 中的下标为 key。
+    """
+    ds_id = dataset.dataset_metadata.dataset_id
+    done = [(u, rec) for u, rec in zip(units, outs) if rec is not None]
+    records = [rec for _, rec in done]
+    failed = [failed_entry(ds_id, test_model, units[pos], f)
+              for pos, f in sorted(failures.items())]
+
+    res: Dict[str, Any] = {
+        "summary": summarize(dataset.dataset_metadata, records, choice_modes,
+                             test_model=test_model, num_failed=len(failed)),
         "records": records,
     }
+    if failed:
+        res["failed"] = failed
+    if shard is not None:
+        res["shard"] = build_shard_info(all_units, [u for u, _ in done],
+                                        dataset.dataset_metadata,
+                                        test_model, choice_modes, *shard)
+    return res
+
+
+def failed_entry(dataset_id: str, test_model: str, unit: WorkUnit,
+                 failure: Dict[str, Any]) -> Dict[str, Any]:
+    """dead-letter 条目：定位工作单元所需的信息 + 最后一次错误。"""
+    return {
+        "dataset_id": dataset_id,
+        "test_model": test_model,
+        "index": unit.index,
+        "question_id": unit.item.question_id,
+        "variant": unit.variant,
+        "error": failure["error"],
+        "attempts": failure["attempts"],
+    }
@@ -0,0 +1,149 @@
+# medeval/eval/leaderboard.py
+# -*- coding: utf-8 -*-
+"""
+排行榜聚合：扫描结果目录下的 {ds_id}__{model}.json，汇总成
+model × dataset × variant 矩阵。
+
+- 只读取每个结果文件开头的 summary 段（utils.load_json_summary），不解析 records
+- 在结果目录维护缓存 .leaderboard_cache.json（按文件名记录 mtime/size/summary），
+  刷新时只读取新增或有改动的文件
+"""
+
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+from utils import load_json, save_json, load_json_summary
+
+CACHE_NAME = ".leaderboard_cache.json"
+CACHE_VERSION = 1
+
+# 这些是中间产物 / 旁路文件，不计入排行榜
+_SKIP_MARKERS = (".shard", ".partial", ".summary")
+
+
+def _is_result_file(p: Path) -> bool:
+    if p.name.startswith(".") or "__" not in p.stem:
+        return False
+    return not any(m in p.name for m in _SKIP_MARKERS)
+
+
+def _model_from_name(p: Path) -> str:
+    return p.stem.rsplit("__", 1)[1]
+
+
+def _load_cache(results_dir: Path) -> Dict[str, Any]:
+    path = results_dir / CACHE_NAME
+    if not path.exists():
+        return {}
+    try:
+        cache = load_json(path)
+    except ValueError:
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def refresh_summaries(results_dir: str | Path) -> Tuple[Dict[str, Any], int]:
+    """
+    增量刷新缓存，返回 ({文件名: 缓存条目}, 本次实际读取的文件数)。
+    缓存条目：{"mtime_ns", "size", "summary"}
+    """
+    results_dir = Path(results_dir)
+    old = _load_cache(results_dir)
+    files: Dict[str, Any] = {}
+    n_read = 0
+
+    for p in sorted(results_dir.glob("*.json")):
+        if not _is_result_file(p):
+            continue
+        st = p.stat()
+        ent = old.get(p.name)
+        if ent and ent["mtime_ns"] == st.st_mtime_ns and ent["size"] == st.st_size:
+            files[p.name] = ent
+            continue
+        try:
+            summary = load_json_summary(p)
+        except (ValueError, KeyError):
+            print(f"⚠️ 跳过无法解析 summary 的结果文件：{p}")
+            continue
+        files[p.name] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "summary": summary}
+        n_read += 1
+
+    # 删除的文件自然不会出现在新缓存里
+    save_json({"version": CACHE_VERSION, "files": files}, results_dir / CACHE_NAME)
+    return files, n_read
+
+
+def _summary_rows(fname: str, summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    model = summary.get("test_model") or _model_from_name(Path(fname))
+    common = {
+        "model": model,
+        "dataset_id": summary.get("dataset_id"),
+        "dataset_name": summary.get("dataset_name"),
+    }
+    rows = []
+    for variant, accs in (summary.get("choice_summary") or {}).items():
+        rows.append({**common, "variant": variant, **accs})
+    if summary.get("num_open_records", summary.get("full_score_rate_open")):
+        rows.append({**common, "variant": "open",
+                     "full_score_rate_open": summary.get("full_score_rate_open", 0.0)})
+    return rows
+
+
+def build_leaderboard(results_dir: str | Path) -> Dict[str, Any]:
+    """
+    返回：
+      {
+        "matrix": {model: {dataset_id: {variant: {指标: 值}}}},
+        "rows":   [扁平化的 (model, dataset, variant, 指标...) 行],
+        "num_files": 结果文件数,
+        "num_read": 本次实际读取的文件数,
+      }
+    """
+    files, n_read = refresh_summaries(results_dir)
+
+    rows: List[Dict[str, Any]] = []
+    for fname in sorted(files):
+        rows.extend(_summary_rows(fname, files[fname]["summary"]))
+
+    matrix: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for r in rows:
+        metrics = {k: v for k, v in r.items()
+                   if k not in ("model", "dataset_id", "dataset_name", "variant")}
+        matrix.setdefault(r["model"], {}).setdefault(r["dataset_id"], {})[r["variant"]] = metrics
+
+    return {
+        "matrix": matrix,
+        "rows": rows,
+        "num_files": len(files),
+        "num_read": n_read,
+    }
+
+
+def _metric_label(variant: str, metric: str) -> str:
+    if variant == "open":
+        return "open"
+    return f"{variant}:{metric.replace('accuracy_', '')}"
+
+
+def format_leaderboard(board: Dict[str, Any]) -> str:
+    """
+    终端展示：每行一个模型，每列一个 dataset:variant:指标。
+    单选 / 多选准确率各占一列，不因某项为 0 而改显示另一项。
+    """
+    matrix = board["matrix"]
+    cols = sorted({(ds, v, k) for m in matrix.values() for ds, vs in m.items()
+                   for v, metrics in vs.items() for k in metrics})
+    if not cols:
+        return "(empty leaderboard)"
+
+    header = ["model"] + [f"{ds}:{_metric_label(v, k)}" for ds, v, k in cols]
+    lines = ["\t".join(header)]
+    for model in sorted(matrix):
+        cells = [model]
+        for ds, v, k in cols:
+            value = matrix[model].get(ds, {}).get(v, {}).get(k)
+            cells.append(f"{value:.3f}" if value is not None else "-")
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,268 @@
+# medeval/eval/planner.py
+# -*- coding: utf-8 -*-
+"""
+Dry-run 规划（main.py --plan）
+
+按真实评测流程展开每个数据集（choice_modes × choice_aug 增强）并渲染全部 prompt，
+但不发送任何请求。数据集由调用方按正式运行的方式加载（--max_examples / --stratify 抽样），
+再与正式运行一样按 --shard 取本节点的分片、按 --dedup collapse 去掉复用代表题结果的成员；用本地 token 近似（utils.estimate_tokens）估算：
+  - 待测模型 / 裁判模型调用次数
+  - prompt / completion token 数
+  - 按模型计费的成本
+  - 给定并发下的预计耗时
+"""
+
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from data.schema import EvalDataset
+from eval.evaluator import normalize_choice_modes, iter_work_units, prepare_unit, shard_key_fn
+from eval.shard import select_shard
+from judge.llm_judge import build_judge_messages
+from utils.text import estimate_tokens
+from utils.media import message_text
+
+if TYPE_CHECKING:
+    from eval.dedup import DedupIndex
+
+
+class PlanAssumptions(NamedTuple):
+    choice_completion_tokens: int = 8      # "<A,C>" 之类；logprob 打分的单选题固定 1
+    open_completion_tokens: int = 256      # 开放题回答长度；也作为裁判 prompt 中的答案长度
+    judge_tokens_per_point: int = 5        # 裁判输出中每个 scoring point 的 "P1": true, 开销
+    message_overhead_tokens: int = 4       # 每条 message 的角色 / 分隔符开销
+    image_tokens: int = 765                # 每张图片的 token 近似（高清 512px 切块）
+    base_latency: float = 0.8              # 单次请求固定延迟（秒）
+    tokens_per_second: float = 40.0        # 生成速度
+
+
+# USD / 1M tokens；可用 --plan_prices 覆盖 / 补充
+DEFAULT_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"prompt": 2.5, "completion": 10.0},
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.6},
+}
+
+
+def _messages_tokens(messages: List[Dict[str, str]], a: PlanAssumptions) -> int:
+    total = 0
+    for m in messages:
+        content = m.get("content", "")
+        total += estimate_tokens(message_text(content)) + a.message_overhead_tokens
+        if isinstance(content, list):
+            total += a.image_tokens * sum(1 for p in content if p.get("type") != "text")
+    return total
+
+
+def _latency(completion_tokens: int, a: PlanAssumptions) -> float:
+    return a.base_latency + completion_tokens / a.tokens_per_second
+
+
+def plan_dataset(dataset: EvalDataset,
+                 choice_modes: Optional[List[str]],
+                 judge_mode: str,
+                 a: PlanAssumptions,
+                 choice_scoring: str = "generate",
+                 shard: Optional[Tuple[int, int]] = None,
+                 dedup: Optional["DedupIndex"] = None,
+                 collapse_duplicates: bool = False) -> Dict[str, Any]:
+    """
+    单个数据集、单个待测模型的调用量估算。
+    judge_mode: rule / llm / cascade（cascade 按全部开放题走 LLM 估上界）
+    shard / dedup / collapse_duplicates 同 run_eval：只估算本分片、实际会发请求的工作单元。
+    """
+    choice_modes = normalize_choice_modes(choice_modes)
+    ds_id = dataset.dataset_metadata.dataset_id
+    units = iter_work_units(dataset, choice_modes)
+    if shard is not None:
+        units = select_shard(units, ds_id, *shard, key_fn=shard_key_fn(ds_id, dedup))
+    n_units = len(units)
+    if dedup is not None and collapse_duplicates:
+        units = [u for u in units if not dedup.is_member(ds_id, u.item.question_id)]
+    placeholder_answer = "答" * a.open_completion_tokens
+
+    st = {
+        "work_units": n_units,
+        "collapsed_units": n_units - len(units),
+        "test_calls": 0, "test_prompt_tokens": 0, "test_completion_tokens": 0,
+        "judge_calls": 0, "judge_prompt_tokens": 0, "judge_completion_tokens": 0,
+        "unit_seconds": 0.0, "max_unit_seconds": 0.0,
+    }
+    for u in units:
+        p = prepare_unit(u, choice_scoring)
+        if p.dialogue is not None:
+            secs = _plan_dialogue(u.item, p.dialogue, judge_mode, a, st)
+            st["unit_seconds"] += secs
+            st["max_unit_seconds"] = max(st["max_unit_seconds"], secs)
+            continue
+        is_open = p.choice is None
+        if is_open:
+            completion = a.open_completion_tokens
+        else:
+            completion = 1 if p.choice.scoring == "logprob" else a.choice_completion_tokens
+        st["test_calls"] += 1
+        st["test_prompt_tokens"] += _messages_tokens(p.messages, a)
+        st["test_completion_tokens"] += completion
+        secs = _latency(completion, a)
+
+        if is_open and judge_mode in ("llm", "cascade"):
+            md = u.item.metadata
+            points = md.positive_scoring_points + md.negative_scoring_points
+            jm = build_judge_messages(u.item.question, md.positive_scoring_points,
+                                      md.negative_scoring_points, placeholder_answer)
+            j_completion = a.judge_tokens_per_point * len(points) + 2
+            st["judge_calls"] += 1
+            st["judge_prompt_tokens"] += _messages_tokens(jm, a)
+            st["judge_completion_tokens"] += j_completion
+            secs += _latency(j_completion, a)
+
+        st["unit_seconds"] += secs
+        st["max_unit_seconds"] = max(st["max_unit_seconds"], secs)
+    return st
+
+
+def _plan_dialogue(item, dlg, judge_mode: str, a: PlanAssumptions,
+                   st: Dict[str, Any]) -> float:
+    """多轮对话：每轮一次调用，prompt 为累积前缀；没有参考回复的轮次按开放题回答长度估算。"""
+    completion = a.open_completion_tokens
+    prefix = _messages_tokens([dlg.system], a)
+    secs = 0.0
+    for k, turn in enumerate(dlg.turns):
+        prefix += _messages_tokens([turn.user], a)
+        st["test_calls"] += 1
+        st["test_prompt_tokens"] += prefix
+        st["test_completion_tokens"] += completion
+        secs += _latency(completion, a)
+
+        last = k == len(dlg.turns) - 1
+        md = item.metadata
+        pos, neg = ((md.positive_scoring_points, md.negative_scoring_points) if last
+                    else (list(turn.criteria), []))
+        points = list(pos) + list(neg)
+        if points and judge_mode in ("llm", "cascade"):
+            jm = build_judge_messages(turn.text, pos, neg, "答" * completion)
+            j_completion = a.judge_tokens_per_point * len(points) + 2
+            st["judge_calls"] += 1
+            st["judge_prompt_tokens"] += _messages_tokens(jm, a)
+            st["judge_completion_tokens"] += j_completion
+            secs += _latency(j_completion, a)
+
+        if not last:
+            prefix += (_messages_tokens([turn.reference], a) if turn.reference
+                       else completion + a.message_overhead_tokens)
+    return secs
+
+
+def _cost(model: str, prompt: int, completion: int,
+          prices: Dict[str, Dict[str, float]]) -> Optional[float]:
+    pr = prices.get(model)
+    if pr is None:
+        return None
+    return (prompt * pr["prompt"] + completion * pr["completion"]) / 1e6
+
+
+def build_plan(datasets: List[EvalDataset],
+               test_models: List[str],
+               judge_model: str,
+               choice_modes: Optional[List[str]],
+               judge_mode: str,
+               workers: int,
+               prices: Optional[Dict[str, Dict[str, float]]] = None,
+               assumptions: Optional[PlanAssumptions] = None,
+               test_rpm: Optional[float] = None,
+               judge_rpm: Optional[float] = None,
+               choice_scoring: str = "generate",
+               shard: Optional[Tuple[int, int]] = None,
+               dedup: Optional["DedupIndex"] = None,
+               collapse_duplicates: bool = False) -> Dict[str, Any]:
+    """
+    workers 为每个待测模型的并发数（与正式运行一致）。数据集之间串行，
+    每个数据集的耗时取 max(总耗时 / 并发, 最慢单元, 速率上限约束)。
+    datasets 应与正式运行加载方式一致（同样的抽样）；shard 时只估算本节点。
+    """
+    a = assumptions or PlanAssumptions()
+    prices = {**DEFAULT_PRICES, **(prices or {})}
+    n_models = len(test_models)
+
+    per_dataset = []
+    wall = 0.0
+    for ds in datasets:
+        st = plan_dataset(ds, choice_modes, judge_mode, a, choice_scoring,
+                          shard=shard, dedup=dedup, collapse_duplicates=collapse_duplicates)
+        ds_wall = max(st["unit_seconds"] / max(1, workers), st["max_unit_seconds"])
+        if test_rpm:
+            ds_wall = max(ds_wall, st["test_calls"] / test_rpm * 60)
+        if judge_rpm and st["judge_calls"]:
+            ds_wall = max(ds_wall, st["judge_calls"] * n_models / judge_rpm * 60)
+        wall += ds_wall
+        per_dataset.append({
+            "dataset_id": ds.dataset_metadata.dataset_id,
+            "dataset_name": ds.dataset_metadata.dataset_name,
+            **{k: v for k, v in st.items() if k not in ("unit_seconds", "max_unit_seconds")},
+            "est_seconds": ds_wall,
+        })
+
+    def _total(k: str) -> int:
+        return sum(d[k] for d in per_dataset)
+
+    by_model: Dict[str, Dict[str, Any]] = {}
+    for m in test_models:
+        by_model[m] = {
+            "role": "test",
+            "calls": _total("test_calls"),
+            "prompt_tokens": _total("test_prompt_tokens"),
+            "completion_tokens": _total("test_completion_tokens"),
+        }
+    if _total("judge_calls"):
+        # 多模型 sweep 时每个模型的答案各判一次（逐字相同的答案会复用，这里按上界估）
+        by_model.setdefault(judge_model, {"role": "judge", "calls": 0,
+                                          "prompt_tokens": 0, "completion_tokens": 0})
+        jm = by_model[judge_model]
+        jm["calls"] += _total("judge_calls") * n_models
+        jm["prompt_tokens"] += _total("judge_prompt_tokens") * n_models
+        jm["completion_tokens"] += _total("judge_completion_tokens") * n_models
+        if jm["role"] != "judge":
+            jm["role"] = "test+judge"
+
+    for m, st in by_model.items():
+        st["est_cost_usd"] = _cost(m, st["prompt_tokens"], st["completion_tokens"], prices)
+
+    costs = [st["est_cost_usd"] for st in by_model.values()]
+    return {
+        "test_models": test_models,
+        "judge_model": judge_model if _total("judge_calls") else None,
+        "judge_mode": judge_mode,
+        "judge_calls_are_upper_bound": judge_mode == "cascade" or n_models > 1,
+        "workers": workers,
+        "shard": list(shard) if shard is not None else None,
+        "assumptions": a._asdict(),
+        "datasets": per_dataset,
+        "by_model": by_model,
+        "total_calls": sum(st["calls"] for st in by_model.values()),
+        "est_cost_usd": sum(c for c in costs if c is not None),
+        "models_without_price": [m for m, st in by_model.items() if st["est_cost_usd"] is None],
+        "est_wall_seconds": wall,
+    }
+
+
+def format_plan(plan: Dict[str, Any]) -> str:
+    head = f"[PLAN] judge={plan['judge_mode']} workers/model={plan['workers']}"
+    if plan.get("shard"):
+        head += f" shard={plan['shard'][0]}/{plan['shard'][1]}"
+    lines = [head]
+    for d in plan["datasets"]:
+        collapsed = f" ({d['collapsed_units']} collapsed)" if d.get("collapsed_units") else ""
+        lines.append(
+            f"  {d['dataset_id']}: {d['work_units']} units{collapsed}, "
+            f"test {d['test_calls']} calls / {d['test_prompt_tokens']}+{d['test_completion_tokens']} tok, "
+            f"judge {d['judge_calls']} calls / {d['judge_prompt_tokens']}+{d['judge_completion_tokens']} tok, "
+            f"~{d['est_seconds']:.0f}s"
+        )
+    for m, st in plan["by_model"].items():
+        cost = "n/a" if st["est_cost_usd"] is None else f"${st['est_cost_usd']:.2f}"
+        lines.append(f"  [{st['role']}] {m}: {st['calls']} calls, "
+                     f"{st['prompt_tokens']} prompt + {st['completion_tokens']} completion tok, {cost}")
+    note = "（裁判调用为上界）" if plan["judge_calls_are_upper_bound"] else ""
+    lines.append(f"  total: {plan['total_calls']} calls{note}, ~${plan['est_cost_usd']:.2f}, "
+                 f"~{plan['est_wall_seconds'] / 60:.1f} min")
+    if plan["models_without_price"]:
+        lines.append(f"  ⚠️ 未配置价格的模型：{', '.join(plan['models_without_price'])}（--plan_prices）")
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+# medeval/eval/progress.py
+# -*- coding: utf-8 -*-
+"""
+运行中进度（main.py --progress_interval）
+
+- OnlineSummary：每完成一条 record 增量更新计数（O(1)），随时可取 summary 的主要指标
+- ProgressReporter：包装 evaluate，按模型聚合；后台定时线程每隔 interval 秒
+  （与 record 是否完成无关，长时间卡住的请求期间 ETA / elapsed 照样更新）
+    * 原子重写 {ds_id}__{model}.partial.json（summary 为第一个 key，只含汇总不含 records，
+      看板可以低成本轮询；leaderboard / rejudge 会跳过 .partial 文件）；
+      updated_at 为写出时的墙钟时间，看板据此判断进程是否还活着
+    * 打印一行进度：完成数 / 总数、items/s、ETA、各 variant 的即时准确率
+- 最终结果仍由 build_result 基于完整 records 汇总；partial 文件在结束时写入 status="done"
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Sequence, Tuple
+
+from utils.io import save_json_atomic
+
+OPEN_KEY = "open"   # 开放题 / 多轮对话没有 variant，按此 key 聚合
+
+
+class OnlineSummary:
+    """summarize 的增量版本：只维护计数，不保存 records。"""
+
+    def __init__(self):
+        self.num_records = 0
+        self.total_score = 0
+        self.max_score = 0
+        self.by_key: Dict[str, list] = {}   # variant / "open" -> [ok 数, record 数]
+        self.by_type: Dict[Tuple[str, str], list] = {}
+
+    def add(self, rec: Dict[str, Any]):
+        self.num_records += 1
+        self.total_score += rec.get("score_obtained", 0)
+        self.max_score += rec.get("score_full", 0)
+        ok = 1 if rec.get("ok") else 0
+        key = rec.get("variant") or OPEN_KEY
+        c = self.by_key.setdefault(key, [0, 0])
+        c[0] += ok
+        c[1] += 1
+        t = self.by_type.setdefault((key, rec.get("type", "")), [0, 0])
+        t[0] += ok
+        t[1] += 1
+
+    def accuracy(self) -> Dict[str, float]:
+        return {k: ok / n for k, (ok, n) in self.by_key.items()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        与 summarize 同名的字段按同一定义计算（见 eval.evaluator.choice_accuracy_fields），
+        最终结果中这些字段与快照一致。快照只是 summary 的子集：
+        choice_summary 只含已有 record 完成的 variant；dataset_id / test_model 由 ProgressReporter
+        写 partial 时补上；不含 num_failed 以及 judge_cascade、calibration 等需要完整 records 的分项汇总。
+        """
+        from .evaluator import choice_accuracy_fields  # 避免循环导入
+
+        choice_summary = {
+            k: choice_accuracy_fields({t: c for (key, t), c in self.by_type.items() if key == k})
+            for k in self.by_key if k != OPEN_KEY
+        }
+        open_ok, open_n = self.by_type.get((OPEN_KEY, "open_response"), (0, 0))
+        return {
+            "num_records": self.num_records,
+            "total_score": self.total_score,
+            "max_score": self.max_score,
+            "choice_summary": choice_summary,
+            "full_score_rate_open": open_ok / open_n if open_n else 0.0,
+            "num_open_records": open_n,
+        }
+
+
+def _fmt_seconds(s: Optional[float]) -> str:
+    if s is None:
+        return "?"
+    s = int(s)
+    if s >= 3600:
+        return f"{s // 3600}h{s % 3600 // 60:02d}m"
+    return f"{s // 60}m{s % 60:02d}s"
+
+
+class _ModelProgress:
+    __slots__ = ("summary", "total", "done", "skipped", "errors")
+
+    def __init__(self):
+        self.summary = OnlineSummary()
+        self.total = 0
+        self.done = 0
+        self.skipped = 0
+        self.errors = 0
+
+
+class ProgressReporter:
+    """
+    一个数据集一个实例（run_units 内部使用）。
+    out_dir 为空时只打印进度行；interval 为定时刷新的间隔（秒），<= 0 时只在结束时写一次。
+    name_suffix 用于分片运行（例如 ".shard0of4"），与结果文件命名一致。
+    """
+
+    def __init__(self, dataset_id: str,
+                 out_dir: Optional[str | Path] = None,
+                 interval: float = 10.0,
+                 name_suffix: str = "",
+                 stream=None):
+        self.dataset_id = dataset_id
+        self.out_dir = Path(out_dir) if out_dir is not None else None
+        self.interval = interval
+        self.name_suffix = name_suffix
+        self.stream = stream or sys.stdout
+        self.models: Dict[str, _ModelProgress] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # 串行化 flush：旧快照不会覆盖新快照
+        self._t0 = time.monotonic()
+        self._stop: Optional[threading.Event] = None
+        self._timer: Optional[threading.Thread] = None
+
+    def partial_path(self, model: str) -> Optional[Path]:
+        if self.out_dir is None:
+            return None
+        return self.out_dir / f"{self.dataset_id}__{model}{self.name_suffix}.partial.json"
+
+    def instrument(self, evaluate: Callable[[str, Any], Optional[Dict[str, Any]]],
+                   tasks: Sequence[Tuple[str, Any]]) -> Callable[[str, Any], Optional[Dict[str, Any]]]:
+        self._t0 = time.monotonic()
+        for m, _ in tasks:
+            self.models.setdefault(m, _ModelProgress()).total += 1
+        self._start_timer()
+
+        def _evaluate(model: str, unit: Any) -> Optional[Dict[str, Any]]:
+            try:
+                rec = evaluate(model, unit)
+            except Exception:
+                with self._lock:
+                    self.models[model].errors += 1   # 之后走延迟重试，成功时再计入 done
+                raise
+            with self._lock:
+                mp = self.models[model]
+                if rec is None:
+                    mp.skipped += 1                   # 被预算控制跳过
+                else:
+                    mp.done += 1
+                    mp.summary.add(rec)
+            return rec
+
+        return _evaluate
+
+    def _start_timer(self):
+        if self._timer is not None or self.interval <= 0:
+            return
+        stop = self._stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(self.interval):
+                try:
+                    self.flush()
+                except Exception as e:   # 写盘失败不影响评测本身
+                    print(f"[PROGRESS] flush failed: {e!r}", file=self.stream, flush=True)
+
+        self._timer = threading.Thread(target=_loop, name=f"progress-{self.dataset_id}", daemon=True)
+        self._timer.start()
+
+    def _stop_timer(self):
+        if self._timer is None:
+            return
+        self._stop.set()
+        self._timer.join()
+        self._timer = self._stop = None
+
+    def _progress(self, mp: _ModelProgress, elapsed: float) -> Dict[str, Any]:
+        rate = mp.done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, mp.total - mp.done - mp.skipped)
+        return {
+            "done": mp.done,
+            "total": mp.total,
+            "skipped": mp.skipped,
+            "errors": mp.errors,
+            "elapsed_seconds": round(elapsed, 1),
+            "items_per_second": round(rate, 3),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None,
+        }
+
+    def flush(self, status: str = "running"):
+        """写出所有模型的 partial 文件并打印进度行。"""
+        with self._flush_lock:
+            with self._lock:
+                elapsed = time.monotonic() - self._t0
+                snaps = {m: (self._progress(mp, elapsed), mp.summary.snapshot(), mp.summary.accuracy())
+                         for m, mp in self.models.items()}
+            updated_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+            for m, (prog, summary, acc) in snaps.items():
+                path = self.partial_path(m)
+                if path is not None:
+                    save_json_atomic({
+                        "summary": {"dataset_id": self.dataset_id, "test_model": m, **summary},
+                        "status": status,
+                        "updated_at": updated_at,
+                        "progress": prog,
+                    }, path)
+                pct = 100.0 * prog["done"] / prog["total"] if prog["total"] else 100.0
+                acc_str = " ".join(f"{k}={v:.3f}" for k, v in sorted(acc.items()))
+                print(f"[PROGRESS] {self.dataset_id} / {m}: {prog['done']}/{prog['total']} ({pct:.0f}%) "
+                      f"{prog['items_per_second']:.2f} it/s ETA {_fmt_seconds(prog['eta_seconds'])} "
+                      f"acc {acc_str or '-'}", file=self.stream, flush=True)
+
+    def finish(self):
+        self._stop_timer()
+        self.flush(status="done")
@@ -1,8 +1,20 @@
 from typing import Dict, Any, List
 from data.schema import Item
+from utils.media import image_parts
 
 LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+def _with_images(item: Item, text: str) -> Any:
+    """
+    有 multimodal_data 时返回 content parts（文本 + 图片引用），否则原样返回文本。
+    图片只放引用，发送前由 client 统一懒加载编码（utils.media.materialize_messages）。
+    """
+    parts = image_parts(item.multimodal_data)
+    if not parts:
+        return text
+    return [{"type": "text", "text": text}] + parts
+
+
 def build_choice_messages(item: Item, options: list[str]) -> List[Dict[str, str]]:
     md = item.metadata
     tpl = md.prompt_template or ""
@@ -18,7 +30,26 @@ def build_choice_messages(item: Item, options: list[str]) -> List[Dict[str, str]
             "要求：只输出正确选项的序号，放在尖括号 <> 中；多选题用逗号分隔，例如 <A,B>。\n\n"
             f"题目：{q}\n\n{opts_str}\n\n答：<>"
         )
-    return [{"role": "user", "content": content}]
+    return [{"role": "user", "content": _with_images(item, content)}]
+
+
+def build_choice_logprob_messages(item: Item, options: list[str]) -> List[Dict[str, str]]:
+    """logprob 打分用：要求第一个输出 token 就是选项字母（单选题）。"""
+    md = item.metadata
+    tpl = md.prompt_template or ""
+    q = item.question
+    letters = LETTERS[:len(options)]
+    opts_str = "\n".join(f"{letters[i]}. {opt}" for i, opt in enumerate(options))
+
+    if tpl.strip():
+        content = tpl + f"\n题目：{q}\n\n{opts_str}\n\n只输出正确选项的字母。\n答："
+    else:
+        content = (
+            "##任务：请回答以下单选题。\n"
+            "要求：只输出正确选项的字母（例如 A），不要输出任何其它内容。\n\n"
+            f"题目：{q}\n\n{opts_str}\n\n答："
+        )
+    return [{"role": "user", "content": _with_images(item, content)}]
 
 
 def build_open_test_messages(item: Item) -> List[Dict[str, str]]:
@@ -34,4 +65,20 @@ def build_open_test_messages(item: Item) -> List[Dict[str, str]]:
             "不要输出多余说明。\n\n"
             f"题目：{q}\n\n答：<>"
         )
-    return [{"role": "user", "content": content}]
+    return [{"role": "user", "content": _with_images(item, content)}]
+
+
+DIALOGUE_SYSTEM_PROMPT = (
+    "##任务：你正在进行多轮医疗问诊对话。请结合此前的对话内容回答用户最新的提问，"
+    "并将最终答案填写在尖括号 <> 中输出。\n不要输出多余说明。"
+)
+
+
+def build_dialogue_system_message(item: Item) -> Dict[str, str]:
+    tpl = item.metadata.prompt_template or ""
+    return {"role": "system", "content": tpl if tpl.strip() else DIALOGUE_SYSTEM_PROMPT}
+
+
+def build_dialogue_user_message(item: Item, text: str, first: bool) -> Dict[str, Any]:
+    """图片挂在第一轮：属于各轮共享的前缀，后续轮次可以命中服务端前缀缓存。"""
+    return {"role": "user", "content": _with_images(item, text) if first else text}
@@ -0,0 +1,145 @@
+# medeval/eval/rejudge.py
+# -*- coding: utf-8 -*-
+"""
+离线重判（main.py rejudge）
+
+rubric 修订或更换裁判后，不再调用待测模型：
+  - 读取已有结果文件中开放题 record 的 answer，按 question_id 关联当前数据集的 rubric
+  - 只重判 rubric_hash / judge_hash 与当前不一致的 record（旧结果没有哈希，视为需要重判）
+  - RuleJudge 纯 CPU，走进程池；LLM / 级联裁判走线程并发（+ 延迟重试）
+  - 重判失败的 record 保留旧分数和旧哈希，下次 rejudge 会再次尝试
+  - 多轮对话 record 的中间轮次（dialogue criteria）一并重判，并刷新整段对话汇总
+  - 重新汇总 summary，其余段落（failed / shard 等）原样保留
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
+
+from data.schema import EvalDataset, Item
+from judge.base import Judge
+from judge.rule_judge import RuleJudge
+from eval.evaluator import open_score_fields, rubric_hash, summarize
+from eval.dialogue import is_dialogue_item, prepare_dialogue, refresh_dialogue_aggregate
+from eval.retry import RetryPolicy, run_isolated
+
+def _score_task(item: Item, answer: str) -> Tuple:
+    md = item.metadata
+    return (item.question, list(md.positive_scoring_points), list(md.negative_scoring_points),
+            answer, md.score, dict(md.synonyms or {}))
+
+
+def _turn_jobs(pos: int, item: Item, rec: Dict[str, Any]) -> List[Tuple[int, Item, int, Tuple]]:
+    """多轮对话中带 criteria 的中间轮次：(record 下标, 题目, 轮次, 评分参数)。"""
+    if "turns" not in rec or not is_dialogue_item(item):
+        return []
+    jobs = []
+    prep = prepare_dialogue(item)
+    for tr in rec["turns"][:-1]:
+        k = tr["turn"]
+        if k < len(prep.turns) - 1 and prep.turns[k].criteria:
+            crit = list(prep.turns[k].criteria)
+            jobs.append((pos, item, k, (prep.turns[k].text, crit, [], tr.get("answer") or "",
+                                        len(crit), dict(item.metadata.synonyms or {}))))
+    return jobs
+
+
+def _rule_score(judge: RuleJudge, task: Tuple) -> Dict[str, Any]:
+    """进程池 worker：task 为 score_open_response 的位置参数；judge 随任务传入，保留其匹配配置。"""
+    return judge.score_open_response(*task)
+
+
+def stale_open_records(res: Dict[str, Any],
+                       items: Dict[str, Item],
+                       judge_hash: str,
+                       force: bool = False) -> Tuple[List[Tuple[int, Item]], int]:
+    """
+    返回 ([(record 下标, 当前数据集中的题目)], 数据集中已找不到的开放题 record 数)。
+    """
+    stale, missing = [], 0
+    for pos, rec in enumerate(res.get("records", [])):
+        if rec.get("type") != "open_response":
+            continue
+        item = items.get(rec["question_id"])
+        if item is None:
+            missing += 1
+            continue
+        if force or rec.get("judge_hash") != judge_hash or rec.get("rubric_hash") != rubric_hash(item):
+            stale.append((pos, item))
+    return stale, missing
+
+
+def rejudge_result(res: Dict[str, Any],
+                   dataset: EvalDataset,
+                   judge: Judge,
+                   workers: int = 1,
+                   processes: Optional[int] = None,
+                   retry: Optional[RetryPolicy] = None,
+                   force: bool = False) -> Dict[str, Any]:
+    """
+    原地更新 res（records + summary），返回本次重判统计（同时写入 summary["rejudge"]）。
+    processes: RuleJudge 进程池大小，None 为 CPU 核数，<= 1 时在当前进程执行。
+    """
+    t0 = time.time()
+    judge_hash = judge.fingerprint()
+    items = {it.question_id: it for it in dataset.dataset}
+    records = res["records"]
+    stale, missing = stale_open_records(res, items, judge_hash, force)
+
+    # jobs: (record 下标, 题目, 轮次, 评分参数)；轮次为 None 表示最终回答（item rubric）
+    jobs = []
+    for pos, item in stale:
+        jobs.append((pos, item, None, _score_task(item, records[pos].get("answer") or "")))
+        jobs.extend(_turn_jobs(pos, item, records[pos]))
+    tasks = [j[3] for j in jobs]
+    failures: Dict[int, Dict[str, Any]] = {}
+    n_proc = processes if processes is not None else (os.cpu_count() or 1)
+    if isinstance(judge, RuleJudge) and n_proc > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_proc) as pool:
+            outs = list(pool.map(partial(_rule_score, judge), tasks,
+                                 chunksize=max(1, len(tasks) // (4 * n_proc))))
+    elif isinstance(judge, RuleJudge):
+        outs = [_rule_score(judge, t) for t in tasks]
+    else:
+        outs, failures = run_isolated(lambda t: judge.score_open_response(*t),
+                                      tasks, workers=workers, retry=retry)
+
+    failed_pos = {jobs[i][0] for i in failures}
+    for i, ((pos, item, turn, task), sc) in enumerate(zip(jobs, outs)):
+        if pos in failed_pos:
+            continue  # 同一 record 有任何一次重判失败，整条保留旧结果
+        rec = records[pos]
+        if turn is None:
+            rec.update(open_score_fields(item, sc, judge_hash))
+            if "turns" in rec:
+                rec["turns"][-1].update({"score_obtained": rec["score_obtained"],
+                                         "score_full": rec["score_full"], "ok": rec["ok"]})
+        else:
+            rec["turns"][turn].update({"score_obtained": sc["score"], "score_full": task[4],
+                                       "ok": sc.get("ok", False),
+                                       "scoring_points_flags": sc.get("scoring_points_flags", [])})
+    for pos, _ in stale:
+        if pos not in failed_pos and "turns" in records[pos]:
+            refresh_dialogue_aggregate(records[pos])
+
+    old = res["summary"]
+    summary = summarize(dataset.dataset_metadata, records,
+                        list(old.get("choice_summary", {})),
+                        test_model=old.get("test_model"),
+                        num_failed=old.get("num_failed", 0))
+    for k, v in old.items():
+        if k not in summary and k not in ("judge_cascade", "dedup", "rejudge"):
+            summary[k] = v
+    stats = {
+        "judge_hash": judge_hash,
+        "open_records": sum(1 for r in records if r.get("type") == "open_response"),
+        "rescored": len(stale) - len(failed_pos),
+        "failed": len(failed_pos),
+        "missing_in_dataset": missing,
+        "seconds": time.time() - t0,
+    }
+    summary["rejudge"] = stats
+    res["summary"] = summary
+    return stats
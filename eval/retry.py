@@ -0,0 +1,70 @@
+# medeval/eval/retry.py
+# -*- coding: utf-8 -*-
+"""
+失败隔离 + 延迟重试
+
+- 主流程中单个工作单元抛异常（client.chat 超时 / HTTP 错误 / 裁判失败等）
+  不再中断整个数据集，而是进入延迟重试队列，worker 继续处理后面的单元
+- 主流程结束后统一扫一遍重试队列：独立的并发度 + 指数退避
+- 多轮重试后仍失败的单元作为死信返回，由调用方写入 dead-letter JSONL
+"""
+
+import time
+import traceback
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class RetryPolicy(NamedTuple):
+    max_rounds: int = 2      # 延迟重试轮数，0 表示不重试
+    workers: int = 2         # 重试阶段并发数（与主流程分开，避免打爆出问题的服务）
+    backoff: float = 5.0     # 第 k 轮重试前等待 backoff * 2**(k-1) 秒
+
+
+def _describe(e: BaseException) -> str:
+    return "".join(traceback.format_exception_only(type(e), e)).strip()
+
+
+def run_isolated(fn: Callable[[Any], Any],
+                 tasks: Sequence[Any],
+                 workers: int = 1,
+                 retry: Optional[RetryPolicy] = None
+                 ) -> Tuple[List[Any], Dict[int, Dict[str, Any]]]:
+    """
+    对每个 task 执行 fn(task)，单个失败不影响其它 task。
+
+    返回 (outs, failures)：
+      - outs[i]：task i 的结果；失败时为 None
+      - failures：{task 下标: {"error": 最后一次异常描述, "attempts": 尝试次数}}
+    """
+    from .evaluator import map_ordered  # 避免循环导入
+
+    retry = retry or RetryPolicy()
+
+    def _safe(i: int) -> Tuple[bool, Any]:
+        try:
+            return True, fn(tasks[i])
+        except Exception as e:
+            return False, _describe(e)
+
+    outs: List[Any] = [None] * len(tasks)
+    failures: Dict[int, Dict[str, Any]] = {}
+
+    for i, (ok, val) in enumerate(map_ordered(_safe, range(len(tasks)), workers=workers)):
+        if ok:
+            outs[i] = val
+        else:
+            failures[i] = {"error": val, "attempts": 1}
+
+    for rnd in range(1, retry.max_rounds + 1):
+        if not failures:
+            break
+        time.sleep(retry.backoff * 2 ** (rnd - 1))
+        pending = sorted(failures)
+        for i, (ok, val) in zip(pending, map_ordered(_safe, pending, workers=retry.workers)):
+            if ok:
+                outs[i] = val
+                del failures[i]
+            else:
+                failures[i] = {"error": val, "attempts": failures[i]["attempts"] + 1}
+
+    return outs, failures
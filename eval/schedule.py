@@ -0,0 +1,148 @@
+# medeval/eval/schedule.py
+# -*- coding: utf-8 -*-
+"""
+工作单元调度（代价感知）
+
+固定 worker 数时，数据集顺序靠后的长开放题会在最后拖出长尾。调度器在派发前重排 (模型, 单元)：
+  - 代价估计：按题型（choice / open / dialogue）的基础耗时 + prompt 长度，
+    再乘以该题型“实测 / 估计”耗时比的滑动平均（跨数据集持续学习）
+  - lpt：最长预计耗时优先（Longest Processing Time first），缩短整体完成时间；
+    开场相同的多轮对话为一个前缀组，按组的总预计耗时参与排序、组内相邻派发，
+    不会为了 LPT 拆散前缀组（否则服务端前缀缓存命中率下降）
+  - priority：按 metadata 字段（如 category1）指定的优先子集先派发，
+    子集全部完成时回调 on_priority_done，尽早拿到这部分结果
+record 顺序不受影响（run_units 按 unit.index 还原）。
+"""
+
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from eval.dialogue import ASSISTANT_ROLES, is_dialogue_item, prefix_cache_order, prefix_group_key
+from utils.text import estimate_tokens
+
+SCHEDULE_POLICIES = ("order", "lpt")
+
+# 先验：单次请求固定延迟 + 生成耗时（与 planner.PlanAssumptions 的默认值一致）
+_PRIOR_SECONDS = {"choice": 0.8 + 8 / 40, "open": 0.8 + 256 / 40, "dialogue": 0.8 + 256 / 40}
+_PREFILL_SECONDS_PER_TOKEN = 1 / 2000
+
+
+def unit_kind(unit: Any) -> str:
+    if unit.variant is not None:
+        return "choice"
+    return "dialogue" if is_dialogue_item(unit.item) else "open"
+
+
+def _unit_prompt_tokens(unit: Any) -> int:
+    item = unit.item
+    text = item.question + "".join(item.options)
+    if is_dialogue_item(item):
+        text += "".join(d.get("content", "") for d in item.metadata.dialogue)
+    return estimate_tokens(text)
+
+
+class CostModel:
+    """单元耗时估计 + 按题型在线校准（线程安全）。"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._ratio: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def raw_estimate(self, unit: Any) -> float:
+        kind = unit_kind(unit)
+        turns = 1
+        if kind == "dialogue":
+            turns = 1 + sum(1 for d in unit.item.metadata.dialogue
+                            if str(d.get("role", "user")).lower() not in ASSISTANT_ROLES)
+        return turns * _PRIOR_SECONDS[kind] + _unit_prompt_tokens(unit) * _PREFILL_SECONDS_PER_TOKEN
+
+    def estimate(self, unit: Any) -> float:
+        return self.raw_estimate(unit) * self._ratio.get(unit_kind(unit), 1.0)
+
+    def observe(self, unit: Any, seconds: float):
+        kind = unit_kind(unit)
+        r = seconds / max(1e-6, self.raw_estimate(unit))
+        with self._lock:
+            old = self._ratio.get(kind)
+            self._ratio[kind] = r if old is None else (1 - self.alpha) * old + self.alpha * r
+
+    def stats(self) -> Dict[str, float]:
+        """各题型“实测 / 估计”耗时比的滑动平均（> 1 表示实际比估计慢）；未观测的题型不出现。"""
+        with self._lock:
+            return {k: round(v, 3) for k, v in self._ratio.items()}
+
+
+class Scheduler:
+    """
+    policy: order（保持数据集顺序，仅按前缀聚合多轮对话）/ lpt（最长预计耗时优先）
+    priority_field / priority_values: 例如 ("category1", ["肺癌"])，命中的单元最先派发
+    on_priority_done(dataset_id, {model: [(unit, record)]}): 优先子集全部完成时调用一次
+    一个 Scheduler 跨数据集复用，CostModel 的校准随运行累积。
+    """
+
+    def __init__(self, policy: str = "order",
+                 priority_field: Optional[str] = None,
+                 priority_values: Sequence[str] = (),
+                 on_priority_done: Optional[Callable[[str, Dict[str, list]], None]] = None):
+        if policy not in SCHEDULE_POLICIES:
+            raise ValueError(f"未知的调度策略：{policy!r}，可选 {SCHEDULE_POLICIES}")
+        self.policy = policy
+        self.priority_field = priority_field
+        self.priority_values = set(priority_values)
+        self.on_priority_done = on_priority_done
+        self.cost = CostModel()
+
+    def is_priority(self, unit: Any) -> bool:
+        if not self.priority_field:
+            return False
+        return getattr(unit.item.metadata, self.priority_field, None) in self.priority_values
+
+    def order(self, units: Sequence[Any]) -> List[Any]:
+        """优先子集在前；组内按策略排序，多轮对话再按前缀聚合。"""
+        groups: Tuple[List[Any], List[Any]] = ([], [])
+        for u in units:
+            groups[0 if self.is_priority(u) else 1].append(u)
+        out: List[Any] = []
+        for g in groups:
+            out.extend(self._lpt_order(g) if self.policy == "lpt" else prefix_cache_order(g))
+        return out
+
+    def _lpt_order(self, units: Sequence[Any]) -> List[Any]:
+        """按前缀组的总预计耗时从长到短；非对话单元各自成组，组内按前缀排序。"""
+        blocks: Dict[Any, List[Any]] = {}
+        for i, u in enumerate(units):
+            key = ("dialogue", prefix_group_key(u.item)) if is_dialogue_item(u.item) else ("unit", i)
+            blocks.setdefault(key, []).append(u)
+        ordered = sorted(blocks.values(), key=lambda b: sum(map(self.cost.estimate, b)), reverse=True)
+        return [u for b in ordered for u in prefix_cache_order(b)]
+
+    def instrument(self, evaluate: Callable[[str, Any], Dict[str, Any]],
+                   tasks: Sequence[Tuple[str, Any]],
+                   dataset_id: str) -> Callable[[str, Any], Dict[str, Any]]:
+        """包装 evaluate：记录耗时校准 CostModel，并跟踪优先子集的完成情况。"""
+        pending = [sum(1 for _, u in tasks if self.is_priority(u))]
+        done: Dict[str, list] = {}
+        lock = threading.Lock()
+
+        def _evaluate(model: str, unit: Any) -> Dict[str, Any]:
+            t0 = time.monotonic()
+            rec = None
+            try:
+                rec = evaluate(model, unit)
+                if rec is not None:   # None：被预算控制跳过，没有实际耗时
+                    self.cost.observe(unit, time.monotonic() - t0)
+                return rec
+            finally:
+                if self.is_priority(unit):
+                    with lock:
+                        # 失败的单元也算“已处理”（之后走延迟重试），不阻塞优先结果
+                        if rec is not None:
+                            done.setdefault(model, []).append((unit, rec))
+                        pending[0] -= 1
+                        fire = pending[0] == 0
+                    if fire and self.on_priority_done is not None:
+                        self.on_priority_done(dataset_id, done)
+
+        return _evaluate
@@ -0,0 +1,150 @@
+# medeval/eval/shard.py
+# -*- coding: utf-8 -*-
+"""
+分布式分片评测
+
+- 分片：按 (dataset_id, question_id, variant) 做稳定哈希，把工作单元确定性地
+  划分到 N 个分片；任意节点、任意次运行得到的划分都相同。
+- 合并：把 N 个分片的结果合成与单机运行一致的 records / summary，
+  并校验分片覆盖了全部工作单元且没有重复。
+"""
+
+import hashlib
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from data.schema import DatasetMetadata
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """解析 "i/N"（i 从 0 开始）为 (i, N)。"""
+    try:
+        i_str, n_str = spec.split("/")
+        i, n = int(i_str), int(n_str)
+    except ValueError:
+        raise ValueError(f"非法的分片描述：{spec!r}，应为 i/N，例如 0/4")
+    if n <= 0 or not 0 <= i < n:
+        raise ValueError(f"非法的分片描述：{spec!r}，要求 0 <= i < N")
+    return i, n
+
+
+def _key_str(dataset_id: str, question_id: str, variant: Optional[str]) -> str:
+    return "\x1f".join([dataset_id, question_id, variant or "-"])
+
+
+def shard_of(dataset_id: str, question_id: str, variant: Optional[str],
+             num_shards: int) -> int:
+    """稳定哈希（不受 PYTHONHASHSEED 影响）决定工作单元所属分片。"""
+    h = hashlib.sha1(_key_str(dataset_id, question_id, variant).encode("utf-8"))
+    return int.from_bytes(h.digest()[:8], "big") % num_shards
+
+
+def units_fingerprint(units: Sequence[Any], dataset_id: str) -> str:
+    """全量工作单元列表的指纹，用于合并时确认各分片基于同一份数据和配置。"""
+    h = hashlib.sha1()
+    for u in units:
+        h.update(f"{u.index}\x1e{_key_str(*u.key(dataset_id))}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def select_shard(units: Sequence[Any], dataset_id: str,
+                 shard_index: int, num_shards: int,
+                 key_fn: Optional[Callable[[Any], Tuple[str, str, Optional[str]]]] = None
+                 ) -> List[Any]:
+    """key_fn 缺省为工作单元自身的 key；近重复合并时改用代表题的 key。"""
+    key_fn = key_fn or (lambda u: u.key(dataset_id))
+    return [u for u in units
+            if shard_of(*key_fn(u), num_shards) == shard_index]
+
+
+def build_shard_info(all_units: Sequence[Any],
+                     units: Sequence[Any],
+                     dataset_metadata: DatasetMetadata,
+                     test_model: str,
+                     choice_modes: List[str],
+                     shard_index: int,
+                     num_shards: int) -> Dict[str, Any]:
+    ds_id = dataset_metadata.dataset_id
+    return {
+        "index": shard_index,
+        "count": num_shards,
+        "test_model": test_model,
+        "choice_modes": choice_modes,
+        "dataset_metadata": dataset_metadata.model_dump(),
+        "total_units": len(all_units),
+        "fingerprint": units_fingerprint(all_units, ds_id),
+        # 与 records 一一对应：单机顺序号 + 工作单元 key
+        "units": [[u.index, *u.key(ds_id)] for u in units],
+    }
+
+
+def merge_shard_results(shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并同一 (dataset, model) 的全部分片结果。
+    校验：
+      - 分片数一致、每个分片恰好出现一次
+      - 全量工作单元指纹一致
+      - 工作单元无重复，且并集覆盖全部单元（预算跳过的单元见各分片的 "skipped" 段，也算已覆盖）
+    """
+    from .evaluator import summarize  # 避免循环导入
+
+    if not shard_results:
+        raise ValueError("没有可合并的分片结果")
+
+    infos = [r["shard"] for r in shard_results]
+    head = infos[0]
+    ds_id = head["dataset_metadata"]["dataset_id"]
+    n = head["count"]
+
+    for info in infos:
+        for k in ("count", "fingerprint", "total_units", "test_model", "choice_modes"):
+            if info[k] != head[k]:
+                raise ValueError(f"[{ds_id}] 分片 {info['index']} 的 {k} 与其它分片不一致")
+
+    seen_shards = sorted(info["index"] for info in infos)
+    if seen_shards != list(range(n)):
+        raise ValueError(f"[{ds_id}] 分片不完整或重复：期望 0..{n - 1}，实际 {seen_shards}")
+
+    by_index: Dict[int, Dict[str, Any]] = {}
+    failed_by_index: Dict[int, Dict[str, Any]] = {}
+    skipped_by_index: Dict[int, Dict[str, Any]] = {}
+    owner: Dict[int, int] = {}   # 工作单元 -> 所在分片；records / failed / skipped 三者之间也不能重复
+
+    def _claim(idx: int, shard_index: int):
+        if idx in owner:
+            raise ValueError(f"[{ds_id}] 工作单元重复：{idx}（分片 {owner[idx]} 与 {shard_index}）")
+        owner[idx] = shard_index
+
+    for res, info in zip(shard_results, infos):
+        if len(info["units"]) != len(res["records"]):
+            raise ValueError(f"[{ds_id}] 分片 {info['index']} 的 units 与 records 数量不一致")
+        for unit, rec in zip(info["units"], res["records"]):
+            _claim(unit[0], info["index"])
+            by_index[unit[0]] = rec
+        # 失败（进入 dead-letter）/ 预算跳过的单元也算已覆盖
+        for f in res.get("failed", []):
+            _claim(f["index"], info["index"])
+            failed_by_index[f["index"]] = f
+        for s in res.get("skipped", []):
+            _claim(s["index"], info["index"])
+            skipped_by_index[s["index"]] = s
+
+    total = head["total_units"]
+    covered = len(by_index) + len(failed_by_index) + len(skipped_by_index)
+    missing = [i for i in range(total)
+               if i not in by_index and i not in failed_by_index and i not in skipped_by_index]
+    if missing or covered != total:
+        raise ValueError(f"[{ds_id}] 分片未覆盖全部工作单元，缺失 {len(missing)} 个")
+
+    records = [by_index[i] for i in range(total) if i in by_index]
+    failed = [failed_by_index[i] for i in sorted(failed_by_index)]
+    dataset_metadata = DatasetMetadata(**head["dataset_metadata"])
+    res = {
+        "summary": summarize(dataset_metadata, records, head["choice_modes"],
+                             test_model=head["test_model"], num_failed=len(failed)),
+        "records": records,
+    }
+    if failed:
+        res["failed"] = failed
+    if skipped_by_index:
+        res["skipped"] = [skipped_by_index[i] for i in sorted(skipped_by_index)]
+    return res
@@ -0,0 +1,104 @@
+# medeval/eval/sweep.py
+# -*- coding: utf-8 -*-
+"""
+多模型 sweep：一次运行评测多个待测模型
+
+- 数据集只加载 / 展开 / 增强 / 渲染 prompt 一次，所有模型共享
+- 请求按 (工作单元, 模型) 交错派发，每个模型的限流由各自的 client 负责
+  （见 clients.RateLimitedClient）
+- 裁判建议包一层 judge.CachedJudge：不同模型逐字相同的答案只判一次
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+
+from data.schema import EvalDataset
+from clients.base import LLMClient
+from judge.base import Judge
+from judge.cached_judge import CachedJudge
+from eval.evaluator import (
+    normalize_choice_modes,
+    iter_work_units,
+    prepare_unit,
+    evaluate_prepared,
+    run_units,
+    shard_key_fn,
+    build_result,
+    attach_budget,
+)
+from eval.shard import select_shard
+from eval.retry import RetryPolicy
+from eval.dedup import DedupIndex
+from eval.schedule import Scheduler
+from eval.budget import BudgetGovernor
+from eval.progress import ProgressReporter
+
+
+def run_sweep(dataset: EvalDataset,
+              clients: Dict[str, LLMClient],
+              judge: Judge,
+              choice_modes: Optional[List[str]] = None,
+              shard: Optional[Tuple[int, int]] = None,
+              workers: int = 1,
+              retry: Optional[RetryPolicy] = None,
+              dedup: Optional[DedupIndex] = None,
+              collapse_duplicates: bool = False,
+              scheduler: Optional[Scheduler] = None,
+              choice_scoring: str = "generate",
+              governor: Optional[BudgetGovernor] = None,
+              progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """
+    clients: {test_model: 该模型使用的 client}
+    workers: 每个模型的并发 worker 数（总线程数 = workers × 模型数）
+    dedup / collapse_duplicates / scheduler / choice_scoring / governor / progress: 同 run_eval
+
+    返回：
+      {
+        "results": {test_model: 与 run_eval 相同结构的结果},
+        "summary": 合并后的 summary（各模型 summary + 裁判复用统计）,
+      }
+    """
+    choice_modes = normalize_choice_modes(choice_modes)
+    ds_id = dataset.dataset_metadata.dataset_id
+    models = list(clients)
+
+    all_units = units = iter_work_units(dataset, choice_modes)
+    if shard is not None:
+        units = select_shard(all_units, ds_id, *shard, key_fn=shard_key_fn(ds_id, dedup))
+
+    # 增强 + 渲染只做一次
+    prepared = {u.index: prepare_unit(u, choice_scoring) for u in units}
+
+    per_model = run_units(
+        units, models,
+        lambda m, u: evaluate_prepared(clients[m], judge, prepared[u.index], m),
+        ds_id,
+        workers=workers * len(models),
+        retry=retry,
+        dedup=dedup,
+        collapse=collapse_duplicates,
+        scheduler=scheduler,
+        governor=governor,
+        progress=progress,
+    )
+
+    results = {
+        m: build_result(dataset, units, *per_model[m], choice_modes, m,
+                        shard=shard, all_units=all_units)
+        for m in models
+    }
+    if governor is not None:
+        for m, res in results.items():
+            attach_budget(res, governor, units, ds_id, m)
+
+    summary: Dict[str, Any] = {
+        "dataset_id": ds_id,
+        "dataset_name": dataset.dataset_metadata.dataset_name,
+        "test_models": models,
+        "num_work_units": len(units),
+        "models": {m: results[m]["summary"] for m in models},
+    }
+    judge = getattr(judge, "primary", judge)   # BudgetedJudge 包在 CachedJudge 外层
+    if isinstance(judge, CachedJudge):
+        summary["judge_reuse"] = judge.stats()
+
+    return {"results": results, "summary": summary}
@@ -1,5 +1,7 @@
 from .base import Judge
 from .rule_judge import RuleJudge
 from .llm_judge import LLMJudge
+from .cached_judge import CachedJudge
+from .cascade_judge import CascadeJudge
 
-__all__ = ["Judge", "RuleJudge", "LLMJudge"]
+__all__ = ["Judge", "RuleJudge", "LLMJudge", "CachedJudge", "CascadeJudge"]
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from data.schema import ScoringPoint
 
 class Judge(ABC):
@@ -16,5 +16,13 @@ class Judge(ABC):
                             positive_points: List[ScoringPoint],
                             negative_points: List[ScoringPoint],
                             answer: str,
-                            total_score: int) -> Dict[str, Any]:
+                            total_score: int,
+                            synonyms: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
         ...
+
+    def fingerprint(self) -> str:
+        """
+        裁判身份标识，写入每条开放题 record 的 judge_hash。
+        换裁判模型 / prompt / 规则后应发生变化，rejudge 据此判断哪些记录需要重判。
+        """
+        return type(self).__name__
@@ -0,0 +1,92 @@
+import copy
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional
+from .base import Judge
+from data.schema import ScoringPoint
+
+
+def open_judge_key(question: str,
+                   positive_points: List[ScoringPoint],
+                   negative_points: List[ScoringPoint],
+                   answer: str,
+                   total_score: int,
+                   synonyms: Optional[Dict[str, list]] = None) -> str:
+    """题目 + rubric + 答案（逐字）+ 满分 的哈希，相同 key 的裁判结果可直接复用。"""
+    payload = json.dumps({
+        "q": question,
+        "pos": [[p.criterion, p.points] for p in positive_points],
+        "neg": [[n.criterion, n.points] for n in negative_points],
+        "a": answer,
+        "total": total_score,
+        "syn": synonyms or {},
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class CachedJudge(Judge):
+    """
+    裁判结果缓存：
+    - 多个待测模型对同一题给出逐字相同的答案时，只调用一次内层裁判
+    - 线程安全；同一 key 并发到达时后来者等待首个请求的结果，不会重复调用
+    - 内层裁判抛异常时不缓存，下次同 key 会重新尝试
+    """
+
+    def __init__(self, inner: Judge):
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def score_single_choice(self,
+                            gt_letters: List[str],
+                            pred_letters: List[str],
+                            total_score: int) -> Dict[str, Any]:
+        return self.inner.score_single_choice(gt_letters, pred_letters, total_score)
+
+    def score_open_response(self,
+                            question: str,
+                            positive_points: List[ScoringPoint],
+                            negative_points: List[ScoringPoint],
+                            answer: str,
+                            total_score: int,
+                            synonyms: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+        key = open_judge_key(question, positive_points, negative_points, answer,
+                             total_score, synonyms)
+        with self._lock:
+            fut = self._cache.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._cache[key] = fut
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                fut.set_result(self.inner.score_open_response(
+                    question=question,
+                    positive_points=positive_points,
+                    negative_points=negative_points,
+                    answer=answer,
+                    total_score=total_score,
+                    synonyms=synonyms,
+                ))
+            except BaseException as e:
+                with self._lock:
+                    self._cache.pop(key, None)
+                fut.set_exception(e)
+                raise
+
+        # 返回副本，避免不同 record 共享同一个可变对象
+        return copy.deepcopy(fut.result())
+
+    def fingerprint(self) -> str:
+        return self.inner.fingerprint()
+
+    def stats(self) -> Dict[str, int]:
+        return {"judge_calls": self.misses, "judge_cache_hits": self.hits}
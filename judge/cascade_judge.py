@@ -0,0 +1,152 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from .base import Judge
+from .rule_judge import RuleJudge
+from data.schema import ScoringPoint
+
+# 每个 scoring point 的置信规则：
+#   rule     : 规则结果（命中 / 未命中）都视为确定，不调 LLM
+#   hit_only : 规则命中视为确定；未命中（可能只是换了说法）交给 LLM
+#   llm      : 始终交给 LLM（例如否定语境容易误判的负向扣分点）
+RULE_POLICIES = ("rule", "hit_only", "llm")
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "default": {"positive": "hit_only", "negative": "llm"},
+    "tags": {},       # {tag: policy}，ScoringPoint.tags 中任一 tag 命中即生效
+    "criteria": {},   # {criterion 原文: policy}，优先级最高
+}
+
+
+class CascadeJudge(Judge):
+    """
+    级联裁判：
+    - 第 1 层：规则 / 同义词匹配（RuleJudge 同款），按置信规则确定一部分 flag
+    - 第 2 层：只把未确定的 scoring points 交给 LLM 裁判，一题最多一次调用
+    - 每个 flag 记录 decided_by = "rule" / "llm"；本地统一算分
+    """
+
+    def __init__(self, llm_judge: Judge, rules: Optional[Dict[str, Any]] = None):
+        self.llm_judge = llm_judge
+        self.rule_judge = RuleJudge(use_synonyms=True)
+        self.rules = {
+            "default": {**DEFAULT_RULES["default"], **(rules or {}).get("default", {})},
+            "tags": dict((rules or {}).get("tags", {})),
+            "criteria": dict((rules or {}).get("criteria", {})),
+        }
+        for policy in ([*self.rules["default"].values(), *self.rules["tags"].values(),
+                        *self.rules["criteria"].values()]):
+            if policy not in RULE_POLICIES:
+                raise ValueError(f"未知的级联裁判规则：{policy!r}，可选 {RULE_POLICIES}")
+
+        self._lock = threading.Lock()
+        self.items = 0
+        self.llm_calls = 0
+
+    def fingerprint(self) -> str:
+        rules = json.dumps(self.rules, ensure_ascii=False, sort_keys=True)
+        # 规则层匹配逻辑（RuleJudge 版本）变化同样会改变 flag，需计入指纹
+        return f"cascade:{hashlib.sha1(rules.encode('utf-8')).hexdigest()[:8]}:" \
+               f"{self.rule_judge.fingerprint()}:{self.llm_judge.fingerprint()}"
+
+    def _policy(self, sp: ScoringPoint, polarity: str) -> str:
+        if sp.criterion in self.rules["criteria"]:
+            return self.rules["criteria"][sp.criterion]
+        for tag in sp.tags:
+            if tag in self.rules["tags"]:
+                return self.rules["tags"][tag]
+        return self.rules["default"][polarity]
+
+    def _rule_tier(self, sp: ScoringPoint, polarity: str, ans: str,
+                   synonyms: Optional[Dict[str, list]]) -> Optional[bool]:
+        """返回确定的 flag；无法确定时返回 None。"""
+        if not ans:
+            return False  # 空答案：任何 scoring point 都不满足
+        policy = self._policy(sp, polarity)
+        if policy == "llm":
+            return None
+        hit = self.rule_judge.match(sp.criterion, ans, synonyms)
+        if hit or policy == "rule":
+            return hit
+        return None
+
+    def score_single_choice(self,
+                            gt_letters: List[str],
+                            pred_letters: List[str],
+                            total_score: int) -> Dict[str, Any]:
+        return self.rule_judge.score_single_choice(gt_letters, pred_letters, total_score)
+
+    def score_open_response(self,
+                            question: str,
+                            positive_points: List[ScoringPoint],
+                            negative_points: List[ScoringPoint],
+                            answer: str,
+                            total_score: int,
+                            synonyms: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+        ans = (answer or "").lower()
+        points: List[Tuple[ScoringPoint, str]] = (
+            [(p, "positive") for p in positive_points]
+            + [(n, "negative") for n in negative_points]
+        )
+        decided = [self._rule_tier(sp, pol, ans, synonyms) for sp, pol in points]
+
+        undecided_pos = [sp for (sp, pol), d in zip(points, decided)
+                         if d is None and pol == "positive"]
+        undecided_neg = [sp for (sp, pol), d in zip(points, decided)
+                         if d is None and pol == "negative"]
+
+        judge_raw = None
+        judge_parse = None
+        llm_flags: List[bool] = []
+        if undecided_pos or undecided_neg:
+            sc = self.llm_judge.score_open_response(
+                question=question,
+                positive_points=undecided_pos,
+                negative_points=undecided_neg,
+                answer=answer,
+                total_score=total_score,
+                synonyms=synonyms,
+            )
+            # LLMJudge 按 positive 再 negative 的顺序返回 flag
+            llm_flags = [bool(f["flag"]) for f in sc.get("scoring_points_flags", [])]
+            judge_raw = sc.get("judge_raw")
+            judge_parse = sc.get("judge_parse")
+
+        with self._lock:
+            self.items += 1
+            self.llm_calls += 1 if (undecided_pos or undecided_neg) else 0
+
+        scoring_points_flags = []
+        score = 0
+        llm_iter = iter(llm_flags)
+        for (sp, _), d in zip(points, decided):
+            if d is None:
+                flag, tier = next(llm_iter, False), "llm"
+            else:
+                flag, tier = d, "rule"
+            if flag:
+                score += sp.points
+            scoring_points_flags.append({
+                "criterion": sp.criterion,
+                "points": sp.points,
+                "flag": bool(flag),
+                "decided_by": tier,
+            })
+
+        # 裁剪
+        score = max(0, min(score, total_score))
+
+        out = {
+            "score": score,
+            "ok": score == total_score,
+            "scoring_points_flags": scoring_points_flags,
+            "judge_raw": judge_raw,
+        }
+        if judge_parse is not None:
+            out["judge_parse"] = judge_parse
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"items": self.items, "llm_calls": self.llm_calls,
+                "llm_calls_saved": self.items - self.llm_calls}
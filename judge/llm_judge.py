@@ -1,6 +1,7 @@
 # medeval/judge/llm_judge.py
+import hashlib
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from .base import Judge
 from data.schema import ScoringPoint
 from clients.base import LLMClient
@@ -11,32 +12,85 @@ You are a strict medical grading assistant for thoracic surgery exam questions.
 You will receive:
 1) The exam question
 2) The answer
-3) A grading rubric with:
-   - positive scoring points (criterion + positive points)
-   - negative scoring points (criterion + negative points)
+3) A grading rubric whose scoring points are labelled by id:
+   - P1, P2, ...: positive scoring points (criterion + positive points)
+   - N1, N2, ...: negative scoring points (criterion + negative points)
 
 Your task:
-- For EACH scoring point (both positive and negative), decide whether the answer satisfies that criterion (flag = true or false).
-- Output ONLY a JSON object with this exact structure:
-
-{
-  "positive": [
-    {"criterion": "...", "flag": true/false},
-    ...
-  ],
-  "negative": [
-    {"criterion": "...", "flag": true/false},
-    ...
-  ]
-}
+- For EACH scoring point id, decide whether the answer satisfies that criterion (true or false).
+- Output ONLY a JSON object mapping every id to a boolean, for example:
+
+{"P1": true, "P2": false, "N1": false}
 
 Rules:
 - Do NOT compute the final score. Only decide flags.
-- criterion strings in the output MUST exactly copy those from the rubric.
+- Use exactly the ids from the rubric, each id once.
 - No extra keys. No comments. No explanation outside this JSON.
 """.strip()
 
 
+def point_ids(positive_points: List[ScoringPoint],
+              negative_points: List[ScoringPoint]) -> List[str]:
+    """scoring point 的 id：positive 为 P1..Pn，negative 为 N1..Nm（与 rubric 中的顺序一致）。"""
+    return ([f"P{i + 1}" for i in range(len(positive_points))]
+            + [f"N{i + 1}" for i in range(len(negative_points))])
+
+
+def judge_response_format(ids: List[str]) -> Dict[str, Any]:
+    """OpenAI 风格 json_schema 结构化输出：每个 id 一个必填的 boolean。"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "judge_flags",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {i: {"type": "boolean"} for i in ids},
+                "required": list(ids),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def build_judge_messages(question: str,
+                         positive_points: List[ScoringPoint],
+                         negative_points: List[ScoringPoint],
+                         answer: str) -> List[Dict[str, str]]:
+    rubric_lines = ["Positive scoring points:"]
+    for i, p in enumerate(positive_points):
+        rubric_lines.append(f"- P{i + 1} (+{p.points}) {p.criterion}")
+    rubric_lines.append("\nNegative scoring points:")
+    for i, n in enumerate(negative_points):
+        rubric_lines.append(f"- N{i + 1} ({n.points}) {n.criterion}")
+    rubric_text = "\n".join(rubric_lines)
+
+    user_content = f"""Question:
+{question}
+
+Answer:
+{answer}
+
+Grading Rubric:
+{rubric_text}
+
+Remember: ONLY output a JSON object mapping each id to true / false.
+"""
+
+    return [
+        {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def build_reask_message(missing: List[str], reason: str) -> Dict[str, str]:
+    return {"role": "user", "content": (
+        f"Your previous output could not be used ({reason}). "
+        f"Output ONLY a JSON object with exactly these ids as keys and true / false values: "
+        f"{', '.join(missing)}."
+    )}
+
+
 class LLMJudge(Judge):
     """
     GPT-4o 裁判：
@@ -44,8 +98,15 @@ class LLMJudge(Judge):
     - client 内部已经配置了默认模型，无需在这里传 model 名
     """
 
-    def __init__(self, judge_client: LLMClient):
+    def __init__(self, judge_client: LLMClient, model: Optional[str] = None,
+                 max_reasks: int = 1):
         self.judge_client = judge_client
+        self.model = model  # 仅用于 fingerprint；请求仍走 client 默认模型
+        self.max_reasks = max_reasks
+
+    def fingerprint(self) -> str:
+        prompt = hashlib.sha1(JUDGE_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:8]
+        return f"llm:{self.model or 'default'}:{prompt}"
 
     def score_single_choice(self,
                             gt_letters: List[str],
@@ -64,97 +125,85 @@ class LLMJudge(Judge):
                             positive_points: List[ScoringPoint],
                             negative_points: List[ScoringPoint],
                             answer: str,
-                            total_score: int) -> Dict[str, Any]:
-        rubric_lines = ["Positive scoring points:"]
-        for p in positive_points:
-            rubric_lines.append(f"- (+{p.points}) {p.criterion}")
-        rubric_lines.append("\nNegative scoring points:")
-        for n in negative_points:
-            rubric_lines.append(f"- ({n.points}) {n.criterion}")
-        rubric_text = "\n".join(rubric_lines)
-
-        user_content = f"""Question:
-{question}
-
-Answer:
-{answer}
-
-Grading Rubric:
-{rubric_text}
-
-Remember: ONLY output JSON with positive[] and negative[].
-"""
-
-        messages = [
-            {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
-            {"role": "user", "content": user_content},
-        ]
-
-        raw = self.judge_client.chat(messages)  # 不再传 model，使用裁判 client 默认模型
-        flags = self._parse_flags(raw, positive_points, negative_points)
-        scoring_points_flags = flags["scoring_points_flags"]
+                            total_score: int,
+                            synonyms: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+        """
+        结构化输出 + 定向重问：
+        - 请求带 json_schema response_format（服务端不支持时 client 自动去掉）
+        - 输出按 id（P1 / N1 ...）取 flag，不再逐字回填 criterion 原文
+        - 解析失败或缺 id 时，只针对缺失的 id 追问，最多 max_reasks 次；仍缺失的记为 false
+        - 结果中的 judge_parse：ok / reask（重问后补齐）/ failed（兜底为 false）
+        """
+        ids = point_ids(positive_points, negative_points)
+        messages = build_judge_messages(question, positive_points, negative_points, answer)
+        # 不再传 model，使用裁判 client 默认模型
+        raw = self.judge_client.chat(messages, response_format=judge_response_format(ids))
+        flags, reason = self._parse_flags(raw, ids)
+        parse = "ok"
+
+        raws = [raw]
+        for _ in range(self.max_reasks):
+            missing = [i for i in ids if i not in flags]
+            if not missing:
+                break
+            parse = "reask"
+            messages = messages + [{"role": "assistant", "content": raws[-1]},
+                                   build_reask_message(missing, reason)]
+            raws.append(self.judge_client.chat(messages,
+                                               response_format=judge_response_format(missing)))
+            more, reason = self._parse_flags(raws[-1], missing)
+            flags.update(more)
+        if any(i not in flags for i in ids):
+            parse = "failed"
 
-        # 本地算分
+        scoring_points_flags = []
         score = 0
-        for sp in scoring_points_flags:
-            if sp["flag"]:
-                score += sp["points"]
+        for i, sp in zip(ids, list(positive_points) + list(negative_points)):
+            flag = flags.get(i, False)
+            if flag:
+                score += sp.points
+            scoring_points_flags.append({
+                "criterion": sp.criterion,
+                "points": sp.points,
+                "flag": flag,
+            })
+        # 本地算分
         score = max(0, min(score, total_score))
 
         return {
             "score": score,
             "ok": score == total_score,
             "scoring_points_flags": scoring_points_flags,
-            "judge_raw": raw,
+            "judge_raw": "\n\n[reask]\n".join(raws),
+            "judge_parse": parse,
         }
 
-    def _parse_flags(self,
-                     raw: str,
-                     positive_points: List[ScoringPoint],
-                     negative_points: List[ScoringPoint]) -> Dict[str, Any]:
+    @classmethod
+    def _parse_flags(cls, raw: str, ids: List[str]) -> Tuple[Dict[str, bool], str]:
+        """
+        返回 ({id: flag}, 失败原因)；只收录 ids 中、值可判定为布尔的条目。
+        """
         try:
-            j = self._safe_json_loads(raw)
-        except Exception:
-            # 全部 false 兜底
-            scoring_points_flags = []
-            for p in positive_points:
-                scoring_points_flags.append({
-                    "criterion": p.criterion,
-                    "points": p.points,
-                    "flag": False,
-                })
-            for n in negative_points:
-                scoring_points_flags.append({
-                    "criterion": n.criterion,
-                    "points": n.points,
-                    "flag": False,
-                })
-            return {"scoring_points_flags": scoring_points_flags}
-
-        pos_flags = {d.get("criterion", ""): bool(d.get("flag", False))
-                     for d in j.get("positive", []) or []}
-        neg_flags = {d.get("criterion", ""): bool(d.get("flag", False))
-                     for d in j.get("negative", []) or []}
-
-        scoring_points_flags = []
-        for p in positive_points:
-            scoring_points_flags.append({
-                "criterion": p.criterion,
-                "points": p.points,
-                "flag": bool(pos_flags.get(p.criterion, False)),
-            })
-        for n in negative_points:
-            scoring_points_flags.append({
-                "criterion": n.criterion,
-                "points": n.points,
-                "flag": bool(neg_flags.get(n.criterion, False)),
-            })
-
-        return {"scoring_points_flags": scoring_points_flags}
+            j = cls._safe_json_loads(raw)
+        except ValueError:
+            return {}, "invalid JSON"
+        if not isinstance(j, dict):
+            return {}, "not a JSON object"
+
+        by_id = {str(k).strip().upper(): v for k, v in j.items()}
+        flags: Dict[str, bool] = {}
+        for i in ids:
+            v = by_id.get(i)
+            if isinstance(v, bool):
+                flags[i] = v
+            elif isinstance(v, str) and v.strip().lower() in ("true", "false"):
+                flags[i] = v.strip().lower() == "true"
+        missing = [i for i in ids if i not in flags]
+        return flags, (f"missing ids: {', '.join(missing)}" if missing else "")
 
     @staticmethod
     def _safe_json_loads(text: str) -> Any:
-        text = text.strip()
+        text = (text or "").strip()
         start = text.find("{")
         end = text.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -1,14 +1,48 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base import Judge
 from data.schema import ScoringPoint
 
+def match_criterion(criterion: str, answer: str,
+                    synonyms: Optional[Dict[str, list]] = None) -> Optional[str]:
+    """
+    criterion 本身或其同义词（metadata.synonyms[criterion]）出现在答案中时，
+    返回命中的词；否则返回 None。answer 需已转小写。
+    """
+    terms = [criterion] + list((synonyms or {}).get(criterion, []) or [])
+    for t in terms:
+        t = str(t).strip().lower()
+        if t and t in answer:
+            return t
+    return None
+
+
 class RuleJudge(Judge):
     """
     规则裁判：
     - single_choice / multi_choice: 全对得分，否则 0
-    - open_response: 简单子串匹配 positive / negative，计算得分
+    - open_response: 简单子串匹配 positive / negative，计算得分；
+      use_synonyms=True 时同时匹配 metadata.synonyms 中的同义词（级联裁判的规则层使用）
     """
 
+    # 同义词匹配的规则版本：匹配规则改变时递增，旧版本 judge_hash 的 record 会被 rejudge
+    # 识别为需要重判。关闭同义词时保持原有的子串匹配与指纹，已有结果不受影响
+    VERSION = "v2-synonyms"
+
+    def __init__(self, use_synonyms: bool = False):
+        self.use_synonyms = use_synonyms
+
+    def fingerprint(self) -> str:
+        if self.use_synonyms:
+            return f"RuleJudge:{self.VERSION}"
+        return super().fingerprint()
+
+    def match(self, criterion: str, answer: str,
+              synonyms: Optional[Dict[str, list]] = None) -> bool:
+        """criterion 是否出现在答案中（answer 需已转小写）；仅 use_synonyms 时查同义词。"""
+        if not self.use_synonyms:
+            return criterion.lower() in answer
+        return match_criterion(criterion, answer, synonyms) is not None
+
     def score_single_choice(self,
                             gt_letters: List[str],
                             pred_letters: List[str],
@@ -26,14 +60,15 @@ class RuleJudge(Judge):
                             positive_points: List[ScoringPoint],
                             negative_points: List[ScoringPoint],
                             answer: str,
-                            total_score: int) -> Dict[str, Any]:
+                            total_score: int,
+                            synonyms: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
         ans = (answer or "").lower()
         scoring_points_flags = []
 
         score = 0
         # positive
         for p in positive_points:
-            hit = p.criterion.lower() in ans
+            hit = self.match(p.criterion, ans, synonyms)
             if hit:
                 score += p.points
             scoring_points_flags.append({
@@ -44,7 +79,7 @@ class RuleJudge(Judge):
 
         # negative
         for n in negative_points:
-            hit = n.criterion.lower() in ans
+            hit = self.match(n.criterion, ans, synonyms)
             if hit:
                 score += n.points  # 注意: points 是负数
             scoring_points_flags.append({
@@ -17,14 +17,203 @@ if __name__ == "__main__" and __package__ is None:
 
 # 下面就可以放心用包内相对导入了
 from config import load_eval_config
-from clients import OpenAIClient
-from data import load_dataset
-from judge import RuleJudge, LLMJudge
-from eval.evaluator import run_eval
-from utils import save_json, save_csv
+from clients import OpenAIClient, RateLimitedClient, HedgedClient, BatchingClient
+from data import load_dataset, compile_dataset
+from judge import RuleJudge, LLMJudge, CachedJudge, CascadeJudge
+from eval.evaluator import run_eval, rerun_failed, summarize, CHOICE_SCORING
+from eval.schedule import Scheduler, SCHEDULE_POLICIES
+from eval.progress import ProgressReporter
+from eval.budget import BudgetGovernor, BudgetLimits, BudgetedJudge, DEFAULT_POLICY, parse_policy
+from eval.retry import RetryPolicy
+from eval.dedup import DedupIndex, DedupConfig
+from eval.adaptive import AdaptiveConfig, run_eval_adaptive
+from data.loader import STRATA_FIELDS
+from eval.planner import PlanAssumptions, build_plan, format_plan
+from eval.sweep import run_sweep
+from eval.rejudge import rejudge_result
+from eval.shard import parse_shard, merge_shard_results
+from eval.leaderboard import build_leaderboard, format_leaderboard
+from utils.media import configure_image_cache
+from utils import save_json, save_csv, load_json, save_jsonl, load_jsonl
+
+
+def merge_main(argv):
+    """
+    python main.py merge --inputs results/shards/*.json --out_dir results
+    按 (dataset_id, test_model) 分组合并分片结果，输出与单机运行相同的 json/csv。
+    """
+    ap = argparse.ArgumentParser("Medical LLM Evaluation - merge shards")
+    ap.add_argument("--inputs", nargs="+", required=True,
+                    help="各节点 --shard 运行产出的分片 json")
+    ap.add_argument("--out_dir", default="results", help="合并结果输出目录")
+    args = ap.parse_args(argv)
+
+    groups = {}
+    for p in args.inputs:
+        res = load_json(p)
+        if "shard" not in res:
+            raise SystemExit(f"{p} 不是分片结果（缺少 shard 段）")
+        info = res["shard"]
+        key = (info["dataset_metadata"]["dataset_id"], info["test_model"])
+        groups.setdefault(key, []).append(res)
+
+    out_dir = Path(args.out_dir)
+    for (ds_id, model), shard_results in groups.items():
+        res = merge_shard_results(shard_results)
+
+        base = f"{ds_id}__{model}"
+        json_path = out_dir / f"{base}.json"
+        csv_path = out_dir / f"{base}.csv"
+        save_json(res, json_path)
+        save_csv(res["records"], csv_path)
+
+        print(f"[MERGED] Dataset: {ds_id} ({len(shard_results)} shards)")
+        print(f"       -> {json_path}")
+        print(f"       -> {csv_path}")
+        dl_path = out_dir / f"{base}.deadletter.jsonl"
+        if res.get("failed"):
+            # 与单机运行一致，供合并后 --retry_failed 重跑
+            save_jsonl(res["failed"], dl_path)
+            print(f"       -> {dl_path} ({len(res['failed'])} failed work units)")
+        elif dl_path.exists():
+            dl_path.unlink()
+
+
+def leaderboard_main(argv):
+    """
+    python main.py leaderboard --results_dir results
+    只读各结果文件的 summary 段，增量维护 model × dataset × variant 矩阵。
+    """
+    ap = argparse.ArgumentParser("Medical LLM Evaluation - leaderboard")
+    ap.add_argument("--results_dir", default="results", help="结果目录")
+    ap.add_argument("--out", default=None,
+                    help="排行榜输出前缀，默认 {results_dir}/leaderboard，生成 .json/.csv")
+    args = ap.parse_args(argv)
+
+    results_dir = Path(args.results_dir)
+    board = build_leaderboard(results_dir)
+    out = Path(args.out) if args.out else results_dir / "leaderboard"
+    save_json({"matrix": board["matrix"]}, out.with_suffix(".json"))
+    save_csv(board["rows"], out.with_suffix(".csv"))
+
+    print(format_leaderboard(board))
+    print(f"[LEADERBOARD] {board['num_files']} result files "
+          f"({board['num_read']} newly read) -> {out}.json / {out}.csv")
+
+
+def compile_main(argv):
+    """
+    python main.py compile --data a.json b.json
+    完整校验一次并写出 *.compiled.json，之后评测直接用它，加载时跳过逐字段校验。
+    """
+    ap = argparse.ArgumentParser("Medical LLM Evaluation - compile datasets")
+    ap.add_argument("--data", nargs="+", required=True, help="待编译的数据集 JSON")
+    ap.add_argument("--out_dir", default=None, help="输出目录，默认与源文件同目录")
+    args = ap.parse_args(argv)
+
+    for p in args.data:
+        src = Path(p)
+        dst = Path(args.out_dir) / f"{src.stem}.compiled.json" if args.out_dir else None
+        print(f"[COMPILED] {src} -> {compile_dataset(src, dst)}")
+
+
+def build_openai_client(mcfg):
+    """ModelConfig -> OpenAIClient（api_base 含多个副本时自动负载均衡）。"""
+    return OpenAIClient(
+        api_base=mcfg.api_bases,
+        api_key=mcfg.api_key,
+        default_model=mcfg.model,
+        temperature=mcfg.temperature,
+        timeout=mcfg.timeout,
+        eject_failures=mcfg.eject_failures,
+        eject_seconds=mcfg.eject_seconds,
+        chat_template=mcfg.batch_chat_template,
+    )
+
+
+def build_judge(args, cfg, judge_http=None):
+    """
+    按 --use_llm_judge / --cascade_judge 构造裁判，返回 (judge, judge_client)。
+    judge_http 为外部构造的裁判 OpenAIClient（需要读取其用量时传入）。
+    """
+    judge_http = judge_http or build_openai_client(cfg.judge)
+    judge_client = with_tail_latency_control(judge_http, cfg.judge)
+
+    if args.use_llm_judge or args.cascade_judge:
+        judge_client = RateLimitedClient(judge_client, cfg.judge.requests_per_minute,
+                                         cfg.judge.total_concurrency)
+        judge = LLMJudge(judge_client, model=cfg.judge.model)   # GPT-4o 按 scoring points 给 flag
+        if args.cascade_judge:
+            rules = load_json(args.cascade_rules) if args.cascade_rules else None
+            judge = CascadeJudge(judge, rules)
+    else:
+        judge = RuleJudge()              # 简单规则裁判（子串匹配）
+    return judge, judge_client
+
+
+def rejudge_main(argv):
+    """
+    python main.py rejudge --results_dir results --data a.json [--use_llm_judge]
+    rubric 修订 / 更换裁判后，用已有结果中的答案离线重判开放题，不调用待测模型。
+    只重判 rubric 或裁判哈希变化的 record，覆盖写回 json / csv。
+    """
+    ap = argparse.ArgumentParser("Medical LLM Evaluation - rejudge")
+    ap.add_argument("--results_dir", default="results", help="结果目录")
+    ap.add_argument("--data", nargs="+", required=True,
+                    help="当前版本的数据集 JSON（提供 rubric）")
+    ap.add_argument("--use_llm_judge", action="store_true", help="使用裁判模型重判")
+    ap.add_argument("--cascade_judge", action="store_true", help="使用级联裁判重判")
+    ap.add_argument("--cascade_rules", default=None, help="级联裁判置信规则 JSON")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="裁判模型并发数，默认取 JUDGE_MAX_CONCURRENCY × 副本数")
+    ap.add_argument("--processes", type=int, default=None,
+                    help="规则裁判进程数，默认 CPU 核数")
+    ap.add_argument("--retry_rounds", type=int, default=2, help="裁判调用失败的延迟重试轮数")
+    ap.add_argument("--force", action="store_true", help="忽略哈希，全部开放题重判")
+    args = ap.parse_args(argv)
+
+    cfg = load_eval_config()
+    judge, _ = build_judge(args, cfg)
+    retry = RetryPolicy(max_rounds=args.retry_rounds)
+    datasets = {ds.dataset_metadata.dataset_id: ds
+                for ds in (load_dataset(p) for p in args.data)}
+
+    for path in sorted(Path(args.results_dir).glob("*__*.json")):
+        if path.name.startswith(".") or ".partial" in path.name or ".summary" in path.name:
+            continue
+        res = load_json(path)
+        if "records" not in res or "summary" not in res:
+            continue
+        ds = datasets.get(res["summary"].get("dataset_id"))
+        if ds is None:
+            print(f"[SKIP] {path.name}: 数据集 {res['summary'].get('dataset_id')} 不在 --data 中")
+            continue
+
+        st = rejudge_result(res, ds, judge,
+                            workers=args.workers or cfg.judge.total_concurrency,
+                            processes=args.processes, retry=retry, force=args.force)
+        if not st["rescored"] and not st["failed"]:
+            print(f"[UNCHANGED] {path.name}")
+            continue
+        save_json(res, path)
+        if "shard" not in res:
+            save_csv(res["records"], path.with_suffix(".csv"))
+        print(f"[REJUDGED] {path.name}: {st['rescored']}/{st['open_records']} open records"
+              f" rescored, {st['failed']} failed, {st['missing_in_dataset']} not in dataset")
+
+
+COMMANDS = {
+    "merge": merge_main,
+    "leaderboard": leaderboard_main,
+    "compile": compile_main,
+    "rejudge": rejudge_main,
+}
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
     os.environ['http_proxy'] = 'http://127.0.0.1:8001'
     os.environ['https_proxy'] = 'http://127.0.0.1:8001'
 
@@ -49,6 +238,17 @@ def main():
         action="store_true",
         help="open_response 是否使用裁判模型 (gpt-4o)；否则用规则裁判"
     )
+    ap.add_argument(
+        "--cascade_judge",
+        action="store_true",
+        help="open_response 使用级联裁判：先规则/同义词匹配，只把未确定的 scoring points 交给裁判模型"
+    )
+    ap.add_argument(
+        "--cascade_rules",
+        default=None,
+        help="级联裁判置信规则 JSON：{default: {positive, negative}, tags: {}, criteria: {}}，"
+             "取值 rule / hit_only / llm"
+    )
     ap.add_argument(
         "--choice_modes",
         nargs="+",
@@ -56,6 +256,172 @@ def main():
         choices=["base", "shuffle", "nota", "all"],
         help="选择题评测模式：base / shuffle / nota / all"
     )
+    ap.add_argument(
+        "--choice_scoring",
+        default="generate",
+        choices=list(CHOICE_SCORING),
+        help="选择题打分：generate 生成 <A,B> 后解析 / logprob 单选题只请求 1 个 token，"
+             "按选项字母的 top_logprobs 作答并输出 ECE / Brier（需服务端支持 logprobs）"
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="每个待测模型的并发 worker 数；默认单模型为 1（顺序评测），"
+             "多模型 sweep 时取 TEST_MAX_CONCURRENCY × 副本数 × TEST_BATCH_SIZE"
+    )
+    ap.add_argument(
+        "--retry_rounds",
+        type=int,
+        default=2,
+        help="失败工作单元在本轮结束后的延迟重试轮数（0 不重试）"
+    )
+    ap.add_argument(
+        "--retry_workers",
+        type=int,
+        default=2,
+        help="延迟重试阶段的并发数"
+    )
+    ap.add_argument(
+        "--retry_backoff",
+        type=float,
+        default=5.0,
+        help="延迟重试退避基数（秒），第 k 轮前等待 backoff * 2^(k-1)"
+    )
+    ap.add_argument(
+        "--retry_failed", "--retry-failed",
+        action="store_true",
+        help="只重跑 {ds_id}__{model}.deadletter.jsonl 中的工作单元，并合并回原结果"
+    )
+    ap.add_argument(
+        "--resume_skipped",
+        action="store_true",
+        help="与 --retry_failed 同用：同时续跑原结果 \"skipped\" 段中因预算被跳过的单元"
+    )
+    ap.add_argument(
+        "--max_examples",
+        type=int,
+        default=None,
+        help="每个数据集最多抽取的题数（配合 --stratify 为分层抽样）"
+    )
+    ap.add_argument(
+        "--stratify",
+        nargs="+",
+        default=None,
+        choices=list(STRATA_FIELDS),
+        help="分层字段，用于 --max_examples 抽样和 --adaptive"
+    )
+    ap.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="分层自适应评测：按批随机抽题，直到每层准确率置信区间宽度 <= --ci_width"
+    )
+    ap.add_argument(
+        "--ci_width",
+        type=float,
+        default=0.1,
+        help="自适应评测的目标置信区间宽度（95%% Wilson 区间上界 - 下界）"
+    )
+    ap.add_argument(
+        "--adaptive_batch",
+        type=int,
+        default=10,
+        help="自适应评测每轮每层抽取的题数"
+    )
+    ap.add_argument(
+        "--dedup",
+        default="off",
+        choices=["off", "flag", "collapse"],
+        help="跨数据集近重复题检测：off / flag（只标注簇）/ collapse（每簇只评测一次并复用结果）"
+    )
+    ap.add_argument(
+        "--dedup_threshold",
+        type=float,
+        default=0.8,
+        help="近重复判定的字符 3-gram Jaccard 阈值"
+    )
+    ap.add_argument(
+        "--media_root",
+        default=None,
+        help="multimodal_data 中相对图片路径的根目录，默认当前目录"
+    )
+    ap.add_argument(
+        "--image_cache_mb",
+        type=int,
+        default=256,
+        help="编码后图片载荷的 LRU 缓存上限（MB），跨 variant / 模型共享"
+    )
+    ap.add_argument(
+        "--image_max_side",
+        type=int,
+        default=None,
+        help="图片最长边超过该值时缩放（需要 Pillow）"
+    )
+    ap.add_argument(
+        "--image_quality",
+        type=int,
+        default=None,
+        help="图片重新压缩为 JPEG 的质量 1-95（需要 Pillow）"
+    )
+    ap.add_argument(
+        "--plan",
+        action="store_true",
+        help="只做 dry-run 规划：展开并渲染全部 prompt，估算调用数 / token / 成本 / 耗时，不发请求"
+    )
+    ap.add_argument(
+        "--plan_prices",
+        default=None,
+        help="模型价格 JSON（USD / 1M tokens）：{model: {prompt: x, completion: y}}"
+    )
+    ap.add_argument(
+        "--plan_open_tokens",
+        type=int,
+        default=256,
+        help="规划时假设的开放题回答 token 数"
+    )
+    ap.add_argument(
+        "--shard",
+        default=None,
+        help="分布式分片 i/N（i 从 0 开始）：只评测哈希落在第 i 片的工作单元，"
+             "之后用 `main.py merge` 合并"
+    )
+    ap.add_argument(
+        "--schedule",
+        default="order",
+        choices=list(SCHEDULE_POLICIES),
+        help="派发顺序：order 按数据集顺序（默认）/ lpt 按预计耗时从长到短（缩短长尾；开场相同的多轮对话整组相邻派发）"
+    )
+    ap.add_argument(
+        "--budget_seconds",
+        type=float,
+        default=None,
+        help="整次运行的墙钟时间预算（秒）；token / 调用数预算见 {TEST,JUDGE}_BUDGET_TOKENS / _BUDGET_CALLS"
+    )
+    ap.add_argument(
+        "--degrade",
+        nargs="*",
+        default=[f"{n}@{at}" for n, at in DEFAULT_POLICY],
+        help="预算降级策略，步骤@已用比例：drop_variants（只测 base）/ rule_judge（开放题改用规则裁判）/ "
+             "subsample（剩余题目抽样）；传空则不降级，只在预算耗尽时停止"
+    )
+    ap.add_argument(
+        "--subsample_rate",
+        type=float,
+        default=0.5,
+        help="subsample 降级后剩余题目的保留比例"
+    )
+    ap.add_argument(
+        "--progress_interval",
+        type=float,
+        default=30.0,
+        help="运行中每隔多少秒打印进度行并原子刷新 {ds_id}__{model}.partial.json（0 关闭）"
+    )
+    ap.add_argument(
+        "--priority",
+        default=None,
+        help="优先子集，例如 category1=肺癌,食管癌：先派发，完成后立即写出 "
+             "{ds_id}__{model}.priority.partial.json"
+    )
 
     args = ap.parse_args()
 
@@ -63,59 +429,312 @@ def main():
     if "all" in choice_modes:
         choice_modes = ["base", "shuffle", "nota"]
 
-    cfg = load_eval_config()
+    shard = parse_shard(args.shard) if args.shard else None
+    if args.adaptive and (shard is not None or args.retry_failed):
+        raise SystemExit("--adaptive 不支持与 --shard / --retry_failed 同时使用")
+    if args.resume_skipped and not args.retry_failed:
+        raise SystemExit("--resume_skipped 需与 --retry_failed 同时使用")
+    if shard is not None and args.retry_failed:
+        raise SystemExit("--retry_failed 不支持与 --shard 同时使用，请在合并后的结果上重跑")
+    retry = RetryPolicy(max_rounds=args.retry_rounds, workers=args.retry_workers,
+                        backoff=args.retry_backoff)
 
-    # 1️⃣ 待测模型 
-    test_client = OpenAIClient(
-        api_base=cfg.test.api_base,
-        api_key=cfg.test.api_key,
-        default_model=cfg.test.model,
-        temperature=cfg.test.temperature,
-        timeout=cfg.test.timeout,
-    )
-
-    # 2️⃣ 裁判模型 client（比如 gpt-4o）
-    judge_client = OpenAIClient(
-        api_base=cfg.judge.api_base,
-        api_key=cfg.judge.api_key,
-        default_model=cfg.judge.model,
-        temperature=cfg.judge.temperature,
-        timeout=cfg.judge.timeout,
-    )
-
-    # 3️⃣ 选择裁判实现
-    if args.use_llm_judge:
-        judge = LLMJudge(judge_client)   # GPT-4o 按 scoring points 给 flag
+    cfg = load_eval_config()
+    # 单模型默认与原来一致逐条顺序评测；sweep 时按并发上限放大 worker 数，
+    # 选择题微批时同时等待的调用数决定批大小，再乘以 batch_size
+    if args.workers:
+        workers = args.workers
+    elif len(cfg.test_models) > 1:
+        workers = cfg.test.total_concurrency * max(1, cfg.test.batch_size)
     else:
-        judge = RuleJudge()              # 简单规则裁判（子串匹配）
+        workers = 1
 
     out_dir = Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # 4️⃣ 多个数据集：逐个评测、分别输出结果文件
-    for data_path in args.data:
-        ds = load_dataset(data_path)
-        res = run_eval(
-            ds,
-            test_client,
-            judge,
-            test_model=cfg.test.model,
-            choice_modes=choice_modes, 
+    # 近重复检测按 media_root 解析图片路径，图片缓存须先于 DedupIndex 配置
+    image_cache = configure_image_cache(
+        max_bytes=args.image_cache_mb * 1024 * 1024,
+        max_side=args.image_max_side,
+        jpeg_quality=args.image_quality,
+        media_root=args.media_root,
+    )
+
+    # 4️⃣ 多个数据集：抽样 / 近重复检测与正式运行共用，--plan 估算的就是实际要跑的单元
+    datasets = [load_dataset(p, max_examples=args.max_examples, stratify_by=args.stratify)
+                for p in args.data]
+    dedup = None
+    if args.dedup != "off":
+        # 跨全部 --data 做近重复检测；必须在评测前完成
+        dedup = DedupIndex(datasets, DedupConfig(threshold=args.dedup_threshold))
+        rep = dedup.report()
+        dedup_path = out_dir / "dedup_clusters.json"
+        save_json(rep, dedup_path)
+        print(f"[DEDUP] {rep['num_clusters']} clusters / {rep['num_duplicate_items']} items "
+              f"-> {dedup_path}")
+    collapse = args.dedup == "collapse"
+
+    if args.plan:
+        judge_mode = "cascade" if args.cascade_judge else ("llm" if args.use_llm_judge else "rule")
+        plan = build_plan(
+            datasets,
+            test_models=cfg.test_models,
+            judge_model=cfg.judge.model,
+            choice_modes=choice_modes,
+            judge_mode=judge_mode,
+            workers=workers,
+            prices=load_json(args.plan_prices) if args.plan_prices else None,
+            assumptions=PlanAssumptions(open_completion_tokens=args.plan_open_tokens),
+            test_rpm=cfg.test.requests_per_minute,
+            judge_rpm=cfg.judge.requests_per_minute,
+            choice_scoring=args.choice_scoring,
+            shard=shard,
+            dedup=dedup,
+            collapse_duplicates=collapse,
         )
+        print(format_plan(plan))
+        plan_path = out_dir / "plan.json"
+        save_json(plan, plan_path)
+        print(f"       -> {plan_path}")
+        return
+
+    # 1️⃣ 待测模型 
+    test_http = build_openai_client(cfg.test)
+    judge_http = build_openai_client(cfg.judge)
+    test_client = with_tail_latency_control(test_http, cfg.test, callers=len(cfg.test_models))
+
+    # 2️⃣ 裁判模型 client（比如 gpt-4o） + 3️⃣ 选择裁判实现
+    judge, judge_client = build_judge(args, cfg, judge_http)
+
 
+    # 多模型共享同一个 HTTP client，但各自独立限流
+    test_clients = {
+        m: RateLimitedClient(test_client, cfg.test.requests_per_minute,
+                             cfg.test.total_concurrency)
+        for m in cfg.test_models
+    }
+    if cfg.test.batch_size > 1:
+        test_clients = {
+            m: BatchingClient(c, max_batch=cfg.test.batch_size, max_wait=cfg.test.batch_wait,
+                              max_tokens=cfg.test.batch_max_tokens,
+                              prompt_format=test_http.batch_prompt_format)
+            for m, c in test_clients.items()
+        }
+    sweep = len(cfg.test_models) > 1
+    if sweep:
+        judge = CachedJudge(judge)  # 逐字相同的答案只判一次
+    governor = build_governor(args, cfg, test_http, judge_http)
+    if governor is not None and not isinstance(judge, RuleJudge):
+        judge = BudgetedJudge(judge, governor)
+
+    scheduler = build_scheduler(args)
+
+    # 逐个数据集评测、分别输出结果文件
+    for ds in datasets:
         ds_id = ds.dataset_metadata.dataset_id
         ds_name = ds.dataset_metadata.dataset_name
+        scheduler.on_priority_done = priority_writer(ds, out_dir, choice_modes)
 
-        base = f"{ds_id}__{cfg.test.model}"
-        json_path = out_dir / f"{base}.json"
-        csv_path = out_dir / f"{base}.csv"
+        if args.retry_failed:
+            for model in cfg.test_models:
+                base = out_dir / f"{ds_id}__{model}"
+                dl_path = base.with_name(base.name + ".deadletter.jsonl")
+                res_path = base.with_name(base.name + ".json")
+                old_res = load_json(res_path) if res_path.exists() else None
+                has_skipped = args.resume_skipped and old_res is not None and old_res.get("skipped")
+                if not dl_path.exists() and not has_skipped:
+                    print(f"[SKIP] {ds_id} / {model}: 没有 dead-letter 文件")
+                    continue
+                if old_res is None:
+                    # dead-letter 需与原结果合并；原结果缺失时无法重建完整结果
+                    print(f"[SKIP] {ds_id} / {model}: 有 dead-letter 但缺少原结果文件 {res_path}，"
+                          f"无法合并，请先恢复该文件或重新完整评测")
+                    continue
+                res = rerun_failed(
+                    ds,
+                    test_clients[model],
+                    judge,
+                    test_model=model,
+                    old_res=old_res,
+                    dead_letters=load_jsonl(dl_path) if dl_path.exists() else [],
+                    choice_modes=choice_modes,
+                    workers=workers,
+                    retry=retry,
+                    choice_scoring=args.choice_scoring,
+                    governor=governor,
+                    resume_skipped=args.resume_skipped,
+                )
+                write_result(res, out_dir, ds_id, ds_name, model, shard)
+            continue
 
-        save_json(res, json_path)
-        save_csv(res["records"], csv_path)
+        if args.adaptive:
+            acfg = AdaptiveConfig(
+                strata=tuple(args.stratify or ("category1", "type")),
+                target_width=args.ci_width,
+                batch_size=args.adaptive_batch,
+            )
+            for model in cfg.test_models:
+                res = run_eval_adaptive(ds, test_clients[model], judge, model,
+                                        choice_modes=choice_modes, cfg=acfg,
+                                        workers=workers, retry=retry,
+                                        choice_scoring=args.choice_scoring,
+                                        governor=governor)
+                ad = res["summary"]["adaptive"]
+                print(f"[ADAPTIVE] {ds_id} / {model}: {ad['work_units_evaluated']}"
+                      f"/{ad['work_units_total']} units in {ad['rounds']} rounds")
+                write_result(res, out_dir, ds_id, ds_name, model, shard)
+            continue
+
+        progress = None
+        if args.progress_interval > 0:
+            progress = ProgressReporter(
+                ds_id, out_dir, interval=args.progress_interval,
+                name_suffix=f".shard{shard[0]}of{shard[1]}" if shard is not None else "",
+            )
+
+        if not sweep:
+            res = run_eval(
+                ds,
+                test_clients[cfg.test.model],
+                judge,
+                test_model=cfg.test.model,
+                choice_modes=choice_modes,
+                shard=shard,
+                workers=workers,
+                retry=retry,
+                dedup=dedup,
+                collapse_duplicates=collapse,
+                scheduler=scheduler,
+                choice_scoring=args.choice_scoring,
+                governor=governor,
+                progress=progress,
+            )
+            write_result(res, out_dir, ds_id, ds_name, cfg.test.model, shard)
+            continue
+
+        sw = run_sweep(ds, test_clients, judge, choice_modes=choice_modes,
+                       shard=shard, workers=workers, retry=retry,
+                       dedup=dedup, collapse_duplicates=collapse, scheduler=scheduler,
+                       choice_scoring=args.choice_scoring, governor=governor,
+                       progress=progress)
+        for model, res in sw["results"].items():
+            write_result(res, out_dir, ds_id, ds_name, model, shard)
+        if shard is None:
+            sweep_path = out_dir / f"{ds_id}__sweep.summary.json"
+            save_json(sw["summary"], sweep_path)
+            print(f"[SWEEP] {len(cfg.test_models)} models -> {sweep_path}")
 
-        print(f"[DONE] Dataset: {ds_id} ({ds_name})")
+    if governor is not None:
+        rep = governor.report()
+        print(f"[BUDGET] spent {rep['spent']} in {rep['elapsed_seconds']}s; "
+              f"degraded: {list(rep['degradations']) or 'none'}"
+              + ("; stopped early" if "exhausted" in rep else ""))
+    if image_cache.misses:
+        print(f"[IMAGES] {image_cache.stats()}")
+    for name, c in (("test", test_client), ("judge", judge_client)):
+        if isinstance(c, HedgedClient) and c.requests:
+            print(f"[CLIENT] {name}: {c.stats()}")
+    for m, c in test_clients.items():
+        if isinstance(c, BatchingClient) and c.batches:
+            print(f"[BATCH] {m}: {c.stats()}")
+    if scheduler.cost.stats():
+        print(f"[SCHEDULE] 各题型实测 / 估计耗时比: {scheduler.cost.stats()}")
+    if len(test_http.pool) > 1:
+        for st in test_http.endpoint_stats():
+            print(f"[ENDPOINT] {st}")
+
+
+def with_tail_latency_control(client, mcfg, callers: int = 1):
+    """
+    按配置给 client 套上自适应超时 / 对冲请求；都没开启时原样返回。
+    callers：共享该 client、各自限流到 total_concurrency 的调用方个数（sweep 时为模型数）。
+    """
+    if not (mcfg.adaptive_timeout or mcfg.hedge):
+        return client
+    return HedgedClient(
+        client,
+        max_timeout=mcfg.timeout,
+        # 未开启自适应超时时，超时固定为配置值
+        min_timeout=min(10, mcfg.timeout) if mcfg.adaptive_timeout else mcfg.timeout,
+        hedge=mcfg.hedge,
+        hedge_budget=mcfg.hedge_budget,
+        # 每个在途请求最多再带一个对冲请求
+        max_workers=max(4, 2 * callers * mcfg.total_concurrency),
+    )
+
+
+def build_governor(args, cfg, test_http, judge_http):
+    """配置了任一预算时返回 BudgetGovernor，否则 None。"""
+    limits = {
+        "test": BudgetLimits(cfg.test.budget_tokens, cfg.test.budget_calls),
+        "judge": BudgetLimits(cfg.judge.budget_tokens, cfg.judge.budget_calls),
+    }
+    if not args.budget_seconds and not any(any(lim) for lim in limits.values()):
+        return None
+    try:
+        policy = parse_policy(args.degrade)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return BudgetGovernor(limits, {"test": test_http.usage, "judge": judge_http.usage},
+                          seconds=args.budget_seconds, policy=policy,
+                          subsample_rate=args.subsample_rate)
+
+
+def build_scheduler(args):
+    field, values = None, []
+    if args.priority:
+        if "=" not in args.priority:
+            raise SystemExit("--priority 格式应为 字段=值1,值2，例如 category1=肺癌")
+        field, vals = args.priority.split("=", 1)
+        field, values = field.strip(), [v.strip() for v in vals.split(",") if v.strip()]
+        if field not in STRATA_FIELDS:
+            raise SystemExit(f"--priority 字段只能是 {', '.join(STRATA_FIELDS)}")
+    return Scheduler(args.schedule, priority_field=field, priority_values=values)
+
+
+def priority_writer(ds, out_dir: Path, choice_modes):
+    """优先子集全部完成时立即写出其 summary + records，不等整个数据集跑完。"""
+    def _write(ds_id, done):
+        for model, pairs in done.items():
+            pairs = sorted(pairs, key=lambda p: p[0].index)
+            records = [rec for _, rec in pairs]
+            path = out_dir / f"{ds_id}__{model}.priority.partial.json"
+            save_json({"summary": summarize(ds.dataset_metadata, records, choice_modes,
+                                            test_model=model),
+                       "records": records}, path)
+            print(f"[PRIORITY] {ds_id} / {model}: {len(records)} priority units done -> {path}")
+    return _write
+
+
+def write_result(res, out_dir: Path, ds_id: str, ds_name: str, model: str, shard):
+    base = f"{ds_id}__{model}"
+    dl_name = f"{base}.deadletter.jsonl"
+    if shard is not None:
+        dl_name = f"{base}.shard{shard[0]}of{shard[1]}.deadletter.jsonl"
+    dl_path = out_dir / dl_name
+    if res.get("failed"):
+        save_jsonl(res["failed"], dl_path)
+        print(f"[FAILED] {len(res['failed'])} work units -> {dl_path}")
+    elif dl_path.exists():
+        dl_path.unlink()  # 重跑后全部成功，清掉旧的 dead-letter
+
+    if shard is not None:
+        # 分片结果只输出 json，csv / summary 由 merge 统一生成
+        json_path = out_dir / f"{base}.shard{shard[0]}of{shard[1]}.json"
+        save_json(res, json_path)
+        print(f"[DONE] Dataset: {ds_id} ({ds_name}) shard {shard[0]}/{shard[1]}")
         print(f"       -> {json_path}")
-        print(f"       -> {csv_path}")
+        return
+
+    json_path = out_dir / f"{base}.json"
+    csv_path = out_dir / f"{base}.csv"
+
+    save_json(res, json_path)
+    save_csv(res["records"], csv_path)
+
+    print(f"[DONE] Dataset: {ds_id} ({ds_name})")
+    print(f"       -> {json_path}")
+    print(f"       -> {csv_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+# medeval/tests/conftest.py
+# -*- coding: utf-8 -*-
+"""
+测试公共部件：把仓库根目录加入 sys.path（与 main.py 一样按顶层包导入），
+构造小数据集，以及不发请求的确定性 client。
+"""
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from clients.base import LLMClient  # noqa: E402
+from data import load_dataset  # noqa: E402
+
+
+def choice_item(i: int, answer: str = "B", typ: str = "single_choice",
+                category1: str = "心", **meta) -> Dict[str, Any]:
+    return {
+        "question_id": f"q{i}",
+        "question": f"问题{i}：下列哪项正确？",
+        "answer": answer,
+        "options": [f"选项{k}-{i}" for k in range(4)],
+        "metadata": {"category1": category1, "type": typ, "score": 1, **meta},
+    }
+
+
+def open_item(i: int, category1: str = "肺") -> Dict[str, Any]:
+    return {
+        "question_id": f"o{i}",
+        "question": f"开放题{i}：如何处理？",
+        "answer": "手术",
+        "metadata": {
+            "category1": category1, "type": "open_response", "score": 3,
+            "positive_scoring_points": [{"criterion": "肺癌", "points": 2},
+                                        {"criterion": "手术", "points": 1}],
+            "negative_scoring_points": [{"criterion": "化疗", "points": -1}],
+        },
+    }
+
+
+def dialogue_item(i: int, opening: str = "医生，我胸痛", category1: str = "肺") -> Dict[str, Any]:
+    """两轮用户发言（中间带参考回复）+ 最后一轮 question 的多轮问诊题。"""
+    return {
+        "question_id": f"d{i}",
+        "question": f"对话{i}：下一步应该做什么检查？",
+        "answer": "CT",
+        "metadata": {
+            "category1": category1, "type": "open_response", "score": 2,
+            "dialogue": [{"role": "user", "content": opening, "criteria": "咳嗽|肺癌"},
+                         {"role": "assistant", "content": "请问有没有发热？"},
+                         {"role": "user", "content": f"没有发热，吸烟{i}年"}],
+            "positive_scoring_points": [{"criterion": "肺癌", "points": 1},
+                                        {"criterion": "手术", "points": 1}],
+        },
+    }
+
+
+@pytest.fixture
+def make_dataset(tmp_path):
+    """make_dataset(items, dataset_id="ds") -> EvalDataset（经 load_dataset 加载）。"""
+    def _make(items: List[Dict[str, Any]], dataset_id: str = "ds", **load_kw):
+        path = tmp_path / f"{dataset_id}.json"
+        path.write_text(json.dumps({
+            "dataset_metadata": {"dataset_id": dataset_id, "dataset_name": dataset_id},
+            "dataset": items,
+        }, ensure_ascii=False), encoding="utf-8")
+        return load_dataset(path, **load_kw)
+    return _make
+
+
+@pytest.fixture
+def small_dataset(make_dataset):
+    """8 道单选 + 4 道开放题。"""
+    return make_dataset([choice_item(i, answer="ABCD"[i % 4]) for i in range(8)]
+                        + [open_item(i) for i in range(4)])
+
+
+class FakeClient(LLMClient):
+    """
+    按 prompt 内容哈希确定性作答：开放题回答 "<肺癌需要手术>" / "<化疗>"，选择题回答某个字母。
+    fail_on 中的子串出现在最后一条消息里时抛 RuntimeError（模拟请求失败）。
+    """
+
+    def __init__(self, fail_on: Optional[List[str]] = None):
+        self.calls = 0
+        self.fail_on = list(fail_on or [])
+
+    def chat(self, messages, model=None, temperature=None, timeout=None, response_format=None):
+        self.calls += 1
+        content = messages[-1]["content"]
+        if any(s in content for s in self.fail_on):
+            raise RuntimeError("boom")
+        h = int(hashlib.md5(content.encode("utf-8")).hexdigest(), 16)
+        if "开放题" in content:
+            return "<肺癌需要手术>" if h % 2 else "<化疗>"
+        return "<%s>" % "ABCD"[h % 4]
+
+
+class ScriptedClient(LLMClient):
+    """按顺序返回预设回答，并记录每次调用的 messages / response_format。"""
+
+    def __init__(self, outputs: List[str]):
+        self.outputs = list(outputs)
+        self.requests: List[Dict[str, Any]] = []
+
+    def chat(self, messages, model=None, temperature=None, timeout=None, response_format=None):
+        self.requests.append({"messages": messages, "response_format": response_format})
+        return self.outputs.pop(0)
@@ -0,0 +1,60 @@
+# medeval/tests/test_adaptive.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import FakeClient, choice_item
+from eval.adaptive import AdaptiveConfig, run_eval_adaptive, wilson_interval
+from judge import RuleJudge
+
+
+class AlwaysRight(RuleJudge):
+    def score_single_choice(self, gt_letters, pred_letters, total_score):
+        return {"score": total_score, "ok": True}
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    lo, hi = wilson_interval(5, 10)
+    assert lo == pytest.approx(0.2366, abs=1e-4) and hi == pytest.approx(0.7634, abs=1e-4)
+    lo, hi = wilson_interval(10, 10)
+    assert hi == 1.0 and lo == pytest.approx(10 / (10 + 1.959964 ** 2), abs=1e-4)
+    # 小数得分（每题 variant 的平均之和）按同一公式计算，区间随 n 收窄
+    lo, hi = wilson_interval(2.5, 10)
+    assert lo < 0.25 < hi
+    assert hi - lo > wilson_interval(25, 100)[1] - wilson_interval(25, 100)[0]
+
+
+def test_stops_when_ci_is_narrow_enough(make_dataset):
+    ds = make_dataset([choice_item(i) for i in range(60)])
+    cfg = AdaptiveConfig(strata=("category1",), target_width=0.2, batch_size=4, min_items=4)
+    res = run_eval_adaptive(ds, FakeClient(), AlwaysRight(), "m",
+                            choice_modes=["base", "shuffle", "nota"], cfg=cfg)
+    ad = res["summary"]["adaptive"]
+    (st,) = ad["strata"]
+    # 全对时宽度 = z^2 / (n + z^2)，n 为题数：16 道题时首次 <= 0.2。
+    # 若把 3 个相关的 variant 当作独立样本，6 道题（18 条 record）就会“收敛”
+    assert st["converged"]
+    assert st["items"] == st["scored_items"] == 16
+    assert st["records"] == 48
+    assert ad["rounds"] == 4
+    assert st["ci_high"] - st["ci_low"] <= 0.2
+    assert ad["work_units_evaluated"] == 48 and ad["work_units_total"] == 180
+
+
+def test_item_score_is_mean_over_variants(make_dataset):
+    ds = make_dataset([choice_item(i, answer="B") for i in range(8)])
+
+    class PicksB(FakeClient):
+        def chat(self, messages, **kw):
+            self.calls += 1
+            return "<B>"
+
+    cfg = AdaptiveConfig(strata=("category1",), target_width=0.01, batch_size=8, min_items=1)
+    res = run_eval_adaptive(ds, PicksB(), RuleJudge(), "m", choice_modes=["base", "nota"], cfg=cfg)
+    (st,) = res["summary"]["adaptive"]["strata"]
+    acc = {v: sum(r["ok"] for r in res["records"] if r["variant"] == v) / 8 for v in ("base", "nota")}
+    assert acc["base"] == 1.0
+    assert st["scored_items"] == 8
+    assert st["accuracy"] == pytest.approx((acc["base"] + acc["nota"]) / 2)
+    assert (st["ci_low"], st["ci_high"]) == pytest.approx(
+        wilson_interval(st["accuracy"] * 8, 8, cfg.confidence))
@@ -0,0 +1,115 @@
+# medeval/tests/test_batching.py
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from conftest import FakeClient
+from clients.base import track_batched_calls
+from clients.batching import BatchingClient
+from eval.evaluator import run_eval
+from judge import RuleJudge
+
+MODES = ["base", "shuffle"]
+
+
+class BatchRecorder(FakeClient):
+    """chat_batch 逐条按 FakeClient 作答，并记录每批大小与单发的 chat 次数。"""
+
+    def __init__(self, fail_batches: bool = False):
+        super().__init__()
+        self.batch_sizes = []
+        self.single = 0
+        self.fail_batches = fail_batches
+
+    def chat(self, messages, **kw):
+        if not isinstance(messages[-1]["content"], str):
+            self.calls += 1
+            return "<A>"
+        return super().chat(messages, **kw)
+
+    def chat_batch(self, batch, model=None, temperature=None, timeout=None, max_tokens=None):
+        self.batch_sizes.append(len(batch))
+        if self.fail_batches:
+            raise RuntimeError("batch failed")
+        return [super(BatchRecorder, self).chat(m) for m in batch]
+
+
+def _msg(i):
+    return [{"role": "user", "content": f"问题{i}：下列哪项正确？"}]
+
+
+def _concurrently(fn, n):
+    outs, errors = [None] * n, [None] * n
+
+    def _run(i):
+        try:
+            with track_batched_calls() as batched:
+                outs[i] = (fn(i), list(batched))
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=_run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outs, errors
+
+
+def test_concurrent_calls_merge_into_one_batch():
+    inner = BatchRecorder()
+    client = BatchingClient(inner, max_batch=4, max_wait=5, prompt_format="role_prefixed")
+    outs, errors = _concurrently(lambda i: client.chat(_msg(i)), 4)
+    assert not any(errors)
+    assert inner.batch_sizes == [4]
+    assert [o[0] for o in outs] == [FakeClient().chat(_msg(i)) for i in range(4)]
+    assert all(o[1] == ["role_prefixed"] for o in outs)
+    assert client.stats() == {"batches": 1, "prompts": 4, "avg_batch_size": 4.0}
+
+
+def test_partial_batch_is_sent_after_max_wait():
+    inner = BatchRecorder()
+    client = BatchingClient(inner, max_batch=16, max_wait=0.01)
+    assert client.chat(_msg(0)) == FakeClient().chat(_msg(0))
+    assert inner.batch_sizes == [1]
+
+
+def test_images_and_response_format_fall_back_to_single_chat():
+    inner = BatchRecorder()
+    client = BatchingClient(inner, max_batch=2, max_wait=5)
+    image = [{"role": "user", "content": [{"type": "text", "text": "看图"},
+                                          {"type": "image_url", "image_url": {"url": "data:,"}}]}]
+    with track_batched_calls() as batched:
+        assert client.chat(image) == "<A>"
+        client.chat(_msg(0), response_format={"type": "json_object"})
+    assert inner.batch_sizes == [] and inner.calls == 2 and batched == []
+
+
+def test_batch_failure_reaches_every_caller():
+    client = BatchingClient(BatchRecorder(fail_batches=True), max_batch=3, max_wait=5)
+    outs, errors = _concurrently(lambda i: client.chat(_msg(i)), 3)
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_run_eval_tags_batched_choice_records(small_dataset):
+    plain = run_eval(small_dataset, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    inner = BatchRecorder()
+    client = BatchingClient(inner, max_batch=4, max_wait=0.02, prompt_format="role_prefixed")
+    res = run_eval(small_dataset, client, RuleJudge(), "m", choice_modes=MODES, workers=4)
+
+    assert sum(inner.batch_sizes) == 16 and max(inner.batch_sizes) > 1
+    for rec, ref in zip(res["records"], plain["records"]):
+        is_choice = rec["type"] == "single_choice"
+        assert rec.pop("batched", False) is is_choice
+        assert rec.pop("prompt_format", None) == ("role_prefixed" if is_choice else None)
+        assert rec == ref
+    assert res["summary"]["batching"] == {"batched_records": 16,
+                                          "prompt_formats": {"role_prefixed": 16}}
+
+
+@pytest.mark.parametrize("n", [1, 3])
+def test_chat_batch_passes_through(n):
+    inner = BatchRecorder()
+    out = BatchingClient(inner).chat_batch([_msg(i) for i in range(n)])
+    assert len(out) == n and inner.batch_sizes == [n]
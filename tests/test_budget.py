@@ -0,0 +1,115 @@
+# medeval/tests/test_budget.py
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import FakeClient, ScriptedClient
+from clients.usage import UsageMeter
+from data.schema import ScoringPoint
+from eval.budget import BudgetGovernor, BudgetLimits, BudgetedJudge, parse_policy
+from eval.evaluator import run_eval, iter_work_units
+from judge import LLMJudge, RuleJudge
+
+POLICY = [("drop_variants", 0.5), ("rule_judge", 0.7), ("subsample", 0.9)]
+
+
+def _spend(meter: UsageMeter, calls: int):
+    for _ in range(calls):
+        meter.add({"prompt_tokens": 1, "completion_tokens": 1})
+
+
+def _unit(qid: str, variant):
+    return SimpleNamespace(item=SimpleNamespace(question_id=qid), variant=variant)
+
+
+def test_parse_policy():
+    assert parse_policy(["subsample@0.95", "drop_variants"]) == [("drop_variants", 0.7),
+                                                                 ("subsample", 0.95)]
+    with pytest.raises(ValueError):
+        parse_policy(["shrink@0.5"])
+    with pytest.raises(ValueError):
+        parse_policy(["rule_judge@1.5"])
+
+
+def test_degradations_activate_in_order_and_stay_on():
+    meter = UsageMeter()
+    gov = BudgetGovernor({"test": BudgetLimits(calls=10)}, {"test": meter}, policy=POLICY)
+    _spend(meter, 4)
+    gov.check()
+    assert not gov.active
+    _spend(meter, 1)
+    gov.check()
+    assert list(gov.active) == ["drop_variants"]
+    _spend(meter, 2)
+    gov.check()
+    assert list(gov.active) == ["drop_variants", "rule_judge"]
+    assert gov.exhausted is None
+    _spend(meter, 3)
+    gov.check()
+    assert list(gov.active) == ["drop_variants", "rule_judge", "subsample"]
+    assert gov.exhausted is not None and gov.exhausted["trigger"] == "test.calls"
+
+
+def test_skip_reasons():
+    meter = UsageMeter()
+    gov = BudgetGovernor({"test": BudgetLimits(calls=10)}, {"test": meter}, policy=POLICY,
+                         subsample_rate=0.5)
+    _spend(meter, 5)
+    assert gov.skip_reason("ds", _unit("q1", "shuffle")) == "drop_variants"
+    assert gov.skip_reason("ds", _unit("q1", "nota")) == "drop_variants"
+    assert gov.skip_reason("ds", _unit("q1", "base")) is None
+    _spend(meter, 4)
+    # subsample 按 question_id 稳定哈希，约一半保留，同一道题的结论稳定
+    reasons = [gov.skip_reason("ds", _unit(f"q{i}", "base")) for i in range(200)]
+    assert 50 < reasons.count("subsample") < 150
+    assert reasons == [gov.skip_reason("ds", _unit(f"q{i}", "base")) for i in range(200)]
+    _spend(meter, 1)
+    assert gov.skip_reason("ds", _unit("q1", "base")) == "budget_exhausted"
+
+
+def test_judge_budget_only_forces_rule_judge():
+    test_meter, judge_meter = UsageMeter(), UsageMeter()
+    gov = BudgetGovernor({"test": BudgetLimits(calls=100), "judge": BudgetLimits(calls=2)},
+                         {"test": test_meter, "judge": judge_meter}, policy=[])
+    _spend(judge_meter, 2)
+    gov.check()
+    assert gov.is_active("rule_judge")
+    assert gov.exhausted is None
+
+
+def test_budgeted_judge_falls_back_to_rule_judge():
+    meter = UsageMeter()
+    gov = BudgetGovernor({"test": BudgetLimits(calls=10)}, {"test": meter},
+                         policy=[("rule_judge", 0.5)])
+    llm = LLMJudge(ScriptedClient(['{"P1": false}']), model="j")
+    judge = BudgetedJudge(llm, gov)
+    pos = [ScoringPoint(criterion="肺癌", points=1)]
+
+    assert judge.score_open_response("q", pos, [], "肺癌", 1)["score"] == 0
+    assert judge.fingerprint() == llm.fingerprint()
+    _spend(meter, 5)
+    assert judge.score_open_response("q", pos, [], "肺癌", 1)["score"] == 1
+    assert judge.fingerprint() == RuleJudge().fingerprint()
+
+
+def test_run_eval_reports_skipped_units(small_dataset):
+    meter = UsageMeter()
+    gov = BudgetGovernor({"test": BudgetLimits(calls=10)}, {"test": meter},
+                         policy=[("drop_variants", 0.3)])
+
+    class Metered(FakeClient):
+        def chat(self, messages, **kw):
+            _spend(meter, 1)
+            return super().chat(messages, **kw)
+
+    modes = ["base", "shuffle"]
+    res = run_eval(small_dataset, Metered(), RuleJudge(), "m", choice_modes=modes, governor=gov)
+    total = len(iter_work_units(small_dataset, modes))
+    assert len(res["records"]) + len(res["skipped"]) == total
+    counts = res["summary"]["budget"]["skipped_units"]
+    assert counts == {r: sum(1 for s in res["skipped"] if s["reason"] == r)
+                      for r in {s["reason"] for s in res["skipped"]}}
+    assert counts["drop_variants"] > 0
+    assert all(s["variant"] == "shuffle" for s in res["skipped"] if s["reason"] == "drop_variants")
+    assert "drop_variants" in res["summary"]["budget"]["degradations"]
@@ -0,0 +1,62 @@
+# medeval/tests/test_calibration.py
+# -*- coding: utf-8 -*-
+import math
+
+import pytest
+
+from conftest import FakeClient, choice_item
+from eval.evaluator import calibration_summary, option_probs, run_eval
+from judge import RuleJudge
+
+
+class LogprobClient(FakeClient):
+    """logprob 打分：总是 B 占 0.9、A 占 0.1。"""
+
+    def __init__(self):
+        super().__init__()
+        self.logprob_calls = 0
+
+    def option_logprobs(self, messages, letters, model=None, timeout=None):
+        self.logprob_calls += 1
+        return {"B": math.log(0.9), "A": math.log(0.1), "not-a-letter": 0.0}
+
+
+def test_option_probs_normalizes_over_options():
+    probs = option_probs({"A": math.log(0.3), "C": math.log(0.1), "Z": 0.0}, "ABCD")
+    assert probs == pytest.approx({"A": 0.75, "B": 0.0, "C": 0.25, "D": 0.0})
+    assert option_probs({"Z": 0.0}, "ABCD") == {}
+
+
+def test_ece_and_brier_by_hand():
+    recs = [
+        {"scoring": "logprob", "variant": "base", "ok": True, "confidence": 0.8,
+         "gt_letters": ["A"], "option_probs": {"A": 0.8, "B": 0.2}},
+        {"scoring": "logprob", "variant": "base", "ok": False, "confidence": 0.7,
+         "gt_letters": ["B"], "option_probs": {"A": 0.7, "B": 0.3}},
+        {"scoring": "generate", "variant": "base", "ok": True},   # 非 logprob record 不参与
+    ]
+    cal = calibration_summary(recs)
+    assert cal["num_records"] == 2
+    # 两条落在不同的箱：(|1 - 0.8| + |0 - 0.7|) / 2
+    assert cal["ece"] == pytest.approx(0.45)
+    # ((0.8-1)^2 + 0.2^2 + 0.7^2 + (0.3-1)^2) / 2
+    assert cal["brier"] == pytest.approx(0.53)
+    assert calibration_summary(recs[2:]) is None
+
+
+def test_logprob_run_reports_calibration(make_dataset):
+    ds = make_dataset([choice_item(i, answer="AB"[i % 2]) for i in range(10)]
+                      + [choice_item(10, typ="multiple_choice", answer="A,B")])
+    client = LogprobClient()
+    res = run_eval(ds, client, RuleJudge(), "m", choice_modes=["base"], choice_scoring="logprob")
+
+    assert client.logprob_calls == 10          # 多选题仍按生成作答
+    single = [r for r in res["records"] if r["type"] == "single_choice"]
+    assert all(r["scoring"] == "logprob" and r["confidence"] == pytest.approx(0.9) for r in single)
+    assert [r["pred_letters"] for r in single] == [["B"]] * 10
+
+    cal = res["summary"]["calibration"]
+    assert cal["accuracy"] == pytest.approx(0.5)
+    assert cal["ece"] == pytest.approx(0.4)
+    # 答对：0.1^2 + 0.1^2；答错：0.9^2 + 0.9^2
+    assert cal["brier"] == pytest.approx((0.02 + 1.62) / 2)
@@ -0,0 +1,81 @@
+# medeval/tests/test_cascade_judge.py
+# -*- coding: utf-8 -*-
+from typing import List
+
+import pytest
+
+from data.schema import ScoringPoint
+from judge import CascadeJudge, RuleJudge
+from judge.base import Judge
+
+SYN = {"肺癌": ["肺部恶性肿瘤"]}
+POS = [ScoringPoint(criterion="肺癌", points=2), ScoringPoint(criterion="手术", points=1)]
+NEG = [ScoringPoint(criterion="化疗", points=-1)]
+
+
+class FakeLLMJudge(Judge):
+    """记录每次收到的 scoring points，按 positive 再 negative 的顺序返回预设 flag。"""
+
+    def __init__(self, flag: bool = True):
+        self.flag = flag
+        self.calls: List[List[str]] = []
+
+    def fingerprint(self) -> str:
+        return "fake-llm"
+
+    def score_single_choice(self, gt_letters, pred_letters, total_score):
+        raise AssertionError("不应调用")
+
+    def score_open_response(self, question, positive_points, negative_points, answer,
+                            total_score, synonyms=None):
+        self.calls.append([p.criterion for p in [*positive_points, *negative_points]])
+        return {"scoring_points_flags": [{"flag": self.flag}
+                                         for _ in [*positive_points, *negative_points]]}
+
+
+def _score(judge, answer):
+    return judge.score_open_response("q", POS, NEG, answer, 3, synonyms=SYN)
+
+
+def test_rule_judge_ignores_synonyms_by_default():
+    plain = RuleJudge()
+    assert plain.fingerprint() == "RuleJudge"
+    assert _score(plain, "肺部恶性肿瘤，需要手术")["score"] == 1
+
+    syn = RuleJudge(use_synonyms=True)
+    assert syn.fingerprint() != plain.fingerprint()
+    assert _score(syn, "肺部恶性肿瘤，需要手术")["score"] == 3
+
+
+def test_rule_tier_decides_hits_and_defers_the_rest():
+    llm = FakeLLMJudge(flag=False)
+    judge = CascadeJudge(llm)
+    sc = _score(judge, "肺部恶性肿瘤")   # 同义词命中；“手术”未命中；负向点默认交给 LLM
+    assert llm.calls == [["手术", "化疗"]]
+    by = {f["criterion"]: (f["flag"], f["decided_by"]) for f in sc["scoring_points_flags"]}
+    assert by == {"肺癌": (True, "rule"), "手术": (False, "llm"), "化疗": (False, "llm")}
+    assert sc["score"] == 2
+
+
+def test_rule_policy_skips_llm():
+    llm = FakeLLMJudge()
+    judge = CascadeJudge(llm, {"default": {"positive": "rule", "negative": "rule"}})
+    sc = _score(judge, "肺癌，化疗")
+    assert llm.calls == []
+    assert sc["score"] == 1
+    assert all(f["decided_by"] == "rule" for f in sc["scoring_points_flags"])
+
+
+def test_fingerprint_covers_rules_and_rule_judge(monkeypatch):
+    llm = FakeLLMJudge()
+    base = CascadeJudge(llm).fingerprint()
+    assert base == CascadeJudge(FakeLLMJudge()).fingerprint()
+    assert CascadeJudge(llm, {"criteria": {"化疗": "rule"}}).fingerprint() != base
+
+    monkeypatch.setattr(RuleJudge, "VERSION", "v3-test")
+    assert CascadeJudge(llm).fingerprint() != base
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="未知的级联裁判规则"):
+        CascadeJudge(FakeLLMJudge(), {"default": {"positive": "maybe"}})
@@ -0,0 +1,97 @@
+# medeval/tests/test_dedup.py
+# -*- coding: utf-8 -*-
+from conftest import FakeClient, choice_item, open_item
+from eval.dedup import DedupIndex
+from eval.evaluator import run_eval
+from judge import RuleJudge
+
+
+def _variant_of(item, question_id, **changes):
+    out = {**item, "question_id": question_id, **changes}
+    out["metadata"] = dict(item["metadata"])
+    return out
+
+
+def _datasets(make_dataset):
+    q = choice_item(0, answer="B")
+    a = make_dataset([q, choice_item(1, answer="C"), open_item(0)], dataset_id="a")
+    b = make_dataset([
+        _variant_of(q, "dup", question=q["question"] + "。"),    # 近重复、答案一致：共享结果
+        _variant_of(q, "other_answer", answer="D"),              # 近重复、答案不同：单独评测
+        {**open_item(0), "question_id": "open_dup"},
+    ], dataset_id="b")
+    return a, b
+
+
+def test_clusters_and_eval_groups(make_dataset):
+    a, b = _datasets(make_dataset)
+    idx = DedupIndex([a, b])
+    assert idx.canonical_key("b", "dup") == ("a", "q0")
+    assert idx.canonical_key("b", "other_answer") == ("b", "other_answer")
+    assert idx.cluster_of[("b", "other_answer")] == idx.cluster_of[("a", "q0")]
+    assert idx.is_member("b", "dup") and not idx.is_member("a", "q0")
+    assert idx.is_representative("a", "q0")
+    assert not idx.is_representative("a", "q1")   # 不在任何簇中
+    assert a.dataset_metadata.duplicate and b.dataset_metadata.duplicate
+
+
+def test_collapse_reuses_representative_records(make_dataset):
+    a, b = _datasets(make_dataset)
+    idx = DedupIndex([a, b])
+    modes = ["base", "shuffle"]
+    ra = run_eval(a, FakeClient(), RuleJudge(), "m", choice_modes=modes,
+                  dedup=idx, collapse_duplicates=True)
+    client = FakeClient()
+    rb = run_eval(b, client, RuleJudge(), "m", choice_modes=modes,
+                  dedup=idx, collapse_duplicates=True)
+
+    # b 中只有 other_answer（两个 variant）真正发了请求
+    assert client.calls == 2
+    by_key = {(r["question_id"], r.get("variant")): r for r in rb["records"]}
+    src = {(r["question_id"], r.get("variant")): r for r in ra["records"]}
+    for v in modes:
+        rec = by_key[("dup", v)]
+        assert rec["dedup_of"] == "a/q0"
+        assert rec["ok"] == src[("q0", v)]["ok"]
+        assert rec["question"] == b.dataset[0].question
+    assert by_key[("open_dup", None)]["dedup_of"] == "a/o0"
+    assert "dedup_of" not in by_key[("other_answer", "base")]
+    assert rb["summary"]["dedup"]["propagated_records"] == 3
+
+
+def test_collapse_only_stores_representatives(make_dataset):
+    a, b = _datasets(make_dataset)
+    idx = DedupIndex([a, b])
+    run_eval(a, FakeClient(), RuleJudge(), "m", choice_modes=["base"], dedup=idx,
+             collapse_duplicates=True)
+    stored = {(ds, qid) for _, ds, qid, _ in idx._results}
+    assert stored == {("a", "q0"), ("a", "o0")}
+
+
+def test_same_text_different_image_is_not_a_duplicate(make_dataset, tmp_path):
+    (tmp_path / "x.png").write_bytes(b"image-x")
+    (tmp_path / "y.png").write_bytes(b"image-y")
+    q = choice_item(0)
+    items = [_variant_of(q, f"m{i}", multimodal_data=[{"type": "image", "path": str(tmp_path / p)}])
+             for i, p in enumerate(["x.png", "x.png", "y.png"])]
+    idx = DedupIndex([make_dataset(items, dataset_id="mm")])
+    assert [[m["question_id"] for m in c["members"]] for c in idx.clusters] == [["m0", "m1"]]
+
+
+def test_relative_image_paths_resolve_against_media_root(make_dataset, tmp_path, monkeypatch):
+    from utils import media
+
+    root = tmp_path / "media"
+    (root / "a").mkdir(parents=True)
+    (root / "b").mkdir()
+    (root / "a" / "x.png").write_bytes(b"same-bytes")
+    (root / "b" / "copy.png").write_bytes(b"same-bytes")
+    monkeypatch.setattr(media, "_default_cache", media.ImageCache(media_root=root))
+    monkeypatch.chdir(tmp_path)   # cwd 下没有这些文件：只能按 media_root 找到
+
+    q = choice_item(0)
+    items = [_variant_of(q, "m0", multimodal_data=[{"type": "image", "path": "a/x.png"}]),
+             _variant_of(q, "m1", multimodal_data=[{"type": "image", "path": "b/copy.png"}])]
+    idx = DedupIndex([make_dataset(items, dataset_id="mm")])
+    # 路径不同、内容相同：按内容哈希视为同一张图
+    assert [[m["question_id"] for m in c["members"]] for c in idx.clusters] == [["m0", "m1"]]
@@ -0,0 +1,55 @@
+# medeval/tests/test_dialogue.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import ScriptedClient, choice_item, dialogue_item
+from eval.dialogue import prefix_cache_order
+from eval.evaluator import iter_work_units, run_eval
+from eval.retry import RetryPolicy
+from judge import RuleJudge
+
+
+def test_turns_replay_as_strict_prefix_extensions(make_dataset):
+    ds = make_dataset([dialogue_item(0)])
+    client = ScriptedClient(["<咳嗽>", "<建议做检查>", "<肺癌，建议手术>"])
+    res = run_eval(ds, client, RuleJudge(), "m", choice_modes=["base"])
+
+    msgs = [r["messages"] for r in client.requests]
+    assert [len(m) for m in msgs] == [2, 4, 6]
+    for prev, cur in zip(msgs, msgs[1:]):
+        assert cur[:len(prev)] == prev
+    assert msgs[0][0]["role"] == "system"
+    assert msgs[1][2] == {"role": "assistant", "content": "请问有没有发热？"}   # 参考回复
+    assert msgs[2][4] == {"role": "assistant", "content": "<建议做检查>"}     # 无参考时用模型回答
+
+    (rec,) = res["records"]
+    assert [t.get("score_obtained") for t in rec["turns"]] == [1, None, 2]
+    assert rec["score_obtained"] == 2 and rec["ok"]
+    assert rec["dialogue"] == {"num_turns": 3, "scored_turns": 2, "turn_score": 3, "turn_full": 4,
+                               "turn_ok_rate": 0.5, "all_turns_ok": False}
+    summ = res["summary"]["dialogue"]
+    assert summ["accuracy_by_turn"] == {"0": 0.0, "2": 1.0}
+    assert summ["all_turns_ok_rate"] == 0.0
+
+
+def test_prefix_cache_order_groups_same_openings(make_dataset):
+    ds = make_dataset([dialogue_item(0, "我咳嗽"), choice_item(0), dialogue_item(1, "我胸痛"),
+                       dialogue_item(2, "我咳嗽"), choice_item(1)])
+    units = iter_work_units(ds, ["base"])
+    ordered = prefix_cache_order(units)
+    # 对话只在原对话位置（0 / 2 / 3）间重排，开场相同的 d0 / d2 相邻
+    assert [u.item.question_id for u in ordered] == ["d0", "q0", "d2", "d1", "q1"]
+
+
+@pytest.mark.parametrize("dialogue, message", [
+    ([{"role": "assistant", "content": "您好"}], "缺少 user 轮次"),
+    ([{"role": "nurse", "content": "您好"}], "未知的 dialogue role"),
+])
+def test_malformed_dialogue_is_reported(make_dataset, dialogue, message):
+    item = dialogue_item(0)
+    item["metadata"]["dialogue"] = dialogue
+    client = ScriptedClient([])
+    res = run_eval(make_dataset([item]), client, RuleJudge(), "m", choice_modes=["base"],
+                   retry=RetryPolicy(max_rounds=0))
+    assert not res["records"] and not client.requests
+    assert message in res["failed"][0]["error"]
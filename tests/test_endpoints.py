@@ -0,0 +1,112 @@
+# medeval/tests/test_endpoints.py
+# -*- coding: utf-8 -*-
+import types
+
+import pytest
+import requests
+
+from clients import endpoints
+from clients.endpoints import EndpointPool
+from clients.openai_client import OpenAIClient
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(endpoints, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _names(eps):
+    return [e.api_base for e in eps]
+
+
+def test_least_outstanding_routing():
+    pool = EndpointPool(["a", "b", "c"])
+    first = [pool.acquire() for _ in range(3)]
+    assert _names(first) == ["a", "b", "c"]
+    pool.release(first[1], ok=True, seconds=0.1)
+    assert pool.acquire().api_base == "b"             # b 的在途请求最少
+    pool.release(first[0], ok=True, seconds=0.1)
+    pool.release(first[2], ok=True, seconds=0.1)
+    # a / c 在途都为 0、累计请求相同：按顺序取 a；exclude 跳过已失败的副本
+    assert pool.acquire(exclude={"a"}).api_base == "c"
+    assert pool.acquire(exclude={"a", "b", "c"}).api_base == "a"   # 全部排除时退回全体
+
+
+def test_circuit_breaker_ejects_and_probes(clock):
+    pool = EndpointPool(["a", "b"], failure_threshold=2, cooldown=10, max_cooldown=15)
+    a = pool.endpoints[0]
+    for _ in range(2):
+        pool.release(pool.acquire(exclude={"b"}), ok=False, seconds=0.1)
+    assert a.ejections == 1 and not pool.stats()[0]["healthy"]
+    assert {pool.acquire().api_base for _ in range(3)} == {"b"}
+
+    clock[0] += 10                                      # 冷却到期：半开，只放一个探测
+    for ep in pool.endpoints[1:]:
+        ep.outstanding = 5
+    probe = pool.acquire()
+    assert probe is a and a.probing
+    assert pool.acquire() is pool.endpoints[1]          # 探测未返回前不再派给 a
+    pool.release(probe, ok=False, seconds=0.1)          # 探测失败：冷却翻倍（上限 15）
+    assert a.ejections == 2 and a.ejected_until == clock[0] + 15
+
+    clock[0] += 15
+    pool.release(pool.acquire(exclude={"b"}), ok=True, seconds=0.1)
+    assert a.consecutive_failures == 0 and a.next_cooldown == 10
+    assert pool.stats()[0]["healthy"]
+
+
+def test_all_ejected_picks_earliest_recovery(clock):
+    pool = EndpointPool(["a", "b"], failure_threshold=1, cooldown=10)
+    pool.release(pool.acquire(exclude={"b"}), ok=False, seconds=0.1)
+    clock[0] += 5
+    pool.release(pool.acquire(exclude={"a"}), ok=False, seconds=0.1)
+    assert pool.acquire().api_base == "a"
+
+
+class _Resp:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"choices": [{"message": {"content": self.content}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1}}
+
+
+def test_client_fails_over_to_another_endpoint(monkeypatch):
+    urls = []
+
+    def fake_post(url, **kw):
+        urls.append(url)
+        if url.startswith("http://a"):
+            raise requests.ConnectionError("down")
+        return _Resp("<B>")
+
+    monkeypatch.setattr("clients.openai_client.requests.post", fake_post)
+    client = OpenAIClient("http://a, http://b", "k", eject_failures=1)
+    assert client.chat([{"role": "user", "content": "q"}]) == "<B>"
+    assert urls == ["http://a/chat/completions", "http://b/chat/completions"]
+    assert client.chat([{"role": "user", "content": "q"}]) == "<B>"
+    assert urls[-1] == "http://b/chat/completions"       # a 已被熔断
+    stats = {s["api_base"]: s for s in client.endpoint_stats()}
+    assert stats["http://a"]["ejections"] == 1 and stats["http://b"]["failures"] == 0
+
+
+def test_client_error_is_not_an_endpoint_fault(monkeypatch):
+    class _Bad(_Resp):
+        def raise_for_status(self):
+            resp = requests.Response()
+            resp.status_code = 400
+            raise requests.HTTPError("bad request", response=resp)
+
+    urls = []
+    monkeypatch.setattr("clients.openai_client.requests.post",
+                        lambda url, **kw: urls.append(url) or _Bad(""))
+    client = OpenAIClient(["http://a", "http://b"], "k", eject_failures=1)
+    with pytest.raises(requests.HTTPError):
+        client.chat([{"role": "user", "content": "q"}])
+    assert len(urls) == 1 and all(s["ejections"] == 0 for s in client.endpoint_stats())
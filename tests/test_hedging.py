@@ -0,0 +1,90 @@
+# medeval/tests/test_hedging.py
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from clients.base import LLMClient, request_class
+from clients.hedging import HedgedClient, LatencyTracker
+
+MSG = [{"role": "user", "content": "q"}]
+
+
+class GatedClient(LLMClient):
+    """slow 为真时阻塞到 release 被 set，用来模拟长尾请求。"""
+
+    def __init__(self):
+        self.slow = False
+        self.release = threading.Event()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages, model=None, temperature=None, timeout=None, response_format=None):
+        with self._lock:
+            self.calls += 1
+            n, slow = self.calls, self.slow
+            self.slow = False        # 只有下一次调用是慢的
+        if slow:
+            self.release.wait(5)
+            return "slow"
+        return f"fast{n}"
+
+
+def _warm(client, n, cls="choice"):
+    with request_class(cls):
+        for _ in range(n):
+            client.chat(MSG)
+
+
+def test_latency_tracker_quantiles():
+    tr = LatencyTracker(window=4)
+    assert tr.quantile(0.5) is None
+    for x in [5.0, 1.0, 2.0, 3.0, 4.0]:     # 超出窗口的最早样本被丢弃
+        tr.add(x)
+    assert len(tr) == 4
+    assert tr.quantile(0.0) == 1.0 and tr.quantile(0.99) == 4.0
+
+
+def test_timeouts_are_tracked_per_request_class():
+    client = HedgedClient(GatedClient(), max_timeout=60, min_timeout=0.5, hedge=False,
+                          min_samples=5)
+    _warm(client, 5, "choice")
+    assert client.current_timeout("choice") == 0.5     # 延迟很短：夹到 min_timeout
+    assert client.current_timeout("open") == 60        # 样本不足的类别用 max_timeout
+    assert client.stats()["by_class"]["choice"]["samples"] == 5
+
+
+def test_hedge_request_wins_when_primary_is_slow():
+    inner = GatedClient()
+    client = HedgedClient(inner, max_timeout=10, hedge_budget=0.5, min_samples=5)
+    try:
+        _warm(client, 5)
+        inner.slow = True
+        with request_class("choice"):
+            assert client.chat(MSG) == "fast7"
+        assert (client.hedged, client.hedge_wins) == (1, 1)
+    finally:
+        inner.release.set()
+
+
+def test_hedge_budget_limits_extra_requests():
+    inner = GatedClient()
+    client = HedgedClient(inner, max_timeout=0.3, min_timeout=0.3, hedge_budget=0.01,
+                          min_samples=5)
+    try:
+        _warm(client, 5)
+        inner.slow = True
+        with request_class("choice"), pytest.raises(TimeoutError):
+            client.chat(MSG)
+        assert client.hedged == 0 and client.timeouts == 1
+    finally:
+        inner.release.set()
+
+
+def test_errors_propagate():
+    class Failing(LLMClient):
+        def chat(self, messages, **kw):
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        HedgedClient(Failing(), max_timeout=5).chat(MSG)
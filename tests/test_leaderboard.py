@@ -0,0 +1,59 @@
+# medeval/tests/test_leaderboard.py
+# -*- coding: utf-8 -*-
+import os
+
+from conftest import FakeClient, choice_item
+from eval.evaluator import run_eval
+from eval.leaderboard import build_leaderboard, format_leaderboard
+from judge import RuleJudge
+from utils import save_json
+
+
+def _summary(ds_id, model, single, multi, open_rate=None):
+    s = {"dataset_id": ds_id, "dataset_name": ds_id, "test_model": model,
+         "choice_summary": {"base": {"accuracy_single_choice": single,
+                                     "accuracy_multi_choice": multi}},
+         "num_open_records": 0, "full_score_rate_open": 0.0}
+    if open_rate is not None:
+        s.update(num_open_records=2, full_score_rate_open=open_rate)
+    return {"summary": s, "records": []}
+
+
+def test_matrix_and_incremental_cache(tmp_path):
+    save_json(_summary("a", "m1", 0.5, 0.25, open_rate=1.0), tmp_path / "a__m1.json")
+    save_json(_summary("a", "m2", 1.0, 0.0), tmp_path / "a__m2.json")
+    save_json(_summary("a", "m1", 0.0, 0.0), tmp_path / "a__m1.partial.json")   # 不计入
+
+    board = build_leaderboard(tmp_path)
+    assert board["num_files"] == 2 and board["num_read"] == 2
+    assert board["matrix"]["m1"]["a"] == {
+        "base": {"accuracy_single_choice": 0.5, "accuracy_multi_choice": 0.25},
+        "open": {"full_score_rate_open": 1.0},
+    }
+    assert "open" not in board["matrix"]["m2"]["a"]
+
+    assert build_leaderboard(tmp_path)["num_read"] == 0
+    p = tmp_path / "a__m2.json"
+    save_json(_summary("a", "m2", 0.75, 0.0), p)
+    os.utime(p, ns=(p.stat().st_atime_ns, p.stat().st_mtime_ns + 10**9))
+    board = build_leaderboard(tmp_path)
+    assert board["num_read"] == 1
+    assert board["matrix"]["m2"]["a"]["base"]["accuracy_single_choice"] == 0.75
+
+
+def test_format_shows_each_metric_in_its_own_column(tmp_path):
+    # 单选准确率为 0 时不能被多选准确率顶替
+    save_json(_summary("a", "m1", 0.0, 0.5), tmp_path / "a__m1.json")
+    save_json(_summary("a", "m2", 1.0, 0.0, open_rate=0.5), tmp_path / "a__m2.json")
+    lines = [l.split("\t") for l in format_leaderboard(build_leaderboard(tmp_path)).splitlines()]
+    assert lines[0] == ["model", "a:base:multi_choice", "a:base:single_choice", "a:open"]
+    assert lines[1] == ["m1", "0.500", "0.000", "-"]
+    assert lines[2] == ["m2", "0.000", "1.000", "0.500"]
+
+
+def test_reads_real_result_files(make_dataset, tmp_path):
+    ds = make_dataset([choice_item(i) for i in range(4)])
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=["base"])
+    save_json(res, tmp_path / "ds__m.json")
+    board = build_leaderboard(tmp_path)
+    assert board["matrix"]["m"]["ds"]["base"] == res["summary"]["choice_summary"]["base"]
@@ -0,0 +1,61 @@
+# medeval/tests/test_llm_judge.py
+# -*- coding: utf-8 -*-
+from conftest import ScriptedClient
+from data.schema import ScoringPoint
+from eval.evaluator import _judge_parse_summary
+from judge import LLMJudge
+
+POS = [ScoringPoint(criterion="肺癌", points=2), ScoringPoint(criterion="手术", points=1)]
+NEG = [ScoringPoint(criterion="化疗", points=-1)]
+
+
+def _score(outputs, **kw):
+    client = ScriptedClient(outputs)
+    res = LLMJudge(client, **kw).score_open_response("问题", POS, NEG, "回答", 3)
+    return res, client
+
+
+def test_flags_are_keyed_by_id_not_criterion_text():
+    # id 大小写 / 空白、字符串形式的布尔值都能识别；顺序无关
+    res, client = _score(['{"n1": "false", " P2 ": true, "P1": true}'])
+    assert res["judge_parse"] == "ok"
+    assert [f["flag"] for f in res["scoring_points_flags"]] == [True, True, False]
+    assert [f["criterion"] for f in res["scoring_points_flags"]] == ["肺癌", "手术", "化疗"]
+    assert res["score"] == 3 and res["ok"]
+    schema = client.requests[0]["response_format"]["json_schema"]["schema"]
+    assert schema["required"] == ["P1", "P2", "N1"]
+
+
+def test_reask_only_for_missing_ids():
+    res, client = _score(['{"P1": true}', '{"P2": false, "N1": true}'])
+    assert res["judge_parse"] == "reask"
+    assert [f["flag"] for f in res["scoring_points_flags"]] == [True, False, True]
+    assert res["score"] == 1
+    assert len(client.requests) == 2
+    reask = client.requests[1]
+    assert reask["response_format"]["json_schema"]["schema"]["required"] == ["P2", "N1"]
+    # 追问带上了上一轮的原始输出和缺失的 id
+    assert reask["messages"][-2] == {"role": "assistant", "content": '{"P1": true}'}
+    assert "P2, N1" in reask["messages"][-1]["content"]
+
+
+def test_unparseable_output_falls_back_to_false():
+    res, client = _score(["not json", "still not json"])
+    assert res["judge_parse"] == "failed"
+    assert [f["flag"] for f in res["scoring_points_flags"]] == [False, False, False]
+    assert res["score"] == 0
+    assert len(client.requests) == 2
+    assert "invalid JSON" in client.requests[1]["messages"][-1]["content"]
+
+
+def test_max_reasks_zero_does_not_reask():
+    res, client = _score(['{"P1": true}'], max_reasks=0)
+    assert res["judge_parse"] == "failed"
+    assert len(client.requests) == 1
+
+
+def test_parse_summary_counts_outcomes():
+    recs = [{"type": "open_response", "judge_parse": p} for p in ("ok", "ok", "reask", "failed")]
+    summary = _judge_parse_summary(recs)
+    assert summary == {"judged_records": 4, "reasked": 1, "failed": 1,
+                       "reask_rate": 0.5, "parse_failure_rate": 0.25}
@@ -0,0 +1,54 @@
+# medeval/tests/test_loader.py
+# -*- coding: utf-8 -*-
+from collections import Counter
+from types import SimpleNamespace
+
+from conftest import choice_item
+from data.loader import stratified_sample
+
+
+def _items(sizes):
+    """sizes: {category1: 题数} -> 带 metadata.category1 的简单对象，按类别交错排列。"""
+    out = []
+    for cat, k in sizes.items():
+        out.extend(SimpleNamespace(qid=f"{cat}{i}", metadata=SimpleNamespace(category1=cat))
+                   for i in range(k))
+    return out
+
+
+def _alloc(sample):
+    return Counter(it.metadata.category1 for it in sample)
+
+
+def test_largest_remainder_allocation():
+    # 配额 2.5 / 1.5 / 1.0：取整后 2/1/1，余下 1 个给余数最大（并列时层更大）的 A
+    sample = stratified_sample(_items({"A": 5, "B": 3, "C": 2}), ["category1"], 5)
+    assert _alloc(sample) == {"A": 3, "B": 1, "C": 1}
+
+
+def test_every_stratum_gets_one_and_total_is_exact():
+    # 配额 2.4 / 0.3 / 0.3：每层至少 1 个后超额，从超配最多的层扣回
+    sample = stratified_sample(_items({"A": 8, "B": 1, "C": 1}), ["category1"], 3)
+    assert _alloc(sample) == {"A": 1, "B": 1, "C": 1}
+
+
+def test_sample_is_deterministic_and_keeps_order():
+    items = _items({"A": 7, "B": 5, "C": 4})
+    a = stratified_sample(items, ["category1"], 6, seed=7)
+    b = stratified_sample(items, ["category1"], 6, seed=7)
+    assert [it.qid for it in a] == [it.qid for it in b]
+    pos = {id(it): i for i, it in enumerate(items)}
+    assert [pos[id(it)] for it in a] == sorted(pos[id(it)] for it in a)
+
+
+def test_n_larger_than_dataset_returns_everything():
+    items = _items({"A": 2, "B": 1})
+    assert stratified_sample(items, ["category1"], 10) == items
+
+
+def test_load_dataset_max_examples_stratified(make_dataset):
+    items = ([choice_item(i, category1="心") for i in range(6)]
+             + [choice_item(10 + i, category1="肺") for i in range(3)]
+             + [choice_item(20 + i, category1="胃") for i in range(1)])
+    ds = make_dataset(items, max_examples=5, stratify_by=["category1"])
+    assert Counter(it.metadata.category1 for it in ds.dataset) == {"心": 3, "肺": 1, "胃": 1}
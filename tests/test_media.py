@@ -0,0 +1,78 @@
+# medeval/tests/test_media.py
+# -*- coding: utf-8 -*-
+import base64
+import os
+
+import pytest
+
+from utils.media import ImageCache, image_parts, materialize_messages, message_text
+
+
+def _write(path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_data_url_is_cached_and_invalidated_on_change(tmp_path):
+    p = _write(tmp_path / "x.png", b"abc")
+    cache = ImageCache()
+    url = cache.data_url(p)
+    assert url == "data:image/png;base64," + base64.b64encode(b"abc").decode()
+    assert cache.data_url(str(p)) == url
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    _write(p, b"abcd")
+    os.utime(p, ns=(p.stat().st_atime_ns, p.stat().st_mtime_ns + 10**9))
+    assert cache.data_url(p).endswith(base64.b64encode(b"abcd").decode())
+    assert cache.misses == 2
+
+
+def test_lru_evicts_by_bytes(tmp_path):
+    paths = [_write(tmp_path / f"{i}.png", bytes([i]) * 30) for i in range(3)]
+    one = len(ImageCache().data_url(paths[0]))
+    cache = ImageCache(max_bytes=2 * one)
+    cache.data_url(paths[0])
+    cache.data_url(paths[1])
+    cache.data_url(paths[0])          # 0 变为最近使用
+    cache.data_url(paths[2])          # 超限：淘汰最久未用的 1
+    assert cache.stats()["entries"] == 2 and cache.stats()["bytes"] == 2 * one
+    cache.data_url(paths[0])
+    assert cache.hits == 2
+    cache.data_url(paths[1])
+    assert cache.misses == 4
+
+
+def test_relative_paths_resolve_against_media_root(tmp_path, monkeypatch):
+    root = tmp_path / "media"
+    _write(root / "a" / "x.png", b"img")
+    monkeypatch.chdir(tmp_path)
+    cache = ImageCache(media_root=root)
+    assert cache.resolve("a/x.png") == (root / "a" / "x.png").resolve()
+    assert cache.resolve(tmp_path / "y.png") == (tmp_path / "y.png").resolve()
+    assert ImageCache().resolve("a/x.png") == (tmp_path / "a" / "x.png").resolve()
+    with pytest.raises(FileNotFoundError):
+        ImageCache().data_url("a/x.png")
+    assert cache.data_url("a/x.png").endswith(base64.b64encode(b"img").decode())
+
+
+def test_materialize_messages_replaces_refs_only(tmp_path):
+    p = _write(tmp_path / "x.jpg", b"jpg")
+    parts = image_parts([{"type": "image", "path": str(p)},
+                         {"type": "image", "url": "https://e/x.png"},
+                         {"type": "audio", "path": "a.wav"}])
+    assert parts == [{"type": "image_ref", "path": str(p)},
+                     {"type": "image_url", "image_url": {"url": "https://e/x.png"}}]
+
+    text_only = [{"role": "user", "content": "hi"}]
+    assert materialize_messages(text_only) is text_only
+
+    msgs = [{"role": "user", "content": [{"type": "text", "text": "看图"}, *parts]}]
+    cache = ImageCache()
+    out = materialize_messages(msgs, cache)
+    assert msgs[0]["content"][1]["type"] == "image_ref"      # 不修改原消息
+    assert out[0]["content"][1]["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    assert out[0]["content"][2] == parts[1]
+    assert message_text(out[0]["content"]) == "看图"
+    materialize_messages(msgs, cache)
+    assert cache.stats()["hits"] == 1
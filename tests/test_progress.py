@@ -0,0 +1,53 @@
+# medeval/tests/test_progress.py
+# -*- coding: utf-8 -*-
+import io
+
+from conftest import FakeClient, choice_item, open_item
+from eval.evaluator import run_eval
+from eval.progress import OnlineSummary, ProgressReporter
+from judge import RuleJudge
+from utils import load_json
+
+MODES = ["base", "shuffle"]
+
+
+def _mixed(make_dataset):
+    return make_dataset([choice_item(i, answer="ABCD"[i % 4]) for i in range(6)]
+                        + [choice_item(6 + i, typ="multiple_choice", answer="A,B") for i in range(3)]
+                        + [open_item(i) for i in range(4)])
+
+
+def test_snapshot_matches_summarize(make_dataset):
+    ds = _mixed(make_dataset)
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    online = OnlineSummary()
+    for rec in res["records"]:
+        online.add(rec)
+    snap = online.snapshot()
+    for k, v in snap.items():
+        assert res["summary"][k] == v, k
+
+
+def test_snapshot_only_lists_started_variants():
+    online = OnlineSummary()
+    assert online.snapshot()["choice_summary"] == {}
+    online.add({"type": "single_choice", "variant": "base", "ok": True,
+                "score_obtained": 1, "score_full": 1})
+    snap = online.snapshot()
+    assert snap["choice_summary"] == {"base": {"accuracy_single_choice": 1.0,
+                                               "accuracy_multi_choice": 0.0}}
+    assert snap["full_score_rate_open"] == 0.0 and snap["num_open_records"] == 0
+
+
+def test_reporter_writes_final_partial(make_dataset, tmp_path):
+    ds = _mixed(make_dataset)
+    out = io.StringIO()
+    progress = ProgressReporter("ds", out_dir=tmp_path, interval=0, stream=out)
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES, progress=progress)
+
+    partial = load_json(tmp_path / "ds__m.partial.json")
+    assert partial["status"] == "done"
+    assert partial["progress"]["done"] == partial["progress"]["total"] == len(res["records"])
+    assert partial["summary"]["choice_summary"] == res["summary"]["choice_summary"]
+    assert partial["summary"]["full_score_rate_open"] == res["summary"]["full_score_rate_open"]
+    assert "[PROGRESS] ds / m: 22/22" in out.getvalue()
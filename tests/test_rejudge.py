@@ -0,0 +1,110 @@
+# medeval/tests/test_rejudge.py
+# -*- coding: utf-8 -*-
+import copy
+
+from conftest import FakeClient, choice_item, dialogue_item, open_item
+from eval.evaluator import run_eval
+from eval.rejudge import rejudge_result
+from eval.retry import RetryPolicy
+from judge import RuleJudge
+from judge.base import Judge
+
+MODES = ["base", "shuffle"]
+
+
+def _items(revise=(), synonyms=False):
+    """revise 中的开放题把“手术”换成“治疗”（可选同义词“手术”）。"""
+    items = [choice_item(i) for i in range(3)] + [open_item(i) for i in range(4)]
+    for it in items:
+        if it["question_id"] in revise:
+            md = it["metadata"]
+            md["positive_scoring_points"] = [{"criterion": "肺癌", "points": 2},
+                                             {"criterion": "治疗", "points": 1}]
+            if synonyms:
+                md["synonyms"] = {"治疗": ["手术"]}
+    return items
+
+
+def test_unchanged_results_are_not_rescored(make_dataset):
+    ds = make_dataset(_items())
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    before = copy.deepcopy(res)
+    stats = rejudge_result(res, ds, RuleJudge(), processes=1)
+    assert stats["rescored"] == 0 and stats["open_records"] == 4
+    assert res["records"] == before["records"]
+
+    assert rejudge_result(res, ds, RuleJudge(), processes=1, force=True)["rescored"] == 4
+    assert res["records"] == before["records"]
+
+
+def test_revised_rubric_rescores_only_changed_items(make_dataset):
+    res = run_eval(make_dataset(_items(), dataset_id="ds"), FakeClient(), RuleJudge(), "m",
+                   choice_modes=MODES)
+    revised = make_dataset(_items(revise={"o1", "o2"}), dataset_id="ds")
+    client = FakeClient()
+    stats = rejudge_result(res, revised, RuleJudge(), processes=1)
+    fresh = run_eval(revised, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+
+    assert stats["rescored"] == 2 and client.calls == 0
+    assert res["records"] == fresh["records"]
+    assert {k: v for k, v in res["summary"].items() if k != "rejudge"} == fresh["summary"]
+
+
+def test_judge_configuration_is_used_in_process_pool(make_dataset):
+    ds = make_dataset(_items(revise={"o0", "o1", "o2", "o3"}, synonyms=True))
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    judge = RuleJudge(use_synonyms=True)
+    stats = rejudge_result(res, ds, judge, processes=2)
+    fresh = run_eval(ds, FakeClient(), judge, "m", choice_modes=MODES)
+
+    assert stats["rescored"] == 4 and stats["judge_hash"] == judge.fingerprint()
+    assert res["records"] == fresh["records"]
+    assert any(r["type"] == "open_response" and r["ok"] for r in res["records"])
+
+
+def test_failed_rejudge_keeps_old_scores(make_dataset):
+    class Flaky(Judge):
+        """非规则裁判（走线程并发 + 延迟重试）；开放题1 总是失败。"""
+
+        def fingerprint(self):
+            return "flaky"
+
+        def score_single_choice(self, *args):
+            return RuleJudge().score_single_choice(*args)
+
+        def score_open_response(self, question, *args, **kw):
+            if question.startswith("开放题1"):
+                raise RuntimeError("judge down")
+            return RuleJudge().score_open_response(question, *args, **kw)
+
+    ds = make_dataset(_items())
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    old = {r["question_id"]: r for r in copy.deepcopy(res["records"])}
+    stats = rejudge_result(res, ds, Flaky(), workers=2, retry=RetryPolicy(max_rounds=0))
+    assert (stats["rescored"], stats["failed"]) == (3, 1)
+    by_id = {r["question_id"]: r for r in res["records"]}
+    assert by_id["o1"] == old["o1"]
+    assert by_id["o0"]["judge_hash"] == "flaky"
+
+
+def test_dialogue_turns_and_missing_items(make_dataset):
+    class Answers(FakeClient):
+        def chat(self, messages, **kw):
+            return "<咳嗽，考虑肺癌，需要手术>"
+
+    ds = make_dataset([dialogue_item(0), dialogue_item(1), open_item(0)])
+    res = run_eval(ds, Answers(), RuleJudge(), "m", choice_modes=MODES)
+    scored = [t for r in res["records"] for t in r.get("turns", []) if "score_full" in t]
+    assert scored and all(t["ok"] for t in scored)
+    fresh = copy.deepcopy(res)
+    for rec in res["records"]:
+        rec.pop("judge_hash")
+        for t in rec.get("turns", []):
+            if "score_full" in t:
+                t.update(score_obtained=0, ok=False)
+    res["records"][0]["dialogue"] = {}
+
+    smaller = make_dataset([dialogue_item(0), dialogue_item(1)])
+    stats = rejudge_result(res, smaller, RuleJudge(), processes=1)
+    assert stats["rescored"] == 2 and stats["missing_in_dataset"] == 1
+    assert res["records"][:2] == fresh["records"][:2]
@@ -0,0 +1,130 @@
+# medeval/tests/test_retry_failed.py
+# -*- coding: utf-8 -*-
+import copy
+
+import pytest
+
+from conftest import FakeClient
+from clients.usage import UsageMeter
+from eval.budget import BudgetGovernor, BudgetLimits
+from eval.evaluator import run_eval, rerun_failed, iter_work_units
+from eval.retry import RetryPolicy
+from eval.shard import merge_shard_results
+from judge import RuleJudge
+from test_shard import run_shards
+from utils import save_json, load_json, load_jsonl
+
+NO_RETRY = RetryPolicy(max_rounds=0)
+MODES = ["base", "shuffle"]
+
+
+class MeteredClient(FakeClient):
+    def __init__(self, meter: UsageMeter):
+        super().__init__()
+        self.meter = meter
+
+    def chat(self, messages, **kw):
+        self.meter.add({"prompt_tokens": 1, "completion_tokens": 1})
+        return super().chat(messages, **kw)
+
+
+def test_rerun_failed_fills_dead_letters(small_dataset):
+    single = run_eval(small_dataset, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    res = run_eval(small_dataset, FakeClient(fail_on=["问题3：", "开放题1："]), RuleJudge(), "m",
+                   choice_modes=MODES, retry=NO_RETRY)
+    assert {f["question_id"] for f in res["failed"]} == {"q3", "o1"}
+
+    client = FakeClient()
+    fixed = rerun_failed(small_dataset, client, RuleJudge(), "m", res, res["failed"],
+                         choice_modes=MODES)
+    assert client.calls == len(res["failed"])
+    assert fixed["records"] == single["records"]
+    assert not fixed.get("failed")
+
+
+def test_rerun_failed_keeps_still_failing_units(small_dataset):
+    res = run_eval(small_dataset, FakeClient(fail_on=["问题3："]), RuleJudge(), "m",
+                   choice_modes=MODES, retry=NO_RETRY)
+    again = rerun_failed(small_dataset, FakeClient(fail_on=["问题3："]), RuleJudge(), "m",
+                         res, res["failed"], choice_modes=MODES, retry=NO_RETRY)
+    assert [f["index"] for f in again["failed"]] == [f["index"] for f in res["failed"]]
+    assert len(again["records"]) == len(res["records"])
+
+
+def test_rerun_failed_accepts_budget_skipped_units(small_dataset):
+    meter = UsageMeter()
+    governor = BudgetGovernor({"test": BudgetLimits(calls=10)}, {"test": meter}, policy=[])
+    res = run_eval(small_dataset, MeteredClient(meter), RuleJudge(), "m", choice_modes=MODES,
+                   governor=governor)
+    assert res["skipped"] and not res.get("failed")
+
+    kept = rerun_failed(small_dataset, FakeClient(), RuleJudge(), "m", res, [], choice_modes=MODES)
+    assert kept["skipped"] == res["skipped"]
+    assert kept["records"] == res["records"]
+
+    resumed = rerun_failed(small_dataset, FakeClient(), RuleJudge(), "m", res, [],
+                           choice_modes=MODES, resume_skipped=True)
+    single = run_eval(small_dataset, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    assert not resumed.get("skipped")
+    assert resumed["records"] == single["records"]
+
+
+def test_rerun_failed_rejects_mismatched_dead_letter(small_dataset):
+    res = run_eval(small_dataset, FakeClient(fail_on=["问题3："]), RuleJudge(), "m",
+                   choice_modes=MODES, retry=NO_RETRY)
+    wrong = [dict(res["failed"][0], question_id="q999")]
+    with pytest.raises(ValueError):
+        rerun_failed(small_dataset, FakeClient(), RuleJudge(), "m", res, wrong, choice_modes=MODES)
+
+
+def _exhausted_governor() -> BudgetGovernor:
+    """调用数预算一开始就用完：该分片的所有单元都被跳过。"""
+    meter = UsageMeter()
+    meter.add({"prompt_tokens": 1, "completion_tokens": 1})
+    return BudgetGovernor({"test": BudgetLimits(calls=1)}, {"test": meter}, policy=[])
+
+
+def test_merge_with_failures_and_skips(small_dataset):
+    shards = run_shards(small_dataset, 2,
+                        client_of=lambda i: FakeClient(fail_on=["问题1："] if i == 0 else []),
+                        governor_of=lambda i: _exhausted_governor() if i == 1 else None)
+    merged = merge_shard_results(shards)
+
+    total = len(iter_work_units(small_dataset, MODES))
+    failed = {f["index"] for f in merged["failed"]}
+    skipped = {s["index"] for s in merged["skipped"]}
+    assert len(merged["records"]) + len(failed) + len(skipped) == total
+    assert failed and skipped and not failed & skipped
+    assert {f["question_id"] for f in merged["failed"]} == {"q1"}
+    assert all(s["reason"] == "budget_exhausted" for s in merged["skipped"])
+    assert merged["summary"]["num_failed"] == len(failed)
+
+
+def test_merge_rejects_unit_claimed_twice(small_dataset):
+    shards = run_shards(small_dataset, 2)
+    # 把分片 1 的一条 record 伪造成分片 0 的失败
+    bad = copy.deepcopy(shards[0])
+    idx = shards[1]["shard"]["units"][0][0]
+    bad.setdefault("failed", []).append({"index": idx, "question_id": "x", "variant": None,
+                                         "error": "e", "attempts": 1})
+    with pytest.raises(ValueError, match="工作单元重复"):
+        merge_shard_results([bad, shards[1]])
+
+
+def test_merge_command_writes_deadletter(small_dataset, tmp_path):
+    import main
+
+    shards = run_shards(small_dataset, 2,
+                        client_of=lambda i: FakeClient(fail_on=["问题2："]))
+    inputs = []
+    for i, res in enumerate(shards):
+        p = tmp_path / "shards" / f"ds__m.shard{i}of2.json"
+        save_json(res, p)
+        inputs.append(str(p))
+    out = tmp_path / "merged"
+    main.merge_main(["--inputs", *inputs, "--out_dir", str(out)])
+
+    merged = load_json(out / "ds__m.json")
+    dead = load_jsonl(out / "ds__m.deadletter.jsonl")
+    assert dead == merged["failed"]
+    assert {d["question_id"] for d in dead} == {"q2"}
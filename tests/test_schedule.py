@@ -0,0 +1,70 @@
+# medeval/tests/test_schedule.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import FakeClient, choice_item, dialogue_item, open_item
+from eval.dialogue import prefix_group_key
+from eval.evaluator import iter_work_units, run_eval
+from eval.schedule import CostModel, Scheduler, unit_kind
+from judge import RuleJudge
+
+MODES = ["base", "shuffle"]
+
+
+def _units(make_dataset, items):
+    return iter_work_units(make_dataset(items), MODES)
+
+
+def test_order_policy_keeps_dataset_order(make_dataset):
+    units = _units(make_dataset, [choice_item(0), open_item(0), choice_item(1)])
+    assert Scheduler().policy == "order"
+    assert [u.index for u in Scheduler("order").order(units)] == [u.index for u in units]
+
+
+def test_lpt_puts_long_units_first_and_keeps_prefix_groups_together(make_dataset):
+    items = [choice_item(0), dialogue_item(0, "医生，我胸痛"), open_item(0),
+             dialogue_item(1, "我咳嗽两周了"), dialogue_item(2, "医生，我胸痛"), choice_item(1)]
+    units = _units(make_dataset, items)
+    sched = Scheduler("lpt")
+    ordered = sched.order(units)
+
+    assert sorted(u.index for u in ordered) == [u.index for u in units]
+    kinds = [unit_kind(u) for u in ordered]
+    # 两道同开场的对话组成最重的块，排在最前且相邻
+    assert [u.item.question_id for u in ordered[:2]] == ["d0", "d2"]
+    assert prefix_group_key(ordered[0].item) == prefix_group_key(ordered[1].item)
+    assert kinds[:4] == ["dialogue", "dialogue", "dialogue", "open"]
+    assert set(kinds[4:]) == {"choice"}
+
+
+def test_priority_subset_goes_first_and_fires_callback(make_dataset):
+    ds = make_dataset([choice_item(i, category1="心") for i in range(3)]
+                      + [choice_item(i + 3, category1="肺") for i in range(2)])
+    fired = []
+    sched = Scheduler("order", priority_field="category1", priority_values=["肺"],
+                      on_priority_done=lambda ds_id, done: fired.append(
+                          (ds_id, sorted(u.item.question_id for u, _ in done["m"]))))
+    ordered = sched.order(iter_work_units(ds, MODES))
+    assert [u.item.question_id for u in ordered[:4]] == ["q3", "q3", "q4", "q4"]
+
+    plain = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    res = run_eval(ds, FakeClient(), RuleJudge(), "m", choice_modes=MODES, scheduler=sched)
+    assert res["records"] == plain["records"]   # 派发顺序不影响 record 顺序
+    assert fired == [("ds", ["q3", "q3", "q4", "q4"])]
+
+
+def test_cost_model_stats_are_ratios(make_dataset):
+    (unit,) = _units(make_dataset, [open_item(0)])
+    cost = CostModel(alpha=0.5)
+    assert cost.stats() == {}
+    raw = cost.raw_estimate(unit)
+    cost.observe(unit, raw * 2)
+    assert cost.stats() == {"open": 2.0}
+    assert cost.estimate(unit) == pytest.approx(raw * 2)
+    cost.observe(unit, raw * 4)
+    assert cost.stats() == {"open": 3.0}
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="未知的调度策略"):
+        Scheduler("fastest")
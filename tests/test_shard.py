@@ -0,0 +1,33 @@
+# medeval/tests/test_shard.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import FakeClient
+from eval.evaluator import run_eval
+from eval.retry import RetryPolicy
+from eval.shard import merge_shard_results
+from judge import RuleJudge
+
+NO_RETRY = RetryPolicy(max_rounds=0)
+MODES = ["base", "shuffle"]
+
+
+def run_shards(ds, n, client_of=lambda i: FakeClient(), governor_of=lambda i: None):
+    """按分片逐个运行（模拟 N 个节点），返回各分片结果。"""
+    return [run_eval(ds, client_of(i), RuleJudge(), "m", choice_modes=MODES, shard=(i, n),
+                     retry=NO_RETRY, governor=governor_of(i))
+            for i in range(n)]
+
+
+def test_merge_matches_single_node_run(small_dataset):
+    single = run_eval(small_dataset, FakeClient(), RuleJudge(), "m", choice_modes=MODES)
+    merged = merge_shard_results(run_shards(small_dataset, 3))
+    assert merged["records"] == single["records"]
+    assert merged["summary"] == single["summary"]
+    assert not merged.get("failed") and not merged.get("skipped")
+
+
+def test_merge_rejects_missing_shard(small_dataset):
+    shards = run_shards(small_dataset, 3)
+    with pytest.raises(ValueError, match="分片不完整"):
+        merge_shard_results(shards[:2])
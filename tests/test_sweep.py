@@ -0,0 +1,40 @@
+# medeval/tests/test_sweep.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import FakeClient
+from config import load_eval_config
+from eval.evaluator import run_eval
+from eval.sweep import run_sweep
+from judge import CachedJudge, RuleJudge
+
+MODES = ["base", "shuffle"]
+
+
+def test_sweep_matches_per_model_runs(small_dataset):
+    clients = {"m1": FakeClient(), "m2": FakeClient()}
+    judge = CachedJudge(RuleJudge())
+    out = run_sweep(small_dataset, clients, judge, choice_modes=MODES, workers=2)
+
+    assert list(out["results"]) == ["m1", "m2"]
+    for m, res in out["results"].items():
+        single = run_eval(small_dataset, FakeClient(), RuleJudge(), m, choice_modes=MODES)
+        assert res["records"] == single["records"]
+        assert res["summary"] == single["summary"]
+        assert out["summary"]["models"][m] == single["summary"]
+    assert all(c.calls == 8 * len(MODES) + 4 for c in clients.values())
+    # 两个模型的开放题答案逐字相同：每题只判一次
+    assert out["summary"]["judge_reuse"] == {"judge_calls": 4, "judge_cache_hits": 4}
+
+
+def test_test_models_parsed_from_env(monkeypatch):
+    monkeypatch.setenv("TEST_MODEL", " a , b,,")
+    cfg = load_eval_config()
+    assert cfg.test_models == ["a", "b"] and cfg.test.model == "a"
+
+
+@pytest.mark.parametrize("value", ["", " , ,"])
+def test_empty_test_model_is_a_config_error(monkeypatch, value):
+    monkeypatch.setenv("TEST_MODEL", value)
+    with pytest.raises(ValueError, match="TEST_MODEL"):
+        load_eval_config()
@@ -1,4 +1,6 @@
-from .io import save_json, save_csv
-from .text import normalize
+from .io import (save_json, save_json_atomic, save_csv, load_json, load_json_summary,
+                 save_jsonl, load_jsonl)
+from .text import normalize, estimate_tokens
 
-__all__ = ["save_json", "save_csv", "normalize"]
+__all__ = ["save_json", "save_json_atomic", "save_csv", "load_json", "load_json_summary",
+           "save_jsonl", "load_jsonl", "normalize", "estimate_tokens"]
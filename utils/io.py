@@ -1,4 +1,4 @@
-import json, csv
+import json, csv, os, re, threading
 from pathlib import Path
 from typing import Dict, Any, List
 
@@ -7,6 +7,56 @@ def save_json(obj: Dict[str, Any], path: str | Path):
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
+def save_json_atomic(obj: Dict[str, Any], path: str | Path):
+    """
+    先写同目录临时文件再 os.replace：轮询方不会读到写了一半的文件。
+    临时文件名带进程号 + 线程号，同一进程内多个线程并发写同一路径也不会互相覆盖临时文件。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+def load_json(path: str | Path) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def load_json_summary(path: str | Path, chunk_size: int = 64 * 1024) -> Dict[str, Any]:
+    """
+    只读取结果文件开头的 "summary" 段，不解析后面体积巨大的 records。
+    save_json 写出的结果中 summary 是第一个 key；若不是（或格式异常），退回完整解析。
+    """
+    path = Path(path)
+    decoder = json.JSONDecoder()
+    buf = ""
+    with path.open("r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            m = re.match(r'\s*\{\s*"summary"\s*:\s*', buf)
+            if m:
+                try:
+                    obj, _ = decoder.raw_decode(buf, m.end())
+                    return obj
+                except json.JSONDecodeError:
+                    pass
+            elif len(buf.lstrip()) > len('{"summary":'):
+                break
+            if not chunk:
+                break
+    return load_json(path)["summary"]
+
+def save_jsonl(rows: List[Dict[str, Any]], path: str | Path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+def load_jsonl(path: str | Path) -> List[Dict[str, Any]]:
+    with Path(path).open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
 def save_csv(records: List[Dict[str, Any]], path: str | Path):
     if not records:
         return
@@ -0,0 +1,159 @@
+"""
+多模态图片载荷：懒加载 + 编码结果 LRU 缓存
+
+- prompt 构造阶段只放图片引用 {"type": "image_ref", "path": ...}，不读文件
+- 真正发请求前（OpenAIClient.chat）才调用 materialize_messages，把引用换成
+  data URL；同一张图被多个 variant / 多个模型 / 重试复用时只读取、编码一次
+- 文件通过 mmap 读取，直接 base64 编码，不额外复制一份原始字节
+- 可选缩放 / 重新压缩（需要 Pillow），减少请求体积和缓存占用
+"""
+import base64
+import mimetypes
+import mmap
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class ImageCache:
+    """
+    线程安全、按字节数限容的 LRU：key = (绝对路径, mtime, size, 缩放参数)，value = data URL。
+    文件被修改后 mtime/size 变化，自然失效。
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 max_side: Optional[int] = None,
+                 jpeg_quality: Optional[int] = None,
+                 media_root: str | Path | None = None):
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.media_root = Path(media_root) if media_root else None
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[tuple, str]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, path: str | Path) -> Path:
+        """图片路径 -> 绝对路径；相对路径按 media_root（未配置时按当前目录）解析。"""
+        p = Path(path)
+        if not p.is_absolute() and self.media_root is not None:
+            p = self.media_root / p
+        return p.resolve()
+
+    def data_url(self, path: str | Path) -> str:
+        p = self.resolve(path)
+        st = p.stat()
+        key = (str(p), st.st_mtime_ns, st.st_size, self.max_side, self.jpeg_quality)
+        with self._lock:
+            url = self._data.get(key)
+            if url is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return url
+            self.misses += 1
+
+        # 编码放在锁外；并发 miss 同一张图最多重复编码一次，结果一致
+        url = self._encode(p, st.st_size)
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = url
+                self._bytes += len(url)
+                while self._bytes > self.max_bytes and len(self._data) > 1:
+                    _, old = self._data.popitem(last=False)
+                    self._bytes -= len(old)
+        return url
+
+    def _encode(self, p: Path, size: int) -> str:
+        mime = mimetypes.guess_type(p.name)[0] or "image/png"
+        if self.max_side or self.jpeg_quality:
+            return self._encode_recompressed(p)
+        if size == 0:
+            return f"data:{mime};base64,"
+        with open(p, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            b64 = base64.b64encode(mm).decode("ascii")
+        return f"data:{mime};base64,{b64}"
+
+    def _encode_recompressed(self, p: Path) -> str:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError("图片缩放 / 重新压缩需要安装 Pillow：pip install pillow")
+
+        with Image.open(p) as img:
+            if self.max_side and max(img.size) > self.max_side:
+                img.thumbnail((self.max_side, self.max_side))
+            buf = BytesIO()
+            img.convert("RGB").save(buf, format="JPEG", quality=self.jpeg_quality or 85)
+        b64 = base64.b64encode(buf.getbuffer()).decode("ascii")
+        return f"data:image/jpeg;base64,{b64}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._data), "bytes": self._bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+_default_cache = ImageCache()
+
+
+def configure_image_cache(**kwargs) -> ImageCache:
+    """替换进程内共享的图片缓存（main.py 按命令行参数调用一次）。"""
+    global _default_cache
+    _default_cache = ImageCache(**kwargs)
+    return _default_cache
+
+
+def get_image_cache() -> ImageCache:
+    return _default_cache
+
+
+def image_parts(multimodal_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Item.multimodal_data -> OpenAI content parts（本地文件只生成引用，不读取）。
+    支持条目：
+      {"type": "image", "path": "a.png"}   （也接受 "image" / "file" 作为路径字段）
+      {"type": "image", "url": "https://..."} / data URL，原样透传
+    非图片条目忽略。
+    """
+    parts = []
+    for d in multimodal_data or []:
+        if d.get("type", "image") != "image":
+            continue
+        url = d.get("url")
+        if url:
+            parts.append({"type": "image_url", "image_url": {"url": url}})
+            continue
+        path = d.get("path") or d.get("image") or d.get("file")
+        if path:
+            parts.append({"type": "image_ref", "path": str(path)})
+    return parts
+
+
+def materialize_messages(messages: List[Dict[str, Any]],
+                         cache: Optional[ImageCache] = None) -> List[Dict[str, Any]]:
+    """把 image_ref 换成 data URL；纯文本消息原样返回，不复制。"""
+    if all(isinstance(m.get("content"), str) for m in messages):
+        return messages
+    cache = cache or _default_cache
+    out = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, list):
+            content = [
+                {"type": "image_url", "image_url": {"url": cache.data_url(part["path"])}}
+                if part.get("type") == "image_ref" else part
+                for part in content
+            ]
+            m = {**m, "content": content}
+        out.append(m)
+    return out
+
+
+def message_text(content: Any) -> str:
+    """取消息中的文本部分（content 可能是 str 或 content parts 列表）。"""
+    if isinstance(content, str):
+        return content
+    return "\n".join(p.get("text", "") for p in content or [] if p.get("type") == "text")
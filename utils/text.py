@@ -2,3 +2,15 @@ import re
 
 def normalize(s: str) -> str:
     return re.sub(r"\s+", "", (s or "")).strip().lower()
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+def estimate_tokens(s: str) -> int:
+    """
+    本地 token 数近似（不依赖 tokenizer）：
+    CJK 字符约 1 token / 字，其余非空白字符约 4 字符 / token。
+    """
+    s = s or ""
+    cjk = len(_CJK_RE.findall(s))
+    other = len(re.sub(r"\s+", "", s)) - cjk
+    return cjk + (other + 3) // 4